@@ -0,0 +1,59 @@
+'''
+Compare backends on the same decorated code.
+
+Run from the repository root with ``python -m benchmarks.backends``\\.
+'''
+from __future__ import print_function
+
+from timeit import repeat
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.backends import backends
+
+
+def small_records(n):
+    out = []
+    for i in range(n):
+        record = {'id': i, 'name': 'item', 'tags': ['a', 'b']}
+        record['score'] = i * 2
+        if record['id'] in {1, 2, 3}:
+            record['tags'].append('c')
+        out.append(record['score'] + len(record['tags']))
+    return out
+
+
+def large_vector(n):
+    values = [i for i in range(n)]
+    total = 0
+    for i in range(0, n, 100):
+        values[i] = -i
+        total += values[i // 2]
+    return total
+
+
+def large_map(n):
+    index = {i: i for i in range(n)}
+    for i in range(0, n, 100):
+        index[i] = -i
+        del index[i + 1]
+    return len(index)
+
+
+workloads = [
+    (small_records, 1000),
+    (large_vector, 10000),
+    (large_map, 10000),
+]
+
+
+def main():
+    for func, n in workloads:
+        print('{}({})'.format(func.__name__, n))
+        for name in sorted(backends):
+            rewritten = pyrmute(backend=name)(func)
+            best = min(repeat(lambda: rewritten(n), number=10, repeat=3)) / 10
+            print('    {:<12} {:8.3f} ms'.format(name, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
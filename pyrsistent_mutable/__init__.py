@@ -1 +1 @@
-from .decorator import pyrmute
+from .decorator import pyrmute, raw, typed
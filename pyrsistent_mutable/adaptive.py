@@ -0,0 +1,99 @@
+'''
+Adaptive specialization of rewritten functions, enabled with ``pyrmute(adaptive=N)``.
+
+The wrapper records the types of the arguments of the first N calls. Parameters that always had the same
+persistent type are then specialized: the function is rewritten again with direct method calls in place of the
+generic helpers in ``globals``, behind a guard at entry that calls the generic version for other types. After N
+guard failures, the wrapper deoptimizes and uses the generic version from then on.
+'''
+from collections import namedtuple
+from functools import update_wrapper
+from threading import Lock
+from types import MethodType
+
+#: Reported by ``adaptive_info()``: the state is 'recording', 'specialized', 'generic' if there was nothing to
+#: specialize, or 'deoptimized'; calls counts recorded calls, misses guard failures, and types maps the guarded
+#: parameters to their types.
+AdaptiveInfo = namedtuple('AdaptiveInfo', 'state calls misses types')
+
+_missing = object()
+
+
+class Adaptive(object):
+    '''
+    Wraps a rewritten function, specializing it for the argument types it's called with.
+    '''
+    def __init__(self, func, specialize, warmup):
+        '''
+        :param func: The generic rewritten function.
+        :param specialize: Called with a dictionary of parameter names to types and a fallback function. Returns a
+            specialized function and a dictionary of the parameters it checks, or None if there's nothing to gain.
+        :param warmup: The number of calls to record, and of guard failures to tolerate.
+        '''
+        update_wrapper(self, func)
+        self._generic = func
+        self._specialize = specialize
+        self._warmup = warmup
+        code = func.__code__
+        self._params = code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+        self._positional = code.co_argcount
+        self._seen = dict((name, set()) for name in self._params)
+        self._lock = Lock()
+        self._func = self._record
+        self.state = 'recording'
+        self.types = {}
+        self.calls = self.misses = 0
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return MethodType(self, instance)
+
+    def __reduce__(self):
+        # Pickle by reference, as a function would be.
+        return self.__qualname__
+
+    def __call__(self, *args, **kw):
+        return self._func(*args, **kw)
+
+    def _record(self, *args, **kw):
+        types = []
+        for index, name in enumerate(self._params):
+            value = args[index] if index < len(args) and index < self._positional else kw.get(name, _missing)
+            types.append((name, _missing if value is _missing else type(value)))
+        # Calls from several threads would lose counts otherwise.
+        with self._lock:
+            for name, cls in types:
+                self._seen[name].add(cls)
+            self.calls += 1
+            if self.calls >= self._warmup and self.state == 'recording':
+                self._adapt()
+        return self._generic(*args, **kw)
+
+    def _adapt(self):
+        types = dict((name, next(iter(seen))) for name, seen in self._seen.items()
+                     if len(seen) == 1 and _missing not in seen)
+        specialized = self._specialize(types, self._miss) if types else None
+        if specialized is None:
+            self.state = 'generic'
+            self._func = self._generic
+        else:
+            self._func, self.types = specialized
+            self.state = 'specialized'
+            self.__source__ = getattr(self._func, '__source__', None)
+
+    def _miss(self, *args, **kw):
+        '''Called by the guard of the specialized function when the types don't match.'''
+        with self._lock:
+            self.misses += 1
+            if self.misses >= self._warmup and self.state == 'specialized':
+                self.deoptimize()
+        return self._generic(*args, **kw)
+
+    def deoptimize(self):
+        '''Go back to the generic version for good.'''
+        self.state = 'deoptimized'
+        self._func = self._generic
+
+    def adaptive_info(self):
+        return AdaptiveInfo(self.state, self.calls, self.misses, dict(self.types))
@@ -1,11 +1,10 @@
 '''
 Some functions to work around incompatibilities between the AST in python 2 and 3.
 '''
-from _ast import AST, Slice, Index, ExtSlice, Tuple, Load
-from ast import Name, Call, iter_fields, NodeTransformer, copy_location, dump
+from ast import AST, Slice, Index, ExtSlice, Tuple, Load, expr
+from ast import Attribute, Name, Call, iter_fields, NodeTransformer, copy_location, dump, walk
 from copy import deepcopy
 
-from pyrsistent_mutable.rewrite import _slice
 
 try:
     from ast import NameConstant
@@ -13,15 +12,52 @@ except ImportError:
     def NameConstant(value):
         return Name(id=repr(value))
 
+#: Whether a subscript is an expression rather than an Index, as it is since python 3.9.
+_bare_subscripts = issubclass(Slice, expr)
+
+_slice = Attribute(value=Name(id='__builtins__', ctx=Load()), attr='slice', ctx=Load())
+
 
 def cl(node, loc):
     return copy_location(node, loc) if loc is not None else node
 
 
+def relocate(node, lines=0, columns=0):
+    '''
+    Shift the locations in a tree parsed from a dedented snippet to where the snippet sits in its file.
+
+    Handles the ``end_lineno`` and ``end_col_offset`` attributes of python 3.8 as well.
+    :param node: The root of the tree.
+    :param lines: The number of lines before the snippet.
+    :param columns: The indentation removed by dedenting.
+    :return: The same node.
+    '''
+    for child in walk(node):
+        for attr, shift in (('lineno', lines), ('end_lineno', lines),
+                            ('col_offset', columns), ('end_col_offset', columns)):
+            value = getattr(child, attr, None)
+            if value is not None:
+                setattr(child, attr, value + shift)
+    return node
+
+
 def name_constant(value, loc=None):
     return cl(NameConstant(value), loc)
 
 
+def fill_kinds(tree):
+    '''
+    Give each `Constant` without a ``kind`` the default one. Python 3.8 leaves it unset on constants we make, like
+    ``Str(s=...)``\\, and astunparse reads it.
+    :param tree: An AST, updated in place.
+    :return: The tree.
+    '''
+    for node in walk(tree):
+        if type(node).__name__ == 'Constant' and not hasattr(node, 'kind'):
+            node.kind = None
+    return tree
+
+
 def call6(func, args=None, keywords=None, loc=None):
     '''
     Construct a Call node with the given args or keywords list.
@@ -52,9 +88,13 @@ def match_ast(pattern, node):
     :return: A dictionary of placeholders with values seen, or None to indicate a failure.
     '''
 
-    if isinstance(pattern, Cap) and len(pattern) == 1:
+    if isinstance(pattern, Cap):
         return {str(pattern): node}
 
+    if isinstance(pattern, set) and len(pattern) == 1:
+        # Older style placeholder: a set containing the name.
+        return {next(iter(pattern)): node}
+
     if not isinstance(node, type(pattern)):
         return None
 
@@ -120,12 +160,15 @@ class Context(NodeTransformer):
         return self._ctx()
 
 
-def deslicify(subscript):
+def deslicify(subscript, slice_func=None):
     '''
     Rewrite a subscript expression as a call to the builtin `slice` function.
 
-    The result should be what your `__getitem__` method would see.
+    The result should be what your `__getitem__` method would see. Since python 3.9 the subscript of an index is the
+    expression itself, and an extended slice is a `Tuple`\\.
     :param subscript: The AST node for a subscript expression.
+    :param slice_func: Returns the expression to call for `slice`\\, which is only called if there is a slice;
+        ``__builtins__.slice`` by default, which only works where ``__builtins__`` is the module.
     :return: A literal equivalent to the subscript expression.
     '''
     def fix_none(node):
@@ -136,7 +179,8 @@ def deslicify(subscript):
 
     def fix_slice(node):
         if isinstance(node, Slice):
-            return call6(func=_slice, args=[fix_none(node.lower), fix_none(node.upper), fix_none(node.step)], loc=node)
+            func = _slice if slice_func is None else slice_func()
+            return call6(func=func, args=[fix_none(node.lower), fix_none(node.upper), fix_none(node.step)], loc=node)
         else:
             return fix_none(node)
 
@@ -147,5 +191,9 @@ def deslicify(subscript):
         return cl(Tuple(elts=list(elems), ctx=Load()), subscript)
     elif isinstance(subscript, Slice):
         return fix_slice(subscript)
+    elif isinstance(subscript, Tuple) and any(isinstance(elt, Slice) for elt in subscript.elts):
+        return cl(Tuple(elts=[fix_slice(elt) for elt in subscript.elts], ctx=Load()), subscript)
+    elif _bare_subscripts and isinstance(subscript, expr):
+        return subscript
     else:
         raise TypeError('Expected {} to be a subscript expression.'.format(dump(subscript)))
@@ -0,0 +1,132 @@
+'''
+A reference to a persistent value that threads update by swapping in a new value.
+
+A rewritten function takes the old value and returns a new one without changing it, which is what `Atom.swap`
+needs: it calls the function and swaps the result in if no other thread swapped in the meantime, or else calls it
+again with the newer value. Reading the value never blocks, and no lock is held while an update runs.
+'''
+from collections import deque
+from threading import Lock
+
+
+class Atom(object):
+    '''
+    Holds a value that's replaced, never changed, so every thread sees a consistent snapshot.
+    '''
+    def __init__(self, value=None):
+        '''
+        :param value: The initial value; it should be persistent, since every thread that reads it shares it.
+        '''
+        self._value = value
+        self._lock = Lock()
+        self._watches = {}
+        self._queue = deque()
+        self._flushing = Lock()
+        #: How many times `swap` called its function again because another thread had changed the value.
+        self.retries = 0
+
+    def deref(self):
+        '''The current value.'''
+        return self._value
+
+    value = property(deref)
+
+    def compare_and_set(self, old, new):
+        '''
+        Replace the value with `new` if it's still `old`\\, comparing by identity, and notify the watches.
+        :return: Whether the value was replaced.
+        '''
+        with self._lock:
+            if self._value is not old:
+                return False
+            self._value = new
+        self._notify(old, new)
+        return True
+
+    def reset(self, new):
+        '''Replace the value, whatever it is, and notify the watches.'''
+        with self._lock:
+            old = self._value
+            self._value = new
+        self._notify(old, new)
+        return new
+
+    def swap(self, fn, *args, **kw):
+        '''
+        Replace the value with ``fn(value, *args, **kw)``\\, calling it again if another thread replaced the value
+        first. `fn` may be called several times, so it shouldn't have side effects; a ``pyrmute`` function is ideal.
+        :return: The value `fn` returned, which was swapped in.
+        '''
+        while True:
+            old = self._value
+            new = fn(old, *args, **kw)
+            if self.compare_and_set(old, new):
+                return new
+            with self._lock:
+                self.retries += 1
+
+    def send(self, fn, *args, **kw):
+        '''
+        Queue an update, as for `swap`\\, without waiting for it.
+
+        Updates are applied in the order they were sent. Whichever thread finds no other applying them applies every
+        queued update in one swap, so the watches are notified once for the batch. If an update raises, the thread
+        applying them gets the exception and none of that batch is applied.
+        '''
+        self._queue.append((fn, args, kw))
+        self._drain(False)
+
+    def flush(self):
+        '''
+        Apply the queued updates, waiting for another thread that's applying them.
+        :return: The value.
+        '''
+        self._drain(True)
+        return self._value
+
+    def _drain(self, wait):
+        # Checking again after releasing the lock catches updates queued while it was held by a thread that's done.
+        while self._queue:
+            if not self._flushing.acquire(wait):
+                return
+            try:
+                updates = []
+                while self._queue:
+                    updates.append(self._queue.popleft())
+                if updates:
+                    self.swap(_apply, updates)
+            finally:
+                self._flushing.release()
+
+    def add_watch(self, key, fn):
+        '''
+        Call ``fn(key, atom, old, new)`` after the value is replaced by a different object. Watches are called in
+        the thread that replaced the value, after the replacement, possibly by several threads at once.
+        :param key: Identifies the watch, to replace or remove it.
+        '''
+        with self._lock:
+            watches = dict(self._watches)
+            watches[key] = fn
+            self._watches = watches
+
+    def remove_watch(self, key):
+        '''Stop calling the watch added with `key`\\, if there is one.'''
+        with self._lock:
+            watches = dict(self._watches)
+            watches.pop(key, None)
+            self._watches = watches
+
+    def _notify(self, old, new):
+        if old is new:
+            return
+        for key, fn in self._watches.items():
+            fn(key, self, old, new)
+
+    def __repr__(self):
+        return '<Atom {!r}>'.format(self._value)
+
+
+def _apply(value, updates):
+    for fn, args, kw in updates:
+        value = fn(value, *args, **kw)
+    return value
@@ -0,0 +1,89 @@
+'''
+Persistent-collection backends that rewritten literals can target, selected with ``pyrmute(backend=...)``.
+
+A backend names the constructors that literals and comprehensions are wrapped with, and the methods of its types
+that return an evolution of the object, which `globals.invoke` needs to know to keep the result of a standalone
+method call.
+
+The helpers in `globals` rely on the evolver protocol: ``obj.set(key, value)`` returns an updated object, and
+``obj.evolver()`` returns an object that supports ``evolver[key] = value``, ``del evolver[key]`` and
+``evolver.remove(key)``, and whose ``persistent()`` method returns the updated object.
+'''
+from pyrsistent import pmap, pset, pvector
+
+from . import frozen, globals, small
+
+
+class Backend(object):
+    '''
+    A family of persistent collections.
+    '''
+    def __init__(self, name, map, vector, set, returns_self, evolver_methods=None):
+        '''
+        :param name: The name to select this backend by.
+        :param map: Constructor for dict literals and comprehensions; must be importable by its qualified name.
+        :param vector: Constructor for list literals and comprehensions.
+        :param set: Constructor for set literals and comprehensions.
+        :param returns_self: A map of method names to the types whose methods return an evolution of the object.
+        :param evolver_methods: A map of method names to the types whose evolvers have the same method, so loops
+            calling it can use one evolver; see `globals.batch`.
+        '''
+        self.name = name
+        self.map = map
+        self.vector = vector
+        self.set = set
+        self.returns_self = returns_self
+        self.evolver_methods = evolver_methods or {}
+
+    def __repr__(self):
+        return '<Backend {}>'.format(self.name)
+
+
+#: Backends by name.
+backends = {}
+
+
+def register(backend):
+    '''
+    Make a backend available by name, and teach `globals.invoke` and `globals.batch` about its methods.
+    :param backend: A `Backend`.
+    :return: The backend.
+    '''
+    for method, types in list(backend.returns_self.items()):
+        for cls in types:
+            globals.register_returns_self(cls, (method,))
+    for method, types in list(backend.evolver_methods.items()):
+        for cls in types:
+            globals.register_evolver_methods(cls, (method,))
+    backends[backend.name] = backend
+    return backend
+
+
+def get_backend(backend):
+    '''
+    Interpret the ``backend`` argument to ``pyrmute``.
+    :param backend: None for the default, a registered name, or a `Backend`.
+    :return: A Backend.
+    '''
+    if backend is None:
+        return pyrsistent_backend
+    if isinstance(backend, Backend):
+        return backend
+    try:
+        return backends[backend]
+    except KeyError:
+        raise ValueError('Unknown backend {!r}; expected one of {}.'.format(backend, ', '.join(sorted(backends))))
+
+
+#: The default, using pyrsistent's ``pmap``, ``pvector`` and ``pset``.
+pyrsistent_backend = register(Backend('pyrsistent', pmap, pvector, pset, globals.returns_self,
+                                      globals.evolver_methods))
+
+#: Copy-on-write builtins from `frozen`.
+frozen_backend = register(Backend('frozen', frozen.fmap, frozen.fvector, frozen.fset, frozen.returns_self,
+                                  frozen.evolver_methods))
+
+#: Builtin-backed collections from `small` that become pyrsistent ones past `small.LIMIT` elements. They subclass the
+#: frozen types, so the frozen tables cover them.
+small_backend = register(Backend('small', small.smap, small.svector, small.sset, frozen.returns_self,
+                                 frozen.evolver_methods))
@@ -0,0 +1,131 @@
+'''
+Rewrites the source of a function and compiles it. This is the expensive part of decorating a function, so it's
+only imported when a function is first decorated.
+'''
+import os
+import sys
+
+from . import cache
+from .decorator import pass_defaults
+from .flags import get_flags
+from .timing import untimed
+
+
+def rewrite_function(func, env, write_source=True, interner=None, intern_returns=False, sharing=False,
+                     boundary=None, backend=None, types=None, fallback=None, guarded=None, profile=untimed, opt=None,
+                     passes=None, options=None, unchanged=None, changes=False, records=False,
+                     return_view=False):
+    '''
+    Rewrite and compile the module-level source of a function, or load it from the `cache`.
+
+    See `rewrite` for the remaining parameters.
+    :param func: The function to rewrite.
+    :param env: A dictionary that receives values the rewritten code expects as globals.
+    :param write_source: Unparse the rewritten tree.
+    :param profile: A `timing.Profile` to time each phase with.
+    :param options: A tuple of the options that change what rewritten code does, for inlining.
+    :param unchanged: How to tell that a write changes nothing; see `rewrite.unchanged_helpers`.
+    :param changes: Report writes to parameters to `changes`\\.
+    :param records: Build dict literals with fixed string keys as `records.Record`\\.
+    :param return_view: Pass returned values through `views.view`\\.
+    :return: A tuple of the compiled module code and the rewritten source, or None if it isn't written.
+    '''
+    _check_closure(func)
+    module = sys.modules[func.__module__]
+    flags = get_flags(module)
+
+    # Look the rewrite up before importing the rewriter or reading the source.
+    cache_key = None
+    if interner is None and types is None:
+        with profile('cache'):
+            stamp = _stamp(func.__code__.co_filename)
+            if stamp is not None:
+                merged = dict(pass_defaults['passes'])
+                merged.update(passes or {})
+                settings = (write_source, sharing, boundary, backend.name if backend is not None else None,
+                            pass_defaults['opt'] if opt is None else opt, sorted(merged.items()), unchanged, changes,
+                            records, return_view)
+                cache_key = cache.key(func.__code__.co_filename, func.__code__.co_firstlineno, stamp, flags, settings)
+                cached = cache.load(cache_key)
+                if cached is not None:
+                    profile.cached = True
+                    return cached
+
+    from ast import parse
+    import inspect
+    from textwrap import dedent
+    from .ast6 import relocate
+    from .passes import resolve
+    from .rewrite import rewrite
+
+    opt, passes = resolve(opt, passes)
+    with profile('getsource'):
+        lines, firstlineno = inspect.getsourcelines(func)
+        source = dedent(''.join(lines))
+        filename = inspect.getsourcefile(func)
+    namespace = vars(module)
+
+    with profile('parse'):
+        tree = relocate(parse(source, filename), firstlineno - 1, _indent(lines, source))
+    transformed = rewrite(tree, env, interner, intern_returns, sharing, boundary, backend, types, fallback, guarded,
+                          profile, opt, passes, namespace, options, unchanged, changes, records, return_view)
+    with profile('compile'):
+        code = compile(transformed, filename=filename, mode='exec', flags=flags)
+    text = None
+    if write_source:
+        with profile('show_ast'):
+            text = show_ast(transformed)
+    if profile is not untimed:
+        profile.count(transformed, env)
+    if cache_key is not None and not env:
+        cache.store(cache_key, code, text)
+    return code, text
+
+
+def _indent(lines, dedented):
+    '''How many columns dedent removed from the source lines.'''
+    for line in lines:
+        if line.strip():
+            first = line
+            break
+    else:
+        return 0
+    for line in dedented.splitlines():
+        if line.strip():
+            return len(first) - len(first.lstrip()) - (len(line) - len(line.lstrip()))
+    return 0
+
+
+def _stamp(filename):
+    '''The modification time and size of a source file, as python's own bytecode cache checks, or None if it's gone.'''
+    try:
+        stat = os.stat(filename)
+    except (OSError, TypeError, ValueError):
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+def _check_closure(func):
+    nonlocals = func.__code__.co_freevars
+    if nonlocals:
+        # To do nonlocals, we'll need to reevaluate a larger function. So what we want is a
+        # top-level decorator that does the rewrite and inner decorators that mark the code
+        # to be rewritten.
+        raise TypeError('Top level function has nonlocals {}; not supported yet.'
+                        .format(', '.join(nonlocals)))
+
+
+def show_ast(node):
+    '''
+    Convert a tree back to source, with `ast.unparse` if available, or astunparse on older versions of python.
+    '''
+    try:
+        from ast import unparse
+    except ImportError:
+        from io import StringIO
+        from astunparse import Unparser
+        from .ast6 import fill_kinds
+        with StringIO() as fh:
+            Unparser(fill_kinds(node), file=fh)
+            return fh.getvalue()
+    return unparse(node)
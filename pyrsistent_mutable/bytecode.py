@@ -0,0 +1,778 @@
+'''
+Rewrites the code object of a function rather than its source, for ``pyrmute(rewriter='bytecode')``\\.
+
+This works without the source, so it supports ``.pyc``-only deployments, zipapps and functions created with ``exec``,
+and it's much cheaper than parsing, rewriting and compiling. It makes the basic rewrites of `rewrite.RewriteAssignments`
+directly on the instructions: literals and comprehensions are wrapped with the backend's constructors, stores and
+deletes of attributes and items become calls of the helpers in `globals` whose result is stored in the variable the
+container was loaded from, and a method called as a statement has its result stored the same way. Augmented
+assignments become plain binary operations, as they do in the source rewrite. Helpers are loaded as constants.
+
+Nothing else is done: there's no interning, no sharing instrumentation, no boundary and none of the optimization
+passes. Containers loaded from globals are left alone, as is a target whose keys contain branches. Bytecode differs
+between versions of CPython, so this supports 3.6 to 3.11.
+
+3.9 builds starred and constant displays in place, as ``BUILD_LIST 0; LIST_EXTEND 1``\\, so a literal is wrapped after
+the last instruction that adds to it. 3.10 counts jumps in instructions rather than bytes and has a new line table.
+3.11 calls with ``PRECALL`` and ``CALL``\\, follows some instructions with inline caches, and keeps the handlers of
+``try`` and ``with`` blocks in an exception table. Calls the rewrite adds there pass the first argument where the bound
+method's self goes, ``helper, obj, key, value; PRECALL 2; CALL 2``\\, so they need no ``NULL`` below the callable.
+'''
+import dis
+import opcode
+import sys
+from types import CodeType, FunctionType
+
+from . import globals
+from .decorator import raw
+
+#: The versions of CPython whose bytecode this understands.
+supported = ((3, 6), (3, 7), (3, 8), (3, 9), (3, 10), (3, 11))
+
+_py39 = sys.version_info >= (3, 9)
+_py311 = sys.version_info >= (3, 11)
+_op = dis.opmap
+_jumps = frozenset(dis.hasjrel) | frozenset(dis.hasjabs)
+_relative = frozenset(dis.hasjrel)
+_backward = frozenset(code for name, code in _op.items() if 'BACKWARD' in name)
+#: How many bytes a jump's argument counts in.
+_unit = 2 if sys.version_info >= (3, 10) else 1
+#: How many inline cache entries follow each instruction.
+_caches = getattr(opcode, '_inline_cache_entries', None) or [0] * 256
+_free = frozenset(dis.hasfree)
+#: Instructions after which execution doesn't continue with the next one.
+_no_fallthrough = frozenset(_op[name] for name in (
+    'RETURN_VALUE', 'RAISE_VARARGS', 'RERAISE', 'JUMP_FORWARD', 'JUMP_ABSOLUTE', 'JUMP_BACKWARD',
+    'JUMP_BACKWARD_NO_INTERRUPT', 'CONTINUE_LOOP', 'BREAK_LOOP') if name in _op)
+#: Instructions 3.11 starts a code object with, before its body.
+_prologue = frozenset(_op[name] for name in ('RESUME', 'COPY_FREE_VARS', 'MAKE_CELL') if name in _op)
+#: How jumps change the stack, when taken and when not, where ``dis.stack_effect`` can't tell us.
+_branch_effects = {
+    'POP_JUMP_IF_FALSE': (-1, -1),
+    'POP_JUMP_IF_TRUE': (-1, -1),
+    'JUMP_IF_FALSE_OR_POP': (0, -1),
+    'JUMP_IF_TRUE_OR_POP': (0, -1),
+    'FOR_ITER': (-1, 1),
+    'SETUP_WITH': (6, 1),
+    'SETUP_ASYNC_WITH': (6, 0),
+}
+#: The instructions that build literals, and the backend constructor each is wrapped with.
+_literals = dict((_op[name], kind) for name, kind in (
+    ('BUILD_LIST', 'vector'), ('BUILD_LIST_UNPACK', 'vector'), ('BUILD_SET', 'set'), ('BUILD_SET_UNPACK', 'set'),
+    ('BUILD_MAP', 'map'), ('BUILD_CONST_KEY_MAP', 'map'), ('BUILD_MAP_UNPACK', 'map')) if name in _op)
+#: Instructions that take a map or list as the arguments of a call, or make a tuple of it, so it isn't a literal.
+_arguments = frozenset(_op[name] for name in (
+    'BUILD_MAP_UNPACK_WITH_CALL', 'CALL_FUNCTION_EX', 'DICT_MERGE', 'LIST_TO_TUPLE') if name in _op)
+#: Instructions that add the value on top of the stack to the collection below it, from 3.9, and those of them that
+#: add its elements, so a literal they take is copied rather than kept.
+_extends = frozenset(_op[name] for name in (
+    'LIST_APPEND', 'LIST_EXTEND', 'SET_ADD', 'SET_UPDATE', 'DICT_UPDATE') if name in _op)
+_copies = frozenset(_op[name] for name in ('LIST_EXTEND', 'SET_UPDATE', 'DICT_UPDATE') if name in _op)
+_comprehensions = {'<listcomp>': 'vector', '<setcomp>': 'set', '<dictcomp>': 'map'}
+#: Where the variable a container was loaded from is stored back.
+_stores = {_op['LOAD_FAST']: _op['STORE_FAST'], _op['LOAD_DEREF']: _op['STORE_DEREF']}
+_inplace = dict((code, _op['BINARY' + name[len('INPLACE'):]])
+                for name, code in _op.items() if name.startswith('INPLACE_'))
+#: 3.11 has a single BINARY_OP, whose argument numbers the in-place operators after the 13 binary ones.
+_inplace_ops = 13
+#: The instruction that calls a function.
+_call = _op['CALL'] if _py311 else _op['CALL_FUNCTION']
+_calls = frozenset(_op[name] for name in ('CALL_FUNCTION', 'CALL_FUNCTION_KW', 'CALL_FUNCTION_EX', 'CALL')
+                   if name in _op)
+#: The instructions that put the result of an augmented assignment under an item or an attribute target, and those that
+#: copy the target to read it first, as pairs of the name and argument.
+if _py311:
+    _rotate = {True: (('SWAP', 3), ('SWAP', 2)), False: (('SWAP', 2),)}
+    _duplicate = {True: (('COPY', 2), ('COPY', 2)), False: (('COPY', 1),)}
+else:
+    _rotate = {True: (('ROT_THREE', None),), False: (('ROT_TWO', None),)}
+    _duplicate = {True: (('DUP_TOP_TWO', None),), False: (('DUP_TOP', None),)}
+#: A local the value of a store is kept in while the helpers are loaded; the dot keeps it from clashing with names.
+_temp = '.pyrmute'
+_missing = object()
+
+
+def check():
+    '''Raise ValueError if this version of python can't be rewritten by the bytecode.'''
+    if sys.implementation.name != 'cpython' or sys.version_info[:2] not in supported:
+        raise ValueError('The bytecode rewriter supports CPython {}, not {} {}.'.format(
+            ' to '.join('.'.join(map(str, version)) for version in (supported[0], supported[-1])),
+            sys.implementation.name, '.'.join(map(str, sys.version_info[:2]))))
+
+
+def rewrite_bytecode(func, backend, unchanged=None):
+    '''
+    Rewrite a function's code object.
+    :param func: The function to rewrite.
+    :param backend: The `Backend` whose constructors literals are wrapped with.
+    :param unchanged: How to tell that a write changes nothing; see `rewrite.unchanged_helpers`.
+    :return: A new function with the same globals, closure and defaults.
+    '''
+    check()
+    helpers = {}
+    if unchanged is not None:
+        from .rewrite import unchanged_helpers
+        helpers = unchanged_helpers
+    code = _Rewriter(backend, helpers.get(unchanged, {}), helpers.get('identical', {}),
+                     func.__globals__).code(func.__code__)
+    result = FunctionType(code, func.__globals__, func.__name__, func.__defaults__, func.__closure__)
+    result.__kwdefaults__ = func.__kwdefaults__
+    result.__dict__.update(func.__dict__)
+    for attr in ('__doc__', '__annotations__', '__qualname__', '__module__'):
+        setattr(result, attr, getattr(func, attr))
+    return result
+
+
+class _Instr(object):
+    '''An instruction; jumps refer to the instruction they go to, so instructions can be added and removed.'''
+    __slots__ = ('op', 'arg', 'line', 'target')
+
+    def __init__(self, op, arg=None, line=None, target=None):
+        self.op = op
+        self.arg = arg
+        self.line = line
+        self.target = target
+
+    def copy(self, line):
+        return _Instr(self.op, self.arg, line, self.target)
+
+    def __repr__(self):
+        return '<{} {}>'.format(dis.opname[self.op], self.arg)
+
+
+class _Rewriter(object):
+    '''
+    Rewrites a code object and the code objects of nested functions and comprehensions.
+    :param backend: The `Backend` whose constructors literals are wrapped with.
+    :param leaf: Replacements for the helpers that store an item or an attribute, for ``unchanged``.
+    :param parent: The same for stores into containers of other containers.
+    :param namespace: The globals of the function, to find the package's `raw` in.
+    '''
+    def __init__(self, backend, leaf, parent, namespace):
+        self.backend = backend
+        self.leaf = leaf
+        self.parent = parent
+        self.namespace = namespace
+
+    def code(self, code):
+        rewrite = _Code(self, code)
+        rewrite.run()
+        return rewrite.assemble()
+
+
+class _Code(object):
+    '''The rewrite of one code object.'''
+    def __init__(self, rewriter, code):
+        self.rewriter = rewriter
+        self.co = code
+        self.instrs, self.handlers = _decode(code)
+        self.index = dict((id(instr), n) for n, instr in enumerate(self.instrs))
+        self.first = next((n for n, instr in enumerate(self.instrs) if instr.op not in _prologue), 0)
+        self.depth = _depths(self.instrs, self.index)
+        self.post = [None if depth is None else depth + _effect(instr, False)
+                     for instr, depth in zip(self.instrs, self.depth)]
+        self.targets = set(id(instr.target) for instr in self.instrs if instr.target is not None)
+        self.consts = list(code.co_consts)
+        self.varnames = list(code.co_varnames)
+        self.before, self.replace, self.after = {}, {}, {}
+        self.extra = 0
+        self.raw = set()
+        self._temp = None
+
+    def run(self):
+        self.find_raw()
+        instrs = self.instrs
+        for n, instr in enumerate(instrs):
+            if n in self.raw:
+                continue
+            name = dis.opname[instr.op]
+            if name in ('STORE_SUBSCR', 'STORE_ATTR', 'DELETE_SUBSCR', 'DELETE_ATTR'):
+                self.store(n)
+            elif name in ('LOAD_METHOD', 'LOAD_ATTR'):
+                self.method(n)
+            elif instr.op in _inplace:
+                self.replace[id(instr)] = [_Instr(_inplace[instr.op], None, instr.line)]
+            elif name == 'BINARY_OP' and instr.arg >= _inplace_ops:
+                self.replace[id(instr)] = [_Instr(instr.op, instr.arg - _inplace_ops, instr.line)]
+        # MAKE_FUNCTION takes the qualified name from the stack before 3.11.
+        named = not _py311
+        for n, instr in enumerate(instrs):
+            if n in self.raw or id(instr) in self.replace:
+                continue
+            if instr.op in _literals and not (n == self.first and self.co.co_name in _comprehensions):
+                built = self.built(n)
+                if built is not None:
+                    self.wrap(instrs[built], _literals[instr.op])
+            elif instr.op == _op['MAKE_FUNCTION'] and n >= 1 + named:
+                kind = _comprehensions.get(getattr(self.const_of(instrs[n - 1 - named]), 'co_name', None))
+                call = self.consumer(n)
+                if kind is not None and call is not None and instrs[call].op == _call:
+                    self.wrap(instrs[call], kind)
+        for n, instr in enumerate(instrs):
+            if instr.op == _op['LOAD_CONST'] and n not in self.raw and isinstance(self.consts[instr.arg], CodeType):
+                self.consts[instr.arg] = self.rewriter.code(self.consts[instr.arg])
+
+    def find_raw(self):
+        '''Find the instructions of ``with raw():`` blocks, which are left alone, as is code defined in them.'''
+        instrs = self.instrs
+        # 3.11 calls with PRECALL, CALL, and finds the end of the block in the exception table.
+        called = 2 + _py311
+        for n, instr in enumerate(instrs):
+            if dis.opname[instr.op] not in ('SETUP_WITH', 'BEFORE_WITH') or n < called or instrs[n - 1].op not in (
+                    _call, _op.get('CALL_METHOD')) or instrs[n - 1].arg != 0:
+                continue
+            end = instr.target if instr.target is not None else self.handler(n + 1)
+            if end is not None and self.loaded(n - called) is raw:
+                self.raw.update(range(n + 1, self.index[id(end)]))
+
+    def handler(self, n):
+        '''The instruction an exception raised by instruction n goes to, from the exception table, or None.'''
+        for first, end, target, _, _ in self.handlers:
+            if self.index[id(first)] <= n < (len(self.instrs) if end is None else self.index[id(end)]):
+                return target
+        return None
+
+    def loaded(self, n):
+        '''The value a global, or an attribute of one, loaded by the instruction at n refers to, or `_missing`.'''
+        instr = self.instrs[n]
+        name = dis.opname[instr.op]
+        if name in ('LOAD_GLOBAL', 'LOAD_NAME'):
+            # From 3.11 the lowest bit of LOAD_GLOBAL's argument says whether it pushes a NULL first.
+            arg = instr.arg >> 1 if _py311 and name == 'LOAD_GLOBAL' else instr.arg
+            return self.rewriter.namespace.get(self.co.co_names[arg], _missing)
+        if name in ('LOAD_ATTR', 'LOAD_METHOD') and n > 0:
+            return getattr(self.loaded(n - 1), self.co.co_names[instr.arg], _missing)
+        return _missing
+
+    def const_of(self, instr):
+        return self.consts[instr.arg] if instr.op == _op['LOAD_CONST'] else None
+
+    def consumer(self, n):
+        '''The index of the instruction that takes the value instruction n leaves on the stack, or None if not found.'''
+        level = self.post[n]
+        for m in range(n + 1, len(self.instrs)):
+            if self.depth[m] is None or self.depth[m] < level:
+                return None
+            if self.post[m] <= level:
+                return m
+        return None
+
+    def built(self, n):
+        '''
+        The index of the instruction that finishes the literal instruction n starts, following those that add to it in
+        place, or None if it's the arguments of a call, becomes a tuple or is copied into another literal.
+        '''
+        level = self.post[n]
+        while True:
+            m = self.consumer(n)
+            if m is None:
+                return n
+            op = self.instrs[m].op
+            if op in _arguments:
+                return None
+            if op not in _extends:
+                return n
+            if self.post[m] < level:
+                return None if op in _copies else n
+            if self.instrs[m].arg != 1:
+                return n
+            n = m
+
+    def start(self, end, level, straight=True):
+        '''
+        The index of the first of the instructions before `end` that push a value onto a stack `level` deep.
+        :param straight: Return None if those instructions branch, since they'll be copied.
+        '''
+        for n in range(end - 1, -1, -1):
+            depth = self.depth[n]
+            if depth is None:
+                return None
+            if depth <= level:
+                return n if depth == level and not (straight and self.branches(n, end)) else None
+        return None
+
+    def branches(self, start, end):
+        '''Whether the instructions from start to end jump, or are jumped into.'''
+        return any(instr.op in _jumps for instr in self.instrs[start:end]) or \
+            any(id(instr) in self.targets for instr in self.instrs[start + 1:end])
+
+    def path(self, start, end):
+        '''
+        Split the instructions that load a container into the variable it's from and steps into it.
+        :return: A tuple of the load of the variable and a list of steps, each the name of an attribute or a list of
+            instructions for a key, or None if the container isn't loaded from a local variable like that.
+        '''
+        base = self.instrs[start]
+        if base.op not in _stores or self.branches(start, end):
+            return None
+        steps = []
+        level = self.depth[start] + 1
+        n = start + 1
+        while n < end:
+            for m in range(n, end):
+                if self.post[m] == level:
+                    break
+            else:
+                return None
+            last = self.instrs[m]
+            if m == n and last.op == _op['LOAD_ATTR']:
+                steps.append(self.co.co_names[last.arg])
+            elif m > n and last.op == _op['BINARY_SUBSCR']:
+                steps.append(self.instrs[n:m])
+            else:
+                return None
+            n = m + 1
+        return base, steps
+
+    def store(self, n):
+        '''Rewrite a store or delete of an attribute or an item, and an augmented assignment that ends with one.'''
+        instrs = self.instrs
+        instr = instrs[n]
+        name = dis.opname[instr.op]
+        depth = self.depth[n]
+        item = name.endswith('SUBSCR')
+        deleting = name.startswith('DELETE')
+        rotate = n - len(_rotate[item])
+        augmented = not deleting and rotate >= 0 and self.matches(rotate, _rotate[item])
+        end = n
+        if augmented:
+            # obj [key] DUP_TOP[_TWO] ... INPLACE_<op> ROT_THREE|ROT_TWO STORE_SUBSCR|STORE_ATTR, or from 3.11
+            # obj [key] COPY 2 COPY 2|COPY 1 ... BINARY_OP [SWAP 3] SWAP 2 STORE_SUBSCR|STORE_ATTR
+            end = self.start(rotate, depth - 1, straight=False)
+            if end is None or not self.matches(end, _duplicate[item]):
+                return
+            depth -= 1
+        key = self.start(end, depth - 1) if item else end
+        if key is None:
+            return
+        container = self.start(key, depth - 1 - item)
+        path = None if container is None else self.path(container, key)
+        if path is None:
+            return
+        base, steps = path
+        last = instrs[key:end] if item else self.co.co_names[instr.arg]
+        line = instr.line
+        if deleting:
+            helper = globals.del_slice if item else globals.del_attr
+            value = [self.load(helper, line)] + self.container(base, steps, line) + self.key(last, line) + \
+                self.call(2, line)
+            emitted = self.update(base, steps, value, line)
+        else:
+            value = [_Instr(_op['LOAD_FAST'], self.temp(), line)]
+            emitted = [_Instr(_op['STORE_FAST'], self.temp(), line)]
+            emitted += [_Instr(_op['POP_TOP'], None, line) for _ in range(augmented + item * augmented)]
+            emitted += self.update(base, steps + [last], value, line)
+        self.extra = max(self.extra, 2 * len(emitted))
+        if augmented:
+            for removed in instrs[rotate:n]:
+                self.replace[id(removed)] = []
+            self.replace[id(instr)] = emitted
+        else:
+            for removed in instrs[container:n]:
+                self.replace[id(removed)] = []
+            self.replace[id(instr)] = emitted
+
+    def method(self, n):
+        '''Rewrite ``obj.method(...)`` as a statement to store the result of `globals.invoke` in ``obj``\\.'''
+        instrs = self.instrs
+        level = self.depth[n]
+        attribute = dis.opname[instrs[n].op] == 'LOAD_ATTR'
+        # From 3.11 a NULL is pushed below an attribute that's called, so the result goes where that was.
+        null = _py311 and attribute
+        call = None
+        for m in range(n + 1, len(instrs) - 1):
+            after = self.post[m]
+            if after is None or after < level - null:
+                break
+            if after == level - null:
+                call = m
+                break
+            if null and after == level and instrs[m].op != _op['PRECALL']:
+                # Something else took the attribute, as LOAD_ATTR does in r.tags.extend(*args).
+                break
+        if call is None or instrs[call + 1].op != _op['POP_TOP']:
+            return
+        calling = dis.opname[instrs[call].op]
+        if not attribute:
+            if calling not in ('CALL_METHOD', 'CALL'):
+                return
+        elif instrs[call].op not in _calls:
+            return
+        container = self.start(n, level - 1)
+        if null and (container is None or container == 0 or dis.opname[instrs[container - 1].op] != 'PUSH_NULL' or
+                     id(instrs[container]) in self.targets):
+            return
+        path = None if container is None else self.path(container, n)
+        if path is None:
+            return
+        base, steps = path
+        instr = instrs[call]
+        line = instr.line
+        before = self.parents(base, steps, line)
+        if null:
+            self.replace[id(instrs[container - 1])] = []
+            if calling == 'CALL_FUNCTION_EX':
+                before.append(_Instr(_op['PUSH_NULL'], None, line))
+        before.append(self.load(globals.invoke, line))
+        method = [_Instr(_op['LOAD_CONST'], self.constant(self.co.co_names[instrs[n].arg]), line)]
+        if calling == 'CALL_FUNCTION_EX':
+            # invoke(*((obj, 'method') + tuple(args)), **kwargs), adding to a list from 3.9.
+            args_end = call
+            if instr.arg & 1:
+                args_end = self.start(call, level + 1)
+                if args_end is None:
+                    return
+            if _py39:
+                method.append(_Instr(_op['BUILD_LIST'], 2, line))
+                self.before[id(instrs[args_end])] = [_Instr(_op['LIST_EXTEND'], 1, line),
+                                                     _Instr(_op['LIST_TO_TUPLE'], None, line)]
+            else:
+                method.append(_Instr(_op['BUILD_TUPLE'], 2, line))
+                self.before[id(instrs[args_end])] = [_Instr(_op['BUILD_TUPLE_UNPACK_WITH_CALL'], 2, line)]
+            calls = [instr]
+        elif _py311:
+            # KW_NAMES, if any, stays where it is, ahead of PRECALL.
+            self.replace[id(instrs[call - 1])] = [_Instr(_op['PRECALL'], instr.arg + 1, line)]
+            calls = [_Instr(instr.op, instr.arg + 1, line)]
+        else:
+            op = _op['CALL_FUNCTION'] if calling == 'CALL_METHOD' else instr.op
+            calls = [_Instr(op, instr.arg + 2, line)]
+        for _ in steps:
+            calls += self.call(3, line)
+        self.before[id(instrs[container])] = before
+        self.replace[id(instrs[n])] = method
+        self.replace[id(instr)] = calls
+        self.replace[id(instrs[call + 1])] = [_Instr(_stores[base.op], base.arg, line)]
+        self.extra = max(self.extra, 2 * (len(before) + len(method)))
+
+    def update(self, base, steps, value, line):
+        '''
+        Store a new value at the end of a path into a container, as
+        ``base = set(base, step, set(base[step], step2, value))``\\.
+        :param value: Instructions that leave the new value on the stack.
+        '''
+        emitted = self.parents(base, steps, line) + value
+        for _ in steps:
+            emitted += self.call(3, line)
+        return emitted + [_Instr(_stores[base.op], base.arg, line)]
+
+    def parents(self, base, steps, line):
+        '''Load the helpers, containers and keys for the calls that store each step of a path.'''
+        emitted = []
+        for n, step in enumerate(steps):
+            helper = globals.set_via_attr if isinstance(step, str) else globals.set_via_slice
+            helper = (self.rewriter.leaf if n == len(steps) - 1 else self.rewriter.parent).get(helper, helper)
+            emitted.append(self.load(helper, line))
+            emitted += self.container(base, steps[:n], line)
+            emitted += self.key(step, line)
+        return emitted
+
+    def container(self, base, steps, line):
+        '''Load the container at the end of a path.'''
+        emitted = [base.copy(line)]
+        for step in steps:
+            if isinstance(step, str):
+                emitted.append(_Instr(_op['LOAD_ATTR'], self.co.co_names.index(step), line))
+            else:
+                emitted += self.key(step, line) + [_Instr(_op['BINARY_SUBSCR'], None, line)]
+        return emitted
+
+    def key(self, step, line):
+        if isinstance(step, str):
+            return [_Instr(_op['LOAD_CONST'], self.constant(step), line)]
+        return [instr.copy(line) for instr in step]
+
+    def wrap(self, instr, kind):
+        '''Pass the value an instruction leaves on the stack to a constructor of the backend.'''
+        line = instr.line
+        swap = _Instr(_op['SWAP'], 2, line) if _py311 else _Instr(_op['ROT_TWO'], None, line)
+        self.after[id(instr)] = [self.load(getattr(self.rewriter.backend, kind), line), swap] + self.call(1, line)
+        self.extra = max(self.extra, 1)
+
+    def load(self, value, line):
+        return _Instr(_op['LOAD_CONST'], self.constant(value), line)
+
+    def call(self, count, line):
+        '''Call the function below `count` arguments; from 3.11 as a method, with the first argument as its self.'''
+        if _py311:
+            return [_Instr(_op['PRECALL'], count - 1, line), _Instr(_call, count - 1, line)]
+        return [_Instr(_call, count, line)]
+
+    def matches(self, n, expected):
+        '''Whether the instructions from n have the names and arguments of `expected`\\.'''
+        return all(dis.opname[instr.op] == name and instr.arg == arg
+                   for instr, (name, arg) in zip(self.instrs[n:n + len(expected)], expected))
+
+    def constant(self, value):
+        for n, const in enumerate(self.consts):
+            if const is value or type(const) is str and type(value) is str and const == value:
+                return n
+        self.consts.append(value)
+        return len(self.consts) - 1
+
+    def temp(self):
+        if self._temp is None:
+            self._temp = len(self.varnames)
+            self.varnames.append(_temp)
+        return self._temp
+
+    def assemble(self):
+        '''Build the rewritten code object.'''
+        if not (self.before or self.replace or self.after) and self.consts == list(self.co.co_consts):
+            return self.co
+        instrs = []
+        position = {}
+        for instr in self.instrs:
+            position[id(instr)] = len(instrs)
+            instrs += self.before.get(id(instr), [])
+            instrs += self.replace.get(id(instr), [instr])
+            instrs += self.after.get(id(instr), [])
+        co = self.co
+        added = len(self.varnames) - len(co.co_varnames)
+        for instr in instrs:
+            if instr.target is not None:
+                instr.target = instrs[position[id(instr.target)]]
+            # From 3.11 cells and free variables are numbered after the locals, so a new local moves them.
+            if _py311 and instr.op in _free and instr.arg >= len(co.co_varnames):
+                instr.arg += added
+        code, offsets = _encode(instrs)
+        lines = _line_table(instrs, offsets, co.co_firstlineno)
+        if not hasattr(co, 'replace'):
+            return CodeType(co.co_argcount, co.co_kwonlyargcount, len(self.varnames), co.co_stacksize + self.extra,
+                            co.co_flags, code, tuple(self.consts), co.co_names, tuple(self.varnames), co.co_filename,
+                            co.co_name, co.co_firstlineno, lines, co.co_freevars, co.co_cellvars)
+        fields = {'co_nlocals': len(self.varnames), 'co_stacksize': co.co_stacksize + self.extra, 'co_code': code,
+                  'co_consts': tuple(self.consts), 'co_varnames': tuple(self.varnames),
+                  'co_linetable' if _unit == 2 else 'co_lnotab': lines}
+        if _py311:
+            handlers = []
+            for first, end, target, depth, lasti in self.handlers:
+                start, end = position[id(first)], len(instrs) if end is None else position[id(end)]
+                if start < end:
+                    handlers.append((offsets[start], offsets[end], offsets[position[id(target)]], depth, lasti))
+            fields['co_exceptiontable'] = _exception_table(handlers)
+        return co.replace(**fields)
+
+
+def _decode(code):
+    '''
+    The instructions of a code object, leaving out ``EXTENDED_ARG`` and inline caches, and its exception table.
+    :return: A tuple of the instructions and a list of the entries of the table, each the first and the next
+        instruction it covers, where None is the end, the instruction it goes to, the depth of the stack there and
+        whether it pushes the offset of the instruction that raised.
+    '''
+    instrs = []
+    at = {}
+    waiting = []
+    jumps = []
+    line = code.co_firstlineno
+    for ins in dis.get_instructions(code):
+        at[ins.offset] = len(instrs)
+        if ins.starts_line is not None:
+            line = ins.starts_line
+        if ins.opcode == _op['EXTENDED_ARG']:
+            waiting.append(ins.offset)
+            continue
+        for offset in waiting:
+            at[offset] = len(instrs)
+        waiting = []
+        instr = _Instr(ins.opcode, ins.arg, line)
+        if ins.opcode in _jumps:
+            jumps.append((instr, ins.argval))
+        instrs.append(instr)
+    for instr, offset in jumps:
+        instr.target = instrs[at[offset]]
+    handlers = []
+    values = list(_varints(getattr(code, 'co_exceptiontable', b'')))
+    for n in range(0, len(values), 4):
+        start, length, target, depth_lasti = values[n:n + 4]
+        end = 2 * (start + length)
+        handlers.append((instrs[at[2 * start]], instrs[at[end]] if end in at else None, instrs[at[2 * target]],
+                         depth_lasti >> 1, depth_lasti & 1))
+    return instrs, handlers
+
+
+def _varints(data):
+    '''Read the numbers of an exception table, each in groups of 6 bits, the first first, flagged 0x40 but the last.'''
+    value = 0
+    for byte in data:
+        value = value << 6 | byte & 0x3f
+        if not byte & 0x40:
+            yield value
+            value = 0
+
+
+def _effect(instr, jump):
+    '''How an instruction changes the depth of the stack, when it jumps or not.'''
+    name = dis.opname[instr.op]
+    if name in _branch_effects:
+        return _branch_effects[name][not jump]
+    if instr.op in _jumps and sys.version_info >= (3, 8):
+        return dis.stack_effect(instr.op, instr.arg, jump=jump)
+    if name.startswith('SETUP_') or name in ('JUMP_FORWARD', 'JUMP_ABSOLUTE', 'CONTINUE_LOOP'):
+        return 6 if jump and name in ('SETUP_EXCEPT', 'SETUP_FINALLY') else 0
+    return dis.stack_effect(instr.op, instr.arg if instr.op >= dis.HAVE_ARGUMENT else None)
+
+
+def _depths(instrs, index):
+    '''
+    The depth of the stack before each instruction, and after the last, relative to an arbitrary level for each block
+    of code, or None where it isn't known.
+
+    The rewrite only compares depths within a statement, so the levels only need to be consistent within one. Code
+    after a jump that isn't taken from anywhere before it gets its level from a later jump, or starts again at 0.
+    '''
+    depth = [None] * (len(instrs) + 1)
+    incoming = {}
+    current = 0
+    for n, instr in enumerate(instrs):
+        if current is None:
+            current = incoming.get(n)
+            if current is None:
+                current = incoming[n] = 0
+        depth[n] = current
+        if instr.target is not None:
+            target = index[id(instr.target)]
+            level = current + _effect(instr, True)
+            if depth[target] is None:
+                incoming.setdefault(target, level)
+        current = None if instr.op in _no_fallthrough else current + _effect(instr, False)
+    depth[len(instrs)] = current
+    return depth
+
+
+def _encode(instrs):
+    '''
+    Assemble instructions into a code string, adding ``EXTENDED_ARG`` where needed and inline caches after.
+    :return: A tuple of the code string and the offset of each instruction, and of the end.
+    '''
+    sizes = [1] * len(instrs)
+    index = dict((id(instr), n) for n, instr in enumerate(instrs))
+    while True:
+        offsets = []
+        offset = 0
+        for instr, size in zip(instrs, sizes):
+            offsets.append(offset)
+            offset += 2 * (size + _caches[instr.op])
+        offsets.append(offset)
+        args = []
+        changed = False
+        for n, instr in enumerate(instrs):
+            arg = instr.arg or 0
+            if instr.target is not None:
+                arg = offsets[index[id(instr.target)]]
+                if instr.op in _relative:
+                    arg -= offsets[n + 1]
+                    if instr.op in _backward:
+                        arg = -arg
+                arg //= _unit
+            size = 1 + (arg > 0xff) + (arg > 0xffff) + (arg > 0xffffff)
+            if size > sizes[n]:
+                sizes[n] = size
+                changed = True
+            args.append(arg)
+        if not changed:
+            break
+    code = bytearray()
+    for n, instr in enumerate(instrs):
+        for shift in range(8 * (sizes[n] - 1), 0, -8):
+            code += bytes((_op['EXTENDED_ARG'], (args[n] >> shift) & 0xff))
+        code += bytes((instr.op, args[n] & 0xff))
+        code += bytes(2 * _caches[instr.op])
+    return bytes(code), offsets
+
+
+def _lines(instrs, offsets, firstlineno):
+    '''The runs of instructions on each line, as tuples of their offset, the end of the run, and the change of line.'''
+    runs = []
+    last = firstlineno
+    for n, instr in enumerate(instrs):
+        line = last if instr.line is None else instr.line
+        if runs and line == last:
+            runs[-1][1] = offsets[n + 1]
+        else:
+            runs.append([offsets[n], offsets[n + 1], line - last])
+        last = line
+    return runs
+
+
+def _lnotab(instrs, offsets, firstlineno):
+    '''The line number table before 3.10: pairs of the bytes and the lines each line starts after the last.'''
+    lnotab = bytearray()
+    last_offset = 0
+    for start, _, line_delta in _lines(instrs, offsets, firstlineno):
+        if not line_delta:
+            continue
+        offset_delta = start - last_offset
+        while offset_delta > 255:
+            lnotab += bytes((255, 0))
+            offset_delta -= 255
+        while line_delta > 127:
+            lnotab += bytes((offset_delta, 127))
+            offset_delta, line_delta = 0, line_delta - 127
+        while line_delta < -128:
+            lnotab += bytes((offset_delta, 0x80))
+            offset_delta, line_delta = 0, line_delta + 128
+        lnotab += bytes((offset_delta, line_delta & 0xff))
+        last_offset = start
+    return bytes(lnotab)
+
+
+def _linetable(instrs, offsets, firstlineno):
+    '''The line table of 3.10: pairs of the bytes in a range and its line after the last, up to 254 and 127.'''
+    table = bytearray()
+    for start, end, line_delta in _lines(instrs, offsets, firstlineno):
+        while abs(line_delta) > 127:
+            step = 127 if line_delta > 0 else -127
+            table += bytes((0, step & 0xff))
+            line_delta -= step
+        length = end - start
+        while length > 254:
+            table += bytes((254, line_delta & 0xff))
+            length, line_delta = length - 254, 0
+        table += bytes((length, line_delta & 0xff))
+    return bytes(table)
+
+
+def _locations(instrs, offsets, firstlineno):
+    '''
+    The location table of 3.11, with lines but no columns: an entry for each up to 8 code units, a byte of 0xe8 and
+    the length less one, then the change of line, twice its size, plus one if it's negative.
+    '''
+    table = bytearray()
+    for start, end, line_delta in _lines(instrs, offsets, firstlineno):
+        units = (end - start) // 2
+        while units:
+            length = min(units, 8)
+            table.append(0xe8 | length - 1)
+            value = -line_delta << 1 | 1 if line_delta < 0 else line_delta << 1
+            while value >= 0x40:
+                table.append(0x40 | value & 0x3f)
+                value >>= 6
+            table.append(value)
+            units, line_delta = units - length, 0
+    return bytes(table)
+
+
+_line_table = _locations if _py311 else _linetable if _unit == 2 else _lnotab
+
+
+def _exception_table(handlers):
+    '''
+    Encode an exception table from tuples of the offsets of the start, the end and the target, the depth and lasti.
+    Each number is in code units, in groups of 6 bits as `_varints` reads them, and the first of an entry is flagged
+    0x80.
+    '''
+    table = bytearray()
+    for start, end, target, depth, lasti in handlers:
+        for n, value in enumerate((start // 2, (end - start) // 2, target // 2, depth << 1 | lasti)):
+            groups = [value & 0x3f]
+            while value > 0x3f:
+                value >>= 6
+                groups.append(value & 0x3f)
+            groups.reverse()
+            groups = [group | 0x40 for group in groups[:-1]] + groups[-1:]
+            if n == 0:
+                groups[0] |= 0x80
+            table += bytes(groups)
+    return bytes(table)
@@ -0,0 +1,98 @@
+'''
+A cache of rewritten code, so processes that decorate the same functions don't parse and rewrite them again.
+
+Every rewrite is kept in memory. To share them with the workers of a process pool that imports your modules afresh,
+as with the ``spawn`` start method, pass them to the workers' initializer:
+
+    pool = ProcessPoolExecutor(initializer=cache.install, initargs=(cache.export(),))
+
+Set ``PYRMUTE_CACHE_DIR`` to a directory to keep them on disk as well, so they're shared by every process and survive
+restarts.
+
+Entries are keyed on where the function is, the modification time and size of its file, as python's own bytecode
+cache checks, and the options it was rewritten with, so a hit needn't read the source. Rewrites that bind runtime
+values, such as an interner or a specialization, aren't cached.
+'''
+import os
+import sys
+
+#: Bump when the rewriter produces different code for the same source.
+FORMAT = 1
+
+_entries = {}
+
+
+def key(filename, firstlineno, stamp, flags, options):
+    '''
+    Compute the key of a rewrite.
+    :param stamp: The modification time and size of the file.
+    :param options: A tuple of the options that affect the rewrite; it must have a stable ``repr``.
+    :return: A string usable as a file name.
+    '''
+    from hashlib import sha1
+    parts = (FORMAT, sys.implementation.cache_tag, filename, firstlineno, stamp, flags, options)
+    return sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def load(key):
+    '''
+    Look up a rewrite.
+    :return: A tuple of the code object and the rewritten source, or None.
+    '''
+    from marshal import loads
+    data = _entries.get(key)
+    if data is None:
+        path = _path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+        except (IOError, OSError):
+            return None
+        _entries[key] = data
+    try:
+        return loads(data)
+    except (EOFError, TypeError, ValueError):
+        return None
+
+
+def store(key, code, source):
+    '''
+    Save a rewrite.
+    :param code: The compiled module code.
+    :param source: The rewritten source, or None if it isn't being written.
+    '''
+    from marshal import dumps
+    data = _entries[key] = dumps((code, source))
+    path = _path(key)
+    if path is not None:
+        temp = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            with open(temp, 'wb') as fh:
+                fh.write(data)
+            os.replace(temp, path)
+        except (IOError, OSError):
+            pass
+
+
+def export():
+    '''Get the rewrites made or loaded by this process, to pass to `install`.'''
+    return dict(_entries)
+
+
+def install(entries):
+    '''Add rewrites exported by another process.'''
+    _entries.update(entries)
+
+
+def clear():
+    '''Forget the rewrites held in memory; files in ``PYRMUTE_CACHE_DIR`` are left alone.'''
+    _entries.clear()
+
+
+def _path(key):
+    directory = os.environ.get('PYRMUTE_CACHE_DIR')
+    if not directory:
+        return None
+    return os.path.join(directory, key + '.pyrmute')
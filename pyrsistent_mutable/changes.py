@@ -0,0 +1,110 @@
+'''
+Change logs of rewritten functions.
+
+Decorate a function with ``pyrmute(changes=True)`` and call it through `collect` to get every write it made to its
+parameters as it made them, so a cache or replica can be updated without comparing the old and new values.
+
+A path starts with the name of the parameter, followed by the key of each item and an `Attr` for each attribute on
+the way to what was written: ``state['users'][3].name = n`` is recorded with the path
+``('state', 'users', 3, Attr('name'))``\\. A path that didn't exist before the write, or doesn't after it, has the
+value `missing` there. Builtin values that the rewrite changes in place are the same object before and after.
+'''
+from collections import namedtuple
+from threading import local
+
+#: A write the function made: the path to it, the operation, which is 'set', 'delete' or the name of the method
+#: called, and the values at the path before and after.
+Change = namedtuple('Change', 'path op old new')
+
+#: An attribute on a path.
+Attr = namedtuple('Attr', 'name')
+
+
+class _Missing(object):
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'missing'
+
+    def __reduce__(self):
+        return 'missing'
+
+
+#: The value of a path that doesn't exist.
+missing = _Missing()
+
+_state = local()
+
+
+def collect(func, *args, **kw):
+    '''
+    Call a function decorated with ``pyrmute(changes=True)`` and record its writes. The writes of the functions it
+    calls aren't recorded, nor are those of its recursive calls, and a memoized call that's answered from the cache
+    records nothing.
+    :return: A tuple of the result and a list of `Change`\\, in the order they were made.
+    '''
+    collector = _Collector(func.__name__)
+    outer = getattr(_state, 'collector', None)
+    _state.collector = collector
+    try:
+        result = func(*args, **kw)
+    finally:
+        _state.collector = outer
+    return result, collector.changes
+
+
+class _Collector(object):
+    __slots__ = ('name', 'changes', 'claimed')
+
+    def __init__(self, name):
+        self.name = name
+        self.changes = []
+        self.claimed = False
+
+
+def enter(func):
+    '''
+    Called by code rewritten with ``changes=True`` on entry to the decorated function. The first call of the function
+    `collect` was given claims the collector; the calls it makes, recursive or to another function of the same name,
+    find it claimed.
+    :param func: The name of the rewritten function.
+    :return: The collector to record this call's writes in, or None if they aren't being collected.
+    '''
+    collector = getattr(_state, 'collector', None)
+    if collector is None or collector.claimed or collector.name != func:
+        return None
+    collector.claimed = True
+    return collector
+
+
+def before(collector, param, root, keys, kinds):
+    '''
+    Called by code rewritten with ``changes=True`` before a write to a parameter, to look up the old value.
+    :param collector: What `enter` returned.
+    :param param: The name of the parameter.
+    :param root: The value of the parameter.
+    :param keys: The keys and attribute names on the path.
+    :param kinds: A string of 'i' for each key and 'a' for each attribute name.
+    :return: What `after` needs, or None if the writes aren't being collected.
+    '''
+    if collector is None:
+        return None
+    path = (param,) + tuple(Attr(key) if kind == 'a' else key for key, kind in zip(keys, kinds))
+    return collector, path, keys, kinds, _lookup(root, keys, kinds)
+
+
+def after(pending, root, op):
+    '''Called by code rewritten with ``changes=True`` after a write, with the new value of the parameter.'''
+    if pending is None:
+        return
+    collector, path, keys, kinds, old = pending
+    collector.changes.append(Change(path, op, old, _lookup(root, keys, kinds)))
+
+
+def _lookup(value, keys, kinds):
+    for key, kind in zip(keys, kinds):
+        try:
+            value = getattr(value, key) if kind == 'a' else value[key]
+        except (AttributeError, LookupError, TypeError):
+            return missing
+    return value
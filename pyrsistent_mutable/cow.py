@@ -0,0 +1,226 @@
+'''
+Copy-on-write views of builtin collections, used by ``pyrmute(boundary='cow')``.
+
+A view reads straight through to the caller's ``dict``, ``list`` or ``set``, wrapping nested collections in views as
+they are read. The first write converts only the collection written to into its persistent counterpart, whose
+elements are still views, so the caller's object is never mutated and unread parts aren't copied while the function
+runs. When it returns, `settle` freezes the views left in its result, so the result doesn't see later changes to the
+caller's objects. Views are only made from the parameters, so if none was a builtin collection there's nothing to
+settle and the result isn't walked.
+'''
+from pyrsistent import freeze, pmap, pset, pvector
+
+from .globals import register_evolver_methods, register_returns_self
+
+try:
+    from collections.abc import Mapping, Sequence, Set
+except ImportError:
+    from collections import Mapping, Sequence, Set
+
+
+def cow(value):
+    '''
+    Wrap a builtin collection in a copy-on-write view; anything else is returned as is.
+    '''
+    view = _views.get(type(value))
+    return value if view is None else view(value)
+
+
+def viewed(*values):
+    '''Whether any of the values a function's parameters were rebound to by `cow` is a view, or a tuple holding one.'''
+    for value in values:
+        if isinstance(value, CowView) or type(value) is tuple and any(isinstance(item, CowView) for item in value):
+            return True
+    return False
+
+
+def settle(value, viewed=True):
+    '''
+    Replace the views in a value with persistent values, rebuilding only the containers that hold them.
+    :param value: A view, a persistent map or vector, or a tuple of them; anything else is returned as is.
+    :param viewed: False if the call made no views, as `viewed` tells, so the value is returned as is.
+    :return: The value, with each view replaced by ``freeze`` of the collection it wraps.
+    '''
+    if not viewed:
+        return value
+    if isinstance(value, CowView):
+        return freeze(value._data)
+    if type(value) is tuple:
+        settled = tuple(map(settle, value))
+        return value if all(a is b for a, b in zip(settled, value)) else settled
+    if not hasattr(value, 'set') or isinstance(value, Set):
+        return value
+    if isinstance(value, Mapping):
+        items = value.items()
+    elif isinstance(value, Sequence):
+        items = enumerate(value)
+    else:
+        return value
+    result = value
+    for key, item in items:
+        settled = settle(item)
+        if settled is not item:
+            result = result.set(key, settled)
+    return result
+
+
+class CowView(object):
+    '''
+    Base class of views; ``persistent()`` makes the persistent counterpart of the wrapped collection.
+    '''
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __eq__(self, other):
+        if isinstance(other, CowView):
+            other = other._data
+        return self._data == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._data)
+
+    def evolver(self):
+        return self.persistent().evolver()
+
+    def transform(self, *transformations):
+        return self.persistent().transform(*transformations)
+
+
+class CowMap(CowView, Mapping):
+    '''A view of a ``dict`` that becomes a ``pmap`` when written.'''
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return cow(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def persistent(self):
+        return pmap(dict((key, cow(value)) for key, value in self._data.items()))
+
+    def set(self, key, value):
+        return self.persistent().set(key, value)
+
+    def remove(self, key):
+        return self.persistent().remove(key)
+
+    def discard(self, key):
+        return self.persistent().discard(key) if key in self._data else self
+
+    def update(self, *maps):
+        return self.persistent().update(*maps)
+
+    def update_with(self, update_fn, *maps):
+        return self.persistent().update_with(update_fn, *maps)
+
+
+class CowVector(CowView, Sequence):
+    '''A view of a ``list`` that becomes a ``pvector`` when written.'''
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CowVector(self._data[index])
+        return cow(self._data[index])
+
+    def __iter__(self):
+        return map(cow, self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __add__(self, other):
+        return self.persistent() + other
+
+    def __mul__(self, times):
+        return self.persistent() * times
+
+    def persistent(self):
+        return pvector(map(cow, self._data))
+
+    def set(self, index, value):
+        return self.persistent().set(index, value)
+
+    def mset(self, *args):
+        return self.persistent().mset(*args)
+
+    def append(self, value):
+        return self.persistent().append(value)
+
+    def extend(self, values):
+        return self.persistent().extend(values)
+
+    def delete(self, index, stop=None):
+        return self.persistent().delete(index, stop)
+
+    def remove(self, value):
+        return self.persistent().remove(value)
+
+
+class CowSet(CowView, Set):
+    '''A view of a ``set`` that becomes a ``pset`` when written. Elements are hashable, so they aren't wrapped.'''
+    __slots__ = ()
+
+    @classmethod
+    def _from_iterable(cls, values):
+        return pset(values)
+
+    def __contains__(self, value):
+        return value in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def persistent(self):
+        return pset(self._data)
+
+    def add(self, value):
+        return self if value in self._data else self.persistent().add(value)
+
+    def discard(self, value):
+        return self.persistent().discard(value) if value in self._data else self
+
+    def remove(self, value):
+        return self.persistent().remove(value)
+
+    def update(self, values):
+        return self.persistent().update(values)
+
+    def union(self, values):
+        return self | values
+
+    def intersection(self, values):
+        return self & values
+
+    def difference(self, values):
+        return self - values
+
+    def symmetric_difference(self, values):
+        return self ^ values
+
+
+_views = {dict: CowMap, list: CowVector, set: CowSet}
+
+register_returns_self(CowMap, ('discard', 'remove', 'set', 'transform', 'update', 'update_with'))
+register_returns_self(CowVector, ('append', 'delete', 'extend', 'mset', 'remove', 'set', 'transform'))
+register_returns_self(CowSet, ('add', 'difference', 'discard', 'intersection', 'remove', 'symmetric_difference',
+                               'union', 'update'))
+register_evolver_methods(CowMap, ('remove', 'set'))
+register_evolver_methods(CowVector, ('append', 'extend', 'set'))
@@ -1,68 +1,282 @@
-from ast import parse
-import inspect
-from io import StringIO
-from textwrap import dedent
-from astunparse import Unparser
-try:
-    from inspect import getclosurevars
-except ImportError:
-    def getclosurevars(_):
-        return None
-
-from .flags import get_flags
-from .rewrite import rewrite
+'''
+The ``pyrmute`` decorator.
+
+Importing this is cheap: the rewriter, the unparser and pyrsistent itself are imported when a function is decorated.
+'''
+import os
+import sys
+from weakref import WeakSet
 
 _in_pyrmute = 0
 
+#: The functions ``pyrmute`` has built, so `inline` can tell them from wrappers that copied their attributes.
+rewritten = WeakSet()
+
+#: CO_GENERATOR, CO_COROUTINE, CO_ITERABLE_COROUTINE and CO_ASYNC_GENERATOR.
+_suspends = 0x20 | 0x80 | 0x100 | 0x200
 
-def pyrmute(target=None, write_source=True):
+
+def _pass_defaults():
+    '''
+    Read the default optimization level and pass switches from ``PYRMUTE_OPT`` and ``PYRMUTE_PASSES``\\.
+
+    They're checked by `passes.resolve` when the passes are first imported.
+    '''
+    opt = os.environ.get('PYRMUTE_OPT')
+    switches = {}
+    for item in os.environ.get('PYRMUTE_PASSES', '').split(','):
+        item = item.strip()
+        if item:
+            switches[item.lstrip('+-')] = not item.startswith('-')
+    if not opt:
+        opt = 0
+    elif opt.isdigit():
+        opt = int(opt)
+    return {'opt': opt, 'passes': switches}
+
+
+#: The level and switches used when ``pyrmute`` isn't given them; see `passes.set_defaults`\\. They live here so a
+#: rewrite can be found in the `cache` without importing the passes.
+pass_defaults = _pass_defaults()
+
+
+def pyrmute(target=None, write_source=True, memoize=None, intern=None, intern_returns=False, sharing=False,
+            boundary=None, backend=None, adaptive=None, opt=None, passes=None, unchanged=None, rewriter=None,
+            changes=False, records=False, return_view=False):
     '''
     Rewrite a decorated function using imperative commands to use the pyrsistent API.
     :param target: A function to rewrite.
     :param write_source: By default, write the translated source to `__source__`, set this to false to disable.
+    :param memoize: Cache results of the rewritten function; see `Memoize.coerce` for accepted values.
+    :param intern: Share equal values built from literals: True or 'function' for a table per function,
+        'global' for a table shared by all functions, or an `Interner`.
+    :param intern_returns: Also share equal return values, using the same table.
+    :param sharing: Instrument assignments so `sharing.measure` can break allocation down by statement.
+    :param boundary: Protect callers passing builtin collections: 'cow' wraps parameters in copy-on-write views,
+        'freeze' converts them to persistent values up front.
+    :param backend: The name of a registered `Backend`, or a Backend, to build literals with; pyrsistent by default.
+    :param adaptive: Record argument types for this many calls, then specialize for parameters that always had the
+        same persistent type; see `adaptive.Adaptive`. True records 16 calls.
+    :param opt: The optimization level, 0 to 2, or None for the default; see `passes`.
+    :param passes: A dictionary of pass names to True or False, to run them or not regardless of the level.
+    :param unchanged: Make writes that change nothing return the object they were given, so it keeps its identity:
+        'identical' if the new value is the old one, 'equal' if it's also equal and of the same type.
+    :param rewriter: 'source' to rewrite the source, 'bytecode' to rewrite the code object, which needs no source but
+        makes only the basic rewrites, or 'auto' to rewrite the source if there is any; see `bytecode`. The default is
+        ``PYRMUTE_REWRITER``\\, or 'source'.
+    :param changes: Report writes to parameters, for `changes.collect` to return.
+    :param records: Build dict literals whose keys are all strings as compact `records.Record`\\, which become
+        ``pmap`` when a key is added or removed. Requires the pyrsistent backend.
+    :param return_view: Return read-only views of returned maps, vectors and sets that pass for ``dict``\\, ``list``
+        and ``set``\\; see `views`\\.
     :return: the rewritten function.
     '''
+    memo = None
+    if memoize is not None and memoize is not False:
+        from .memoize import Memoize
+        memo = Memoize.coerce(memoize)
+    # Not just truth: an empty Interner is falsy.
+    interning = intern is not None and intern is not False
+    if intern_returns and not interning:
+        raise TypeError('intern_returns requires intern to be set.')
+    if adaptive is True:
+        adaptive = 16
+    if adaptive is not None and adaptive is not False and (not isinstance(adaptive, int) or adaptive < 1):
+        raise ValueError('Expected adaptive to be True or a positive number of calls, got {!r}'.format(adaptive))
+    if boundary is not None:
+        from .rewrite import boundaries
+        if boundary not in boundaries:
+            raise ValueError('Expected boundary to be one of {}, got {!r}'
+                             .format(', '.join(sorted(boundaries)), boundary))
+    if unchanged is not None:
+        from .rewrite import unchanged_helpers
+        if unchanged not in unchanged_helpers:
+            raise ValueError('Expected unchanged to be one of {}, got {!r}'
+                             .format(', '.join(sorted(unchanged_helpers)), unchanged))
+    if rewriter is None:
+        rewriter = os.environ.get('PYRMUTE_REWRITER') or 'source'
+    if rewriter not in ('source', 'bytecode', 'auto'):
+        raise ValueError("Expected rewriter to be 'source', 'bytecode' or 'auto', got {!r}".format(rewriter))
+    unsupported = [name for name, value in (('intern', interning), ('sharing', sharing), ('boundary', boundary),
+                                            ('adaptive', adaptive), ('changes', changes),
+                                            ('records', records), ('return_view', return_view)) if value]
+    if unsupported and rewriter == 'bytecode':
+        raise TypeError('The bytecode rewriter does not support {}.'.format(', '.join(unsupported)))
+
     def dec(func):
         global _in_pyrmute
         if _in_pyrmute:
             # inspect.getsource returns this decorator as well. It's easiest to let python
             # invoke this decorator and simply have it do nothing by setting a global flag.
             return func
-        source = dedent(inspect.getsource(func))
-        filename = inspect.getsourcefile(func)
-        _check_closure(func)
-        module = inspect.getmodule(func)
-        flags = get_flags(module)
-        tree = parse(source, filename)
-        transformed = rewrite(tree)
-
-        code = compile(transformed, filename=filename, mode='exec', flags=flags)
-        module = dict(vars(module))
-        _in_pyrmute = True
-        try:
-            exec(code, module)
-        finally:
-            _in_pyrmute = False
-
-        result = module[func.__name__]
-        if write_source:
-            result.__source__ = show_ast(transformed)
+        from .backends import get_backend
+        from .intern import get_interner
+        from .timing import Profile, record
+
+        interner = get_interner(intern)
+        if adaptive and func.__code__.co_flags & _suspends:
+            # The guard returns the result of the generic version, which doesn't work when the function suspends.
+            raise TypeError('adaptive is not supported for generators and coroutines.')
+
+        literals = get_backend(backend)
+        if records and literals.name != 'pyrsistent':
+            raise TypeError('records requires the pyrsistent backend.')
+        # What changes the behavior of the rewritten code, rather than how fast it is.
+        options = (not interning, intern_returns, sharing, boundary, literals.name, unchanged, changes, records,
+                   return_view)
+
+        def build(types=None, fallback=None, guarded=None):
+            global _in_pyrmute
+            from .build import rewrite_function
+            env = {}
+            profile = Profile()
+            code, source = rewrite_function(func, env, write_source, interner, intern_returns, sharing, boundary,
+                                            literals, types, fallback, guarded, profile, opt, passes, options,
+                                            unchanged, changes, records, return_view)
+            module = dict(vars(sys.modules[func.__module__]))
+            module.update(env)
+            _in_pyrmute = True
+            try:
+                with profile('exec'):
+                    exec(code, module)
+            finally:
+                _in_pyrmute = False
+            record(func, profile)
+
+            built = module[func.__name__]
+            if source is not None:
+                built.__source__ = source
+            if interner is not None:
+                built.__interner__ = interner
+            built.__original__ = func
+            built.__options__ = options
+            rewritten.add(built)
+            return built
+
+        def specialize(types, fallback):
+            guarded = {}
+            built = build(types, fallback, guarded)
+            return (built, guarded) if guarded else None
+
+        if rewriter == 'bytecode' or rewriter == 'auto' and not _has_source(func):
+            if unsupported:
+                raise TypeError('{} has no source, and the bytecode rewriter does not support {}.'
+                                .format(func.__qualname__, ', '.join(unsupported)))
+            result = _build_bytecode(func, literals, write_source, unchanged, options)
+        else:
+            result = build()
+        if adaptive:
+            from .adaptive import Adaptive
+            result = Adaptive(result, specialize, adaptive)
+        if memo is not None:
+            result = memo.wrap(result)
+        _by_reference(func, result)
         return result
 
     return dec if target is None else dec(target)
 
 
-def _check_closure(func):
-    closure = getclosurevars(func)
-    if closure and closure.nonlocals:
-        # To do nonlocals, we'll need to reevaluate a larger function. So what we want is a
-        # top-level decorator that does the rewrite and inner decorators that mark the code
-        # to be rewritten.
-        raise TypeError('Top level function has nonlocals {}; not supported yet.'
-                        .format(', '.join(closure.nonlocals)))
+def _has_source(func):
+    import inspect
+    try:
+        inspect.getsourcelines(func)
+    except (IOError, OSError, TypeError):
+        return False
+    return True
+
+
+def _build_bytecode(func, literals, write_source, unchanged, options):
+    '''Rewrite a function with `bytecode.rewrite_bytecode`\\, writing its disassembly to ``__source__``\\.'''
+    from .bytecode import rewrite_bytecode
+    from .timing import Profile, record
+    profile = Profile()
+    with profile('bytecode'):
+        built = rewrite_bytecode(func, literals, unchanged)
+    if write_source:
+        import dis
+        with profile('show_bytecode'):
+            built.__source__ = dis.Bytecode(built).dis()
+    record(func, profile)
+    built.__original__ = func
+    built.__options__ = options
+    rewritten.add(built)
+    return built
+
+
+def _by_reference(func, result):
+    '''
+    Make the result pickle by reference when the original function keeps its name, as in ``other = pyrmute(func)``.
+
+    With decorator syntax the result is bound to the name it was defined with, so it just needs that name. Otherwise
+    the result is reachable as ``__pyrmute_<name>__`` in its module or, for methods, as ``<name>.__pyrmute__``.
+    '''
+    module = sys.modules.get(func.__module__)
+    qualname = getattr(func, '__qualname__', func.__name__)
+    # The result was defined at the top level of a copy of the module, but should be named where func was.
+    result.__qualname__ = qualname
+    if module is None or '<locals>' in qualname:
+        return
+    found = module
+    for part in qualname.split('.'):
+        found = getattr(found, part, None)
+    if found is not func:
+        return
+    func.__pyrmute__ = result
+    if '.' in qualname:
+        result.__qualname__ = qualname + '.__pyrmute__'
+    else:
+        name = '__pyrmute_{}__'.format(qualname)
+        setattr(module, name, result)
+        result.__qualname__ = name
+
+
+def stats():
+    '''
+    Get a `timing.DecorationStats` record of how long each function took to decorate, in the order they were.
+
+    A function specialized by ``adaptive`` has a second record.
+    '''
+    from .timing import records
+    return list(records)
+
+
+pyrmute.stats = stats
+
+
+class _Raw(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_raw = _Raw()
+
+
+def raw():
+    '''
+    Mark a block for the rewrite to leave alone: ``with pyrmute.raw(): ...``
+
+    At runtime this is a context manager that does nothing.
+    '''
+    return _raw
+
+
+pyrmute.raw = raw
+
+
+def typed(element, values=()):
+    '''
+    Mark a list literal or comprehension as numbers of one type, to store them unboxed: ``typed(float, [0.0] * n)``
+
+    The rewrite builds a `numeric.TypedVector` from the list directly. At runtime this converts the values.
+    :param element: ``float``\\, ``int`` or an ``array`` type code.
+    '''
+    from .numeric import tvector
+    return tvector(element, values)
 
 
-def show_ast(node):
-    with StringIO() as fh:
-        Unparser(node, file=fh)
-        return fh.getvalue()
+pyrmute.typed = typed
@@ -1,8 +1,6 @@
 import __future__ as future
 import sys
 
-from six import viewkeys
-
 
 def find_optional_features():
     '''
@@ -14,7 +12,8 @@ def find_optional_features():
     current = sys.version_info
     for name in future.all_feature_names:
         feature = getattr(future, name)
-        if current < feature.mandatory:
+        # A feature that was dropped has no mandatory release.
+        if feature.mandatory is None or current < feature.mandatory:
             yield name
 
 
@@ -32,7 +31,7 @@ def get_flags(module):
     '''
     mod = vars(module)
     accum = 0
-    for name in viewkeys(mod) & optional_features:
+    for name in optional_features.intersection(mod):
         feat = mod[name]
         # noinspection PyProtectedMember
         if feat.__class__ == future._Feature:
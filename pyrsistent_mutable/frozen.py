@@ -0,0 +1,419 @@
+'''
+Copy-on-write collections backed by builtins, the reference alternative to pyrsistent for ``pyrmute(backend=...)``.
+
+Every change copies the underlying ``dict``\\, ``tuple`` or ``frozenset``\\, so updates are O(n), but construction,
+lookup and iteration run at builtin speed. That suits small collections that are read far more often than they are
+updated. An evolver copies once, on its first change, and is then mutated in place.
+
+These compare equal to their pyrsistent counterparts, and maps and sets hash the same way.
+'''
+try:
+    from collections.abc import Mapping, Sequence, Set
+except ImportError:
+    from collections import Mapping, Sequence, Set
+
+
+def fmap(initial=(), **kw):
+    '''Create a `FrozenMap` from a mapping or iterable of pairs, and keyword arguments.'''
+    data = dict(initial)
+    if kw:
+        data.update(kw)
+    return FrozenMap._wrap(data)
+
+
+def fvector(iterable=()):
+    '''Create a `FrozenVector` from an iterable.'''
+    return FrozenVector._wrap(tuple(iterable))
+
+
+def fset(iterable=()):
+    '''Create a `FrozenSet` from an iterable.'''
+    return FrozenSet._wrap(frozenset(iterable))
+
+
+class _Evolver(object):
+    '''
+    Collects changes to a frozen collection, copying it on the first change.
+
+    A subclass's `_wrap` may return a pyrsistent collection instead, as `small` does past its limit; the evolver then
+    carries on from that.
+    '''
+    __slots__ = ('_type', '_original', '_data')
+
+    def __init__(self, original):
+        self._type = type(original)
+        self._original = original
+        self._data = None
+
+    def _current(self):
+        '''The data changed so far, or else that of the original, or the original itself if it isn't frozen.'''
+        if self._data is not None:
+            return self._data
+        original = self._original
+        return original._data if isinstance(original, self._type) else original
+
+    def _mutable(self):
+        if self._data is None:
+            self._data = self._copy(self._current())
+        return self._data
+
+    def is_dirty(self):
+        return self._data is not None
+
+    def persistent(self):
+        if self._data is None:
+            return self._original
+        result = self._type._wrap(self._freeze(self._data))
+        self._original, self._data = result, None
+        return result
+
+    @staticmethod
+    def _copy(data):
+        return dict(data)
+
+    @staticmethod
+    def _freeze(data):
+        return data
+
+
+class FrozenMap(Mapping):
+    '''An immutable mapping backed by a ``dict``\\.'''
+    __slots__ = ('_data', '__weakref__')
+
+    @classmethod
+    def _wrap(cls, data):
+        self = object.__new__(cls)
+        self._data = data
+        return self
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenMap):
+            return self._data == other._data
+        if isinstance(other, Mapping):
+            return self._data == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(frozenset(self._data.items()))
+
+    def __repr__(self):
+        return 'fmap({!r})'.format(self._data)
+
+    def __reduce__(self):
+        return fmap, (self._data,)
+
+    def set(self, key, value):
+        if key in self._data and self._data[key] is value:
+            return self
+        data = self._data.copy()
+        data[key] = value
+        return self._wrap(data)
+
+    def remove(self, key):
+        data = self._data.copy()
+        del data[key]
+        return self._wrap(data)
+
+    def discard(self, key):
+        return self.remove(key) if key in self._data else self
+
+    def update(self, *maps):
+        data = self._data.copy()
+        for other in maps:
+            data.update(other)
+        return self._wrap(data)
+
+    def update_with(self, update_fn, *maps):
+        data = self._data.copy()
+        for other in maps:
+            for key, value in other.items():
+                data[key] = update_fn(data[key], value) if key in data else value
+        return self._wrap(data)
+
+    def evolver(self):
+        return _FrozenMapEvolver(self)
+
+
+class _FrozenMapEvolver(_Evolver):
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return self._current()[key]
+
+    def __setitem__(self, key, value):
+        self._mutable()[key] = value
+
+    def __delitem__(self, key):
+        del self._mutable()[key]
+
+    def set(self, key, value):
+        self[key] = value
+        return self
+
+    def remove(self, key):
+        del self[key]
+        return self
+
+
+class FrozenVector(Sequence):
+    '''An immutable sequence backed by a ``tuple``\\.'''
+    __slots__ = ('_data', '__weakref__')
+
+    @classmethod
+    def _wrap(cls, data):
+        self = object.__new__(cls)
+        self._data = data
+        return self
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._wrap(self._data[index])
+        return self._data[index]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, value):
+        return value in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenVector):
+            return self._data == other._data
+        if isinstance(other, (list, Sequence)) and not isinstance(other, (tuple, str, bytes)):
+            return len(self._data) == len(other) and all(a == b for a, b in zip(self._data, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self._data)
+
+    def __repr__(self):
+        return 'fvector({!r})'.format(list(self._data))
+
+    def __reduce__(self):
+        return fvector, (self._data,)
+
+    def __add__(self, other):
+        return self._wrap(self._data + tuple(other))
+
+    def __mul__(self, times):
+        return self._wrap(self._data * times)
+
+    __rmul__ = __mul__
+
+    def set(self, index, value):
+        data = list(self._data)
+        data[index] = value
+        return self._wrap(tuple(data))
+
+    def mset(self, *args):
+        data = list(self._data)
+        for index in range(0, len(args), 2):
+            data[args[index]] = args[index + 1]
+        return self._wrap(tuple(data))
+
+    def append(self, value):
+        return self._wrap(self._data + (value,))
+
+    def extend(self, values):
+        return self._wrap(self._data + tuple(values))
+
+    def delete(self, index, stop=None):
+        data = list(self._data)
+        del data[index if stop is None else slice(index, stop)]
+        return self._wrap(tuple(data))
+
+    def remove(self, value):
+        data = list(self._data)
+        data.remove(value)
+        return self._wrap(tuple(data))
+
+    def tolist(self):
+        return list(self._data)
+
+    def evolver(self):
+        return _FrozenVectorEvolver(self)
+
+
+class _FrozenVectorEvolver(_Evolver):
+    __slots__ = ()
+
+    @staticmethod
+    def _copy(data):
+        return list(data)
+
+    @staticmethod
+    def _freeze(data):
+        return tuple(data)
+
+    def __getitem__(self, index):
+        return self._current()[index]
+
+    def __setitem__(self, index, value):
+        self._mutable()[index] = value
+
+    def __delitem__(self, index):
+        del self._mutable()[index]
+
+    def __len__(self):
+        return len(self._current())
+
+    def set(self, index, value):
+        self[index] = value
+        return self
+
+    def append(self, value):
+        self._mutable().append(value)
+        return self
+
+    def extend(self, values):
+        self._mutable().extend(values)
+        return self
+
+    def delete(self, index):
+        del self[index]
+        return self
+
+
+class FrozenSet(Set):
+    '''An immutable set backed by a ``frozenset``\\.'''
+    __slots__ = ('_data', '__weakref__')
+
+    @classmethod
+    def _wrap(cls, data):
+        self = object.__new__(cls)
+        self._data = data
+        return self
+
+    @classmethod
+    def _from_iterable(cls, values):
+        return cls._wrap(frozenset(values))
+
+    def __contains__(self, value):
+        return value in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenSet):
+            return self._data == other._data
+        if isinstance(other, Set):
+            return len(self._data) == len(other) and all(value in self._data for value in other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        # The same as a pset, which hashes as a pmap of its elements to True.
+        return hash(frozenset((value, True) for value in self._data))
+
+    def __repr__(self):
+        return 'fset({!r})'.format(list(self._data))
+
+    def __reduce__(self):
+        return fset, (self._data,)
+
+    def add(self, value):
+        return self if value in self._data else self._wrap(self._data | frozenset((value,)))
+
+    def remove(self, value):
+        if value not in self._data:
+            raise KeyError(value)
+        return self._wrap(self._data - frozenset((value,)))
+
+    def discard(self, value):
+        return self.remove(value) if value in self._data else self
+
+    def update(self, values):
+        return self._wrap(self._data.union(values))
+
+    def union(self, *others):
+        return self._wrap(self._data.union(*others))
+
+    def intersection(self, *others):
+        return self._wrap(self._data.intersection(*others))
+
+    def difference(self, *others):
+        return self._wrap(self._data.difference(*others))
+
+    def symmetric_difference(self, other):
+        return self._wrap(self._data.symmetric_difference(other))
+
+    def evolver(self):
+        return _FrozenSetEvolver(self)
+
+
+class _FrozenSetEvolver(_Evolver):
+    __slots__ = ()
+
+    @staticmethod
+    def _copy(data):
+        return set(data)
+
+    @staticmethod
+    def _freeze(data):
+        return frozenset(data)
+
+    def add(self, value):
+        self._mutable().add(value)
+        return self
+
+    def remove(self, value):
+        self._mutable().remove(value)
+        return self
+
+
+#: Methods of each type that return an evolution, for `invoke`.
+returns_self = {
+    'add': (FrozenSet,),
+    'append': (FrozenVector,),
+    'delete': (FrozenVector,),
+    'difference': (FrozenSet,),
+    'discard': (FrozenMap, FrozenSet),
+    'extend': (FrozenVector,),
+    'intersection': (FrozenSet,),
+    'mset': (FrozenVector,),
+    'remove': (FrozenMap, FrozenSet, FrozenVector),
+    'set': (FrozenMap, FrozenVector),
+    'symmetric_difference': (FrozenSet,),
+    'union': (FrozenSet,),
+    'update': (FrozenMap, FrozenSet),
+    'update_with': (FrozenMap,),
+}
+
+#: Methods whose evolvers have the same method, for `batch`.
+evolver_methods = {
+    'add': (FrozenSet,),
+    'append': (FrozenVector,),
+    'extend': (FrozenVector,),
+    'remove': (FrozenMap,),
+    'set': (FrozenMap, FrozenVector),
+}
@@ -32,6 +32,42 @@ returns_self = {
 }
 
 
+def register_returns_self(cls, methods):
+    '''
+    Record that methods of another persistent type return an evolution of the object, so `invoke` keeps the result.
+    :param cls: The persistent type.
+    :param methods: The names of its methods that return an evolution.
+    '''
+    for method in methods:
+        types = returns_self.get(method, ())
+        if cls not in types:
+            returns_self[method] = types + (cls,)
+
+
+#: A map of method names to types whose evolvers have the same method with the same effect, so a loop calling it
+#: can be run on one evolver. Errors must match as well, which rules out pyrsistent's ``PSet.remove`` and
+#: ``PVector.delete``.
+evolver_methods = {
+    'add': (PSet,),
+    'append': (PVector,),
+    'extend': (PVector,),
+    'remove': (PMap,),
+    'set': (PMap, PVector),
+}
+
+
+def register_evolver_methods(cls, methods):
+    '''
+    Record that the evolvers of another persistent type have some of its methods, so `batch` can use them.
+    :param cls: The persistent type.
+    :param methods: The names of methods its evolvers support with the same effect.
+    '''
+    for method in methods:
+        types = evolver_methods.get(method, ())
+        if cls not in types:
+            evolver_methods[method] = types + (cls,)
+
+
 def set_via_attr(obj, attr, value):
     """Attempt to set an attribute by evolution, but fall back to ordinary attribute setting."""
     try:
@@ -40,7 +76,7 @@ def set_via_attr(obj, attr, value):
         pass  # Avoid "in this error another error occured" annoyance.
     else:
         return setter(attr, value)
-    obj.attr = value
+    setattr(obj, attr, value)
     return obj
 
 
@@ -95,3 +131,156 @@ def invoke(obj, method, *args, **kw):
         return result
     else:
         return obj
+
+
+def invoke_item(obj, key, method, *args, **kw):
+    '''
+    Invoke a method of an item and store the result, as ``obj[key].method(...)``\\, looking the item up once.
+
+    Nothing is stored if the method returns the item itself, so an item that's changed in place isn't copied.
+    '''
+    value = obj[key]
+    result = invoke(value, method, *args, **kw)
+    if result is value:
+        return obj
+    return _store(obj, key, result)
+
+
+def setdefault_invoke(obj, key, default, method, *args, **kw):
+    '''
+    Invoke a method of an item, or of the default if there's no such item, and store the result, as
+    ``obj.setdefault(key, default).method(...)``\\.
+    '''
+    try:
+        value = obj[key]
+    except KeyError:
+        return _store(obj, key, invoke(default, method, *args, **kw))
+    result = invoke(value, method, *args, **kw)
+    if result is value:
+        return obj
+    return _store(obj, key, result)
+
+
+_missing = object()
+
+
+def _equal(old, new):
+    '''Whether a write of ``new`` over ``old`` changes nothing, for ``pyrmute(unchanged='equal')``\\.'''
+    return old is new or type(old) is type(new) and old == new
+
+
+def set_via_attr_unless_identical(obj, attr, value):
+    '''`set_via_attr`\\, but return the object itself if the attribute already is the value.'''
+    if getattr(obj, attr, _missing) is value:
+        return obj
+    return set_via_attr(obj, attr, value)
+
+
+def set_via_attr_unless_equal(obj, attr, value):
+    '''`set_via_attr`\\, but return the object itself if the attribute already equals the value.'''
+    if _equal(getattr(obj, attr, _missing), value):
+        return obj
+    return set_via_attr(obj, attr, value)
+
+
+def set_via_slice_unless_identical(obj, index, value):
+    '''`set_via_slice`\\, but return the object itself if the item already is the value.'''
+    try:
+        if obj[index] is value:
+            return obj
+    except (LookupError, TypeError):
+        pass
+    return _store(obj, index, value)
+
+
+def set_via_slice_unless_equal(obj, index, value):
+    '''`set_via_slice`\\, but return the object itself if the item already equals the value.'''
+    try:
+        if _equal(obj[index], value):
+            return obj
+    except (LookupError, TypeError):
+        pass
+    return _store(obj, index, value)
+
+
+def invoke_item_unless_equal(obj, key, method, *args, **kw):
+    '''`invoke_item`\\, but store nothing if the result equals the item.'''
+    value = obj[key]
+    result = invoke(value, method, *args, **kw)
+    if _equal(value, result):
+        return obj
+    return _store(obj, key, result)
+
+
+def setdefault_invoke_unless_equal(obj, key, default, method, *args, **kw):
+    '''`setdefault_invoke`\\, but store nothing if there's an item and the result equals it.'''
+    try:
+        value = obj[key]
+    except KeyError:
+        return _store(obj, key, invoke(default, method, *args, **kw))
+    result = invoke(value, method, *args, **kw)
+    if _equal(value, result):
+        return obj
+    return _store(obj, key, result)
+
+
+def _store(obj, key, value):
+    '''Set an item of a persistent object, an evolver or a `Batch`\\, or of a builtin in place.'''
+    if isinstance(obj, Batch):
+        obj[key] = value
+        return obj
+    try:
+        setter = obj.set
+    except AttributeError:
+        pass
+    else:
+        return setter(key, value)
+    return set_via_slice(obj, key, value)
+
+
+def batch(obj, method=None):
+    '''
+    Start a run of updates to an object, for a loop whose body is a single update.
+
+    The result supports the update the loop makes, and ``persistent()`` returns the updated object. That's an
+    evolver if running every update on one evolver is the same as updating the object one step at a time, or else
+    a `Batch` that does exactly that.
+    :param obj: The object the loop updates.
+    :param method: The method the loop calls, or None if it assigns or deletes items.
+    '''
+    if method is None:
+        try:
+            evolver = obj.evolver
+        except AttributeError:
+            return Batch(obj)
+        return evolver()
+    if isinstance(obj, evolver_methods.get(method, ())):
+        return obj.evolver()
+    return Batch(obj)
+
+
+class Batch(object):
+    '''
+    Updates an object through the same functions as rewritten statements, for objects without a suitable evolver.
+    '''
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __getitem__(self, index):
+        return self.value[index]
+
+    def __setitem__(self, index, value):
+        self.value = set_via_slice(self.value, index, value)
+
+    def __delitem__(self, index):
+        self.value = del_slice(self.value, index)
+
+    def __getattr__(self, method):
+        def call(*args, **kw):
+            self.value = invoke(self.value, method, *args, **kw)
+        return call
+
+    def persistent(self):
+        return self.value
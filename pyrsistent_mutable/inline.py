@@ -0,0 +1,183 @@
+'''
+Inlining of small decorated functions into decorated callers from the same module.
+
+A statement that calls one, as ``x = bump(x)``\\, ``bump(x)`` or ``return bump(x)``\\, becomes:
+
+    if bump is _bump_inlined:
+        _bump_r = x
+        _bump_r.count += 1
+        x = _bump_r
+    else:
+        x = bump(x)
+
+where ``_bump_inlined`` is the callee when the caller was rewritten, so the call is made as usual if the global is
+rebound or the callee redefined later. This runs before the other passes, so they rewrite the inlined statements
+along with the caller. Functions rewritten with an interner, ``boundary``\\, ``changes``\\, ``return_view`` or
+``sharing`` aren't inlined, as an inlined copy would skip what those do on entry, on return or at each write.
+'''
+from ast import (
+    Assign, ClassDef, Compare, Expr, Global, If, Is, Lambda, Load, Name, NameConstant, NodeTransformer, Return, Store,
+    Yield, YieldFrom, copy_location, get_docstring, parse, walk
+)
+from copy import deepcopy
+import inspect
+from textwrap import dedent
+from types import FunctionType
+
+from .decorator import rewritten
+from .rewrite import is_raw
+
+#: The most nodes a function can have to be inlined.
+limit = 64
+
+#: Functions that need a frame of their own.
+_frame_sensitive = frozenset(('eval', 'exec', 'globals', 'locals', 'super', 'vars'))
+
+
+class Inline(NodeTransformer):
+    '''
+    Substitute small decorated functions into the body of the decorated function.
+    '''
+    def __init__(self, names, namespace, options, def_use):
+        '''
+        :param names: The `Names` of the module being rewritten.
+        :param namespace: The globals of the decorated function's module.
+        :param options: The options of the rewrite; only callees rewritten with the same options are inlined.
+        :param def_use: A `passes.DefUse` of the decorated function, to avoid inlining calls to shadowed names.
+        '''
+        self.names = names
+        self.namespace = namespace
+        self.options = options
+        self.def_use = def_use
+        self.inlined = 0
+
+    def visit_Module(self, node):
+        for stmt in node.body:
+            if type(stmt).__name__ == 'FunctionDef':
+                self.generic_visit(stmt)
+        return node
+
+    def visit_FunctionDef(self, node):
+        return node
+
+    visit_AsyncFunctionDef = visit_ClassDef = visit_Lambda = visit_FunctionDef
+
+    def visit_With(self, node):
+        '''Leave raw blocks alone, as the inlined statements wouldn't be rewritten there.'''
+        return node if is_raw(node, self.namespace) else self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        if len(node.targets) == 1:
+            return self.inline(node, node.value, lambda value: Assign(targets=deepcopy(node.targets), value=value))
+        return node
+
+    def visit_Expr(self, node):
+        return self.inline(node, node.value, lambda value: Expr(value=value))
+
+    def visit_Return(self, node):
+        return self.inline(node, node.value, lambda value: Return(value=value))
+
+    def inline(self, stmt, call, result):
+        '''
+        Inline a statement that calls a decorated function.
+        :param result: Makes the statement that uses the callee's return value.
+        '''
+        callee = self.callee(call)
+        if callee is None:
+            return stmt
+        func = self.definition(callee)
+        if func is None or len(func.args.args) != len(call.args):
+            return stmt
+        name = call.func.id
+        renames = dict((local, self.names.unique('{}_{}'.format(name, local))) for local in _locals(func))
+        start = 1 if get_docstring(func) is not None else 0
+        body = [_Rename(renames).visit(deepcopy(each)) for each in func.body[start:]]
+        stmts = [Assign(targets=[Name(id=renames[_arg_name(param)], ctx=Store())], value=deepcopy(arg))
+                 for param, arg in zip(func.args.args, call.args)]
+        value = NameConstant(value=None)
+        if body and isinstance(body[-1], Return):
+            value = body.pop().value or value
+        stmts.extend(body)
+        stmts.append(result(value))
+        for node in stmts:
+            for child in walk(node):
+                if 'lineno' in child._attributes:
+                    copy_location(child, stmt)
+        test = Compare(left=Name(id=name, ctx=Load()), ops=[Is()],
+                       comparators=[Name(id=self.names.inject(callee, name + '_inlined'), ctx=Load())])
+        self.inlined += 1
+        return copy_location(If(test=test, body=stmts, orelse=[stmt]), stmt)
+
+    def callee(self, call):
+        '''Find the decorated function a call can be inlined from, if any.'''
+        if (type(call).__name__ != 'Call' or not isinstance(call.func, Name) or call.keywords
+                or any(type(arg).__name__ == 'Starred' for arg in call.args)
+                or getattr(call, 'starargs', None) or getattr(call, 'kwargs', None)):
+            return None
+        name = call.func.id
+        def_use = self.def_use
+        if name in def_use.params or name in def_use.assigned or name in def_use.rebound:
+            return None
+        callee = self.namespace.get(name)
+        # A wrapper made with functools.wraps copies __original__ and __options__, but does something else.
+        if type(callee) is not FunctionType or callee not in rewritten or callee.__options__ != self.options:
+            return None
+        if callee.__module__ != self.namespace.get('__name__'):
+            return None
+        return callee
+
+    def definition(self, callee):
+        '''
+        Parse the definition of a callee, if it's small and simple enough to inline.
+        :return: The FunctionDef node, or None.
+        '''
+        try:
+            source = dedent(inspect.getsource(callee.__original__))
+        except (IOError, OSError, TypeError):
+            return None
+        func = parse(source).body[0]
+        args = func.args
+        if (type(func).__name__ != 'FunctionDef' or args.vararg or args.kwarg or args.defaults
+                or getattr(args, 'kwonlyargs', None) or getattr(args, 'posonlyargs', None)):
+            return None
+        nodes = list(walk(func))
+        if len(nodes) > limit:
+            return None
+        returns = [node for node in nodes if isinstance(node, Return)]
+        if returns and (len(returns) > 1 or func.body[-1] is not returns[0]):
+            return None
+        for node in nodes[1:]:
+            if isinstance(node, (ClassDef, Global, Lambda, Yield, YieldFrom)) or type(node).__name__ in (
+                    'AsyncFunctionDef', 'Await', 'FunctionDef', 'Nonlocal'):
+                return None
+            if type(node).__name__ == 'Call' and isinstance(node.func, Name) and node.func.id in _frame_sensitive:
+                return None
+        # The callee's globals must mean the same in the caller.
+        free = set(node.id for node in nodes if isinstance(node, Name)) - _locals(func)
+        if free & (self.def_use.params | set(self.def_use.assigned) | self.def_use.rebound):
+            return None
+        return func
+
+
+class _Rename(NodeTransformer):
+    def __init__(self, renames):
+        self.renames = renames
+
+    def visit_Name(self, node):
+        if node.id in self.renames:
+            node.id = self.renames[node.id]
+        return node
+
+
+def _locals(func):
+    '''The parameters of a function and the names it binds.'''
+    names = set(_arg_name(param) for param in func.args.args)
+    for node in walk(func):
+        if isinstance(node, Name) and not isinstance(node.ctx, Load):
+            names.add(node.id)
+    return names
+
+
+def _arg_name(param):
+    return getattr(param, 'arg', None) or param.id
+
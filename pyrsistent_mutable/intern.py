@@ -0,0 +1,117 @@
+'''
+Hash-consing of persistent values.
+
+An `Interner` maps each value it sees to a canonical instance among the live values equal to it, so structurally
+equal values built by rewritten code can share one object. The table only holds weak references; a canonical
+value is forgotten once nothing else refers to it.
+'''
+from threading import Lock
+from weakref import ref
+
+try:
+    from collections.abc import Mapping, Sequence, Set
+except ImportError:
+    from collections import Mapping, Sequence, Set
+
+
+class _Table(dict):
+    '''Weak references of one type, keyed by themselves so lookups compare referents.'''
+    __slots__ = ('__weakref__',)
+
+    def discard(self, dead):
+        self.pop(dead, None)
+
+
+class Interner(object):
+    '''
+    Canonicalizes hashable values that support weak references; anything else is returned unchanged.
+    '''
+    def __init__(self):
+        self._tables = {}
+        self._lock = Lock()
+        self.hits = self.misses = 0
+
+    def __call__(self, value):
+        try:
+            probe = ref(value)
+            hash(probe)
+        except TypeError:
+            return value
+        cls = type(value)
+        with self._lock:
+            table = self._tables.get(cls)
+            if table is None:
+                table = self._tables[cls] = _Table()
+            found = table.get(probe)
+            if found is not None:
+                canonical = found()
+                if canonical is not None and _identical(canonical, value):
+                    self.hits += 1
+                    return canonical
+            self.misses += 1
+            if found is None:
+                weak = ref(value, _discarder(table))
+                table[weak] = weak
+            return value
+
+    def __len__(self):
+        return sum(len(table) for table in self._tables.values())
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.hits = self.misses = 0
+
+
+def _discarder(table):
+    table = ref(table)
+
+    def discard(dead):
+        live = table()
+        if live is not None:
+            live.discard(dead)
+    return discard
+
+
+def _identical(left, right):
+    '''
+    Equality that also distinguishes types, so ``{'a': 1}`` doesn't stand in for ``{'a': True}``.
+    '''
+    if left is right:
+        return True
+    if type(left) is not type(right):
+        return False
+    if isinstance(left, Mapping):
+        if set(map(_typed, left)) != set(map(_typed, right)):
+            return False
+        return all(_identical(value, right[key]) for key, value in left.items())
+    if isinstance(left, Set):
+        return set(map(_typed, left)) == set(map(_typed, right))
+    if isinstance(left, Sequence) and not isinstance(left, (str, bytes)):
+        return len(left) == len(right) and all(_identical(a, b) for a, b in zip(left, right))
+    return left == right
+
+
+def _typed(value):
+    return type(value), value
+
+
+#: The interner shared by all functions decorated with ``pyrmute(intern='global')``.
+global_interner = Interner()
+
+
+def get_interner(scope):
+    '''
+    Interpret the ``intern`` argument to ``pyrmute``.
+    :param scope: True or 'function' for a new interner, 'global' for the shared one, or an `Interner`.
+    :return: An Interner, or None if interning is disabled.
+    '''
+    if scope is None or scope is False:
+        return None
+    if scope is True or scope == 'function':
+        return Interner()
+    if scope == 'global':
+        return global_interner
+    if isinstance(scope, Interner):
+        return scope
+    raise TypeError("Expected intern to be True, 'function', 'global' or an Interner, got {!r}".format(scope))
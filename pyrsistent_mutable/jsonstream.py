@@ -0,0 +1,147 @@
+'''
+A JSON encoder that walks persistent values directly.
+
+``json.dumps(thaw(value))`` copies the whole structure into builtins first. `iterencode` encodes maps, vectors and
+the builtins they hold as it walks them, yielding the text in pieces of about `CHUNK` tokens, and `dump` writes each
+piece to a file as it's made. The text is what ``json.dumps`` gives for the thawed value with the same options; there
+is no ``indent``\\.
+'''
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:
+    from collections import Mapping, Sequence
+
+#: How many tokens `iterencode` collects before yielding them.
+CHUNK = 4096
+
+
+def iterencode(value, sort_keys=False, ensure_ascii=True, allow_nan=True, default=None, separators=(', ', ': ')):
+    '''
+    Encode a value as JSON, a piece at a time.
+    :param value: Maps, sequences other than strings and bytes, strings, numbers, booleans and None.
+    :param sort_keys: Write the items of maps in the order of their keys.
+    :param ensure_ascii: Escape characters beyond ASCII.
+    :param allow_nan: Write NaN and the infinities as ``json`` does, rather than raise ``ValueError``\\.
+    :param default: Called with values that can't be encoded, to return one that can; by default they raise
+        ``TypeError``\\.
+    :param separators: The separators between items, and between a key and its value.
+    :return: An iterator of strings.
+    '''
+    item_separator, key_separator = separators
+    string = encode_basestring_ascii if ensure_ascii else encode_basestring
+    buffer = []
+    append = buffer.append
+
+    def number(value):
+        if value != value:
+            text = 'NaN'
+        elif value == float('inf'):
+            text = 'Infinity'
+        elif value == float('-inf'):
+            text = '-Infinity'
+        else:
+            return float.__repr__(value)
+        if not allow_nan:
+            raise ValueError('Out of range float values are not JSON compliant: {!r}'.format(value))
+        return text
+
+    # The encoding of each exact type of scalar; subclasses are looked up below.
+    scalars = {str: string, int: int.__repr__, float: number, bool: lambda value: 'true' if value else 'false',
+               type(None): lambda value: 'null'}
+
+    def scalar(value):
+        '''The text of a value that isn't a container, or None.'''
+        encode = scalars.get(type(value))
+        if encode is not None:
+            return encode(value)
+        if isinstance(value, str):
+            return string(value)
+        if isinstance(value, int):
+            return int.__repr__(value)
+        if isinstance(value, float):
+            return number(value)
+        return None
+
+    def key_text(key):
+        if isinstance(key, str):
+            return string(key)
+        if isinstance(key, (int, float)) or key is None:
+            return '"{}"'.format(scalar(key))
+        raise TypeError('keys must be str, int, float, bool or None, not {}'.format(type(key).__name__))
+
+    def walk(value):
+        text = scalar(value)
+        if text is not None:
+            append(text)
+        elif _kind(value) == 'map':
+            items = sorted(value.items()) if sort_keys else value.items()
+            separator = '{'
+            for key, item in items:
+                append(separator)
+                append(key_text(key))
+                append(key_separator)
+                text = scalar(item)
+                if text is None:
+                    for piece in walk(item):
+                        yield piece
+                else:
+                    append(text)
+                separator = item_separator
+            append('{}' if separator == '{' else '}')
+        elif _kind(value) == 'sequence':
+            separator = '['
+            for item in value:
+                append(separator)
+                text = scalar(item)
+                if text is None:
+                    for piece in walk(item):
+                        yield piece
+                else:
+                    append(text)
+                separator = item_separator
+            append('[]' if separator == '[' else ']')
+        elif default is not None:
+            for piece in walk(default(value)):
+                yield piece
+        else:
+            raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+        if len(buffer) >= CHUNK:
+            yield ''.join(buffer)
+            del buffer[:]
+
+    for piece in walk(value):
+        yield piece
+    if buffer:
+        yield ''.join(buffer)
+
+
+_kinds = {}
+
+
+def _kind(value):
+    '''Whether a value is a 'map', a 'sequence' JSON writes as a list, or neither, cached by type.'''
+    cls = type(value)
+    try:
+        return _kinds[cls]
+    except KeyError:
+        pass
+    if isinstance(value, Mapping):
+        kind = 'map'
+    elif isinstance(value, Sequence) and not isinstance(value, (str, bytes, bytearray)):
+        kind = 'sequence'
+    else:
+        kind = None
+    return _kinds.setdefault(cls, kind)
+
+
+def dumps(value, **options):
+    '''Encode a value as JSON; see `iterencode` for the options.'''
+    return ''.join(iterencode(value, **options))
+
+
+def dump(value, fp, **options):
+    '''Write a value as JSON to a text file as it's encoded; see `iterencode` for the options.'''
+    for piece in iterencode(value, **options):
+        fp.write(piece)
@@ -0,0 +1,177 @@
+'''
+Memoization of rewritten functions.
+
+A rewritten function builds new persistent values rather than mutating its arguments, so when it is
+otherwise pure, a call can be answered from a cache keyed on its (hashable) arguments.
+'''
+from collections import OrderedDict, namedtuple
+from functools import update_wrapper
+from threading import Lock
+from types import MethodType
+import warnings
+
+try:
+    from time import monotonic as clock
+except ImportError:
+    from time import time as clock
+
+#: Statistics reported by ``cache_info()`` on a memoized function.
+CacheInfo = namedtuple('CacheInfo', 'hits misses bypasses evictions maxsize currsize')
+
+#: Unhashable builtin types; the helpers in ``globals`` fall back to mutating these in place.
+unhashable_builtins = (bytearray, dict, list, set)
+
+_kw_mark = object()
+
+
+class Memoize(object):
+    '''
+    Configuration for memoizing a rewritten function, as passed to ``pyrmute(memoize=...)``.
+    '''
+    def __init__(self, maxsize=128, ttl=None, strict=False):
+        '''
+        :param maxsize: The maximum number of entries, evicted least recently used first, or None for no limit.
+        :param ttl: The maximum age of an entry in seconds, or None for no limit.
+        :param strict: Raise TypeError rather than warn when called with unhashable builtin arguments.
+        '''
+        if maxsize is not None and maxsize < 0:
+            raise ValueError('maxsize must be None or non-negative, got {!r}'.format(maxsize))
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be None or positive, got {!r}'.format(ttl))
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.strict = strict
+
+    @classmethod
+    def coerce(cls, value):
+        '''
+        Interpret the ``memoize`` argument to ``pyrmute``.
+        :param value: True for defaults, an integer for ``maxsize``, a dict of keyword arguments or an instance.
+        :return: A Memoize instance, or None if memoization is disabled.
+        '''
+        if value is None or value is False:
+            return None
+        if value is True:
+            return cls()
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls(**value)
+        if isinstance(value, int):
+            return cls(maxsize=value)
+        raise TypeError('Expected memoize to be a bool, int, dict or Memoize, got {!r}'.format(value))
+
+    def wrap(self, func):
+        return Memoized(func, self)
+
+
+class Memoized(object):
+    '''
+    Wraps a function with a bounded LRU cache.
+
+    Repeated calls with the very same argument objects are answered without hashing them.
+    '''
+    def __init__(self, func, config):
+        update_wrapper(self, func)
+        self._func = func
+        self._config = config
+        self._cache = OrderedDict()
+        self._lock = Lock()
+        self._last = None
+        self._warned = False
+        self.hits = self.misses = self.bypasses = self.evictions = 0
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return MethodType(self, instance)
+
+    def __reduce__(self):
+        # Pickle by reference, as a function would be.
+        return self.__qualname__
+
+    def __call__(self, *args, **kw):
+        ttl = self._config.ttl
+        now = clock() if ttl is not None else None
+
+        # Identity fast path: skip hashing when called again with the same objects. It's only set when the result
+        # was cached, so a maxsize of 0 never takes it.
+        last = self._last
+        if last is not None:
+            last_args, last_kw, result, stamp = last
+            if (len(args) == len(last_args) and all(a is b for a, b in zip(args, last_args))
+                    and _same_kw(kw, last_kw) and (ttl is None or now - stamp < ttl)):
+                with self._lock:
+                    self.hits += 1
+                return result
+
+        key = args
+        if kw:
+            key += (_kw_mark,) + tuple(sorted(kw.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return self._bypass(args, kw)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                result, stamp = entry
+                if ttl is None or now - stamp < ttl:
+                    self._cache[key] = self._cache.pop(key)
+                    self.hits += 1
+                    self._last = args, kw, result, stamp
+                    return result
+                del self._cache[key]
+                self.evictions += 1
+            self.misses += 1
+
+        result = self._func(*args, **kw)
+        stamp = clock() if ttl is not None else None
+
+        with self._lock:
+            maxsize = self._config.maxsize
+            if maxsize != 0:
+                self._cache[key] = result, stamp
+                while maxsize is not None and len(self._cache) > maxsize:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+                self._last = args, kw, result, stamp
+        return result
+
+    def _bypass(self, args, kw):
+        '''Call through without caching when the arguments can't be hashed.'''
+        culprits = sorted(set(type(arg).__name__ for arg in list(args) + list(kw.values())
+                              if isinstance(arg, unhashable_builtins)))
+        if culprits:
+            message = ('{} called with unhashable builtin arguments ({}) that hit the fallback path; '
+                       'not memoizing this call.'.format(self.__name__, ', '.join(culprits)))
+        else:
+            message = '{} called with unhashable arguments; not memoizing this call.'.format(self.__name__)
+        if self._config.strict:
+            raise TypeError(message)
+        if not self._warned:
+            self._warned = True
+            warnings.warn(message, RuntimeWarning, stacklevel=3)
+        with self._lock:
+            self.bypasses += 1
+        return self._func(*args, **kw)
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.bypasses, self.evictions,
+                         self._config.maxsize, len(self._cache))
+
+    def cache_clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._last = None
+            self.hits = self.misses = self.bypasses = self.evictions = 0
+
+
+def _same_kw(kw, last_kw):
+    if len(kw) != len(last_kw):
+        return False
+    for name, value in kw.items():
+        if last_kw.get(name, _kw_mark) is not value:
+            return False
+    return True
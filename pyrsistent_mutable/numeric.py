@@ -0,0 +1,324 @@
+'''
+A persistent vector of numbers stored unboxed, for numeric list literals that declare their element type.
+
+A `TypedVector` keeps its elements in ``array`` chunks of `CHUNK` elements, so a vector of floats takes 8 bytes per
+element rather than a pointer to a boxed float. Chunks are never changed once a vector holds them: an update copies
+the chunk it changes and the tuple of chunks, and shares the rest with the original. An evolver copies each chunk
+once, on its first change, and then changes it in place.
+
+Slicing a range that starts on a chunk boundary shares the chunks it covers, and other slices copy at ``array``
+speed. `TypedVector.sum`, `min` and `max` reduce each chunk in C.
+
+The rewriter builds these from a literal or comprehension when the element type is declared, by an annotation or by
+the ``typed`` marker:
+
+    series: List[float] = [0.0] * n
+    series = pyrmute.typed(float, [float(x) for x in raw])
+
+Values are converted as ``array`` converts them, so storing a float in an int vector raises ``TypeError``, and an int
+that doesn't fit in 64 bits raises ``OverflowError``.
+'''
+from array import array
+from itertools import chain
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+from . import globals
+
+#: The number of elements in each chunk; a power of two.
+CHUNK = 512
+_SHIFT = 9
+_MASK = CHUNK - 1
+
+#: Element types to ``array`` type codes.
+typecodes = {
+    float: 'd',
+    int: 'q',
+    'float': 'd',
+    'int': 'q',
+}
+
+
+def typecode_of(element):
+    '''
+    Interpret an element type.
+    :param element: ``float``\\, ``int``\\, their names, or an ``array`` type code.
+    :return: The type code.
+    '''
+    try:
+        code = typecodes.get(element, element)
+    except TypeError:
+        code = element
+    if not isinstance(code, str) or code not in _codes:
+        raise ValueError('Expected float, int or an array type code, got {!r}'.format(element))
+    return code
+
+
+_codes = frozenset(('b', 'B', 'h', 'H', 'i', 'I', 'l', 'L', 'q', 'Q', 'f', 'd'))
+
+
+def tvector(element, iterable=()):
+    '''
+    Create a `TypedVector`.
+    :param element: The element type; see `typecode_of`.
+    :param iterable: The elements.
+    '''
+    code = typecode_of(element)
+    if isinstance(iterable, TypedVector) and iterable._typecode == code:
+        return iterable
+    return TypedVector._from_array(code, array(code, iterable))
+
+
+def _index(length, index):
+    '''Check an index, and count it from the start.'''
+    if not isinstance(index, int):
+        raise TypeError('Indices must be integers, not {}'.format(type(index).__name__))
+    if index < 0:
+        index += length
+    if not 0 <= index < length:
+        raise IndexError('Index out of range: {}'.format(index))
+    return index
+
+
+def _chunked(data):
+    '''Split an array into a tuple of chunks.'''
+    if len(data) <= CHUNK:
+        return (data,) if data else ()
+    return tuple(data[start:start + CHUNK] for start in range(0, len(data), CHUNK))
+
+
+class TypedVector(Sequence):
+    '''An immutable sequence of numbers backed by ``array`` chunks.'''
+    __slots__ = ('_typecode', '_chunks', '_length', '__weakref__')
+
+    @classmethod
+    def _wrap(cls, code, chunks, length):
+        self = object.__new__(cls)
+        self._typecode = code
+        self._chunks = chunks
+        self._length = length
+        return self
+
+    @classmethod
+    def _from_array(cls, code, data):
+        return cls._wrap(code, _chunked(data), len(data))
+
+    @property
+    def typecode(self):
+        '''The ``array`` type code of the elements.'''
+        return self._typecode
+
+    def _flat(self):
+        '''All the elements in one new array.'''
+        data = array(self._typecode)
+        for chunk in self._chunks:
+            data.extend(chunk)
+        return data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._slice(index)
+        index = _index(self._length, index)
+        return self._chunks[index >> _SHIFT][index & _MASK]
+
+    def _slice(self, index):
+        start, stop, step = index.indices(self._length)
+        if step == 1 and start & _MASK == 0 and start < stop:
+            first, last = start >> _SHIFT, stop >> _SHIFT
+            chunks = self._chunks[first:last]
+            if stop & _MASK:
+                chunks += (self._chunks[last][:stop & _MASK],)
+            return self._wrap(self._typecode, chunks, stop - start)
+        return self._from_array(self._typecode, self._flat()[index])
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks)
+
+    def __reversed__(self):
+        for chunk in reversed(self._chunks):
+            for value in reversed(chunk):
+                yield value
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, value):
+        return any(value in chunk for chunk in self._chunks)
+
+    def __eq__(self, other):
+        if isinstance(other, TypedVector):
+            return self._length == other._length and all(a == b for a, b in zip(self, other))
+        if isinstance(other, (list, Sequence)) and not isinstance(other, (tuple, str, bytes)):
+            return self._length == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return 'tvector({!r}, {!r})'.format(self._typecode, list(self))
+
+    def __reduce__(self):
+        return tvector, (self._typecode, self._flat())
+
+    def __add__(self, other):
+        return self.extend(other)
+
+    def __mul__(self, times):
+        return self._from_array(self._typecode, self._flat() * times)
+
+    __rmul__ = __mul__
+
+    def set(self, index, value):
+        if index == self._length:
+            return self.append(value)
+        index = _index(self._length, index)
+        number = index >> _SHIFT
+        chunk = array(self._typecode, self._chunks[number])
+        chunk[index & _MASK] = value
+        return self._wrap(self._typecode, self._chunks[:number] + (chunk,) + self._chunks[number + 1:], self._length)
+
+    def mset(self, *args):
+        evolver = self.evolver()
+        for index in range(0, len(args), 2):
+            evolver[args[index]] = args[index + 1]
+        return evolver.persistent()
+
+    def append(self, value):
+        chunks = self._chunks
+        if self._length & _MASK:
+            chunk = array(self._typecode, chunks[-1])
+            chunk.append(value)
+            chunks = chunks[:-1] + (chunk,)
+        else:
+            chunks += (array(self._typecode, (value,)),)
+        return self._wrap(self._typecode, chunks, self._length + 1)
+
+    def extend(self, values):
+        return self.evolver().extend(values).persistent()
+
+    def delete(self, index, stop=None):
+        data = self._flat()
+        del data[_index(self._length, index) if stop is None else slice(index, stop)]
+        return self._from_array(self._typecode, data)
+
+    def remove(self, value):
+        data = self._flat()
+        data.remove(value)
+        return self._from_array(self._typecode, data)
+
+    def sum(self, start=0):
+        '''Add up the elements, a chunk at a time.'''
+        return sum(map(sum, self._chunks), start)
+
+    def min(self):
+        '''The smallest element; raises ``ValueError`` if empty.'''
+        return min(map(min, self._chunks))
+
+    def max(self):
+        '''The largest element; raises ``ValueError`` if empty.'''
+        return max(map(max, self._chunks))
+
+    def tolist(self):
+        return list(self)
+
+    def toarray(self):
+        '''Copy the elements into a new ``array``\\.'''
+        return self._flat()
+
+    def evolver(self):
+        return TypedVectorEvolver(self)
+
+
+class TypedVectorEvolver(object):
+    '''
+    Collects changes to a `TypedVector`, copying each chunk the first time it changes.
+    '''
+    __slots__ = ('_original', '_chunks', '_length', '_owned')
+
+    def __init__(self, original):
+        self._original = original
+        self._chunks = list(original._chunks)
+        self._length = original._length
+        self._owned = set()
+
+    def _chunk(self, number):
+        '''A chunk this evolver may change.'''
+        if number not in self._owned:
+            self._chunks[number] = array(self._original._typecode, self._chunks[number])
+            self._owned.add(number)
+        return self._chunks[number]
+
+    def is_dirty(self):
+        return self._length != self._original._length or bool(self._owned)
+
+    def persistent(self):
+        if self.is_dirty():
+            self._original = TypedVector._wrap(self._original._typecode, tuple(self._chunks), self._length)
+            self._owned = set()
+        return self._original
+
+    def __getitem__(self, index):
+        index = _index(self._length, index)
+        return self._chunks[index >> _SHIFT][index & _MASK]
+
+    def __setitem__(self, index, value):
+        if index == self._length:
+            self.append(value)
+            return
+        index = _index(self._length, index)
+        self._chunk(index >> _SHIFT)[index & _MASK] = value
+
+    def __delitem__(self, index):
+        index = _index(self._length, index)
+        data = array(self._original._typecode)
+        for chunk in self._chunks:
+            data.extend(chunk)
+        del data[index]
+        self._chunks = list(_chunked(data))
+        self._length -= 1
+        self._owned = set(range(len(self._chunks)))
+
+    def __len__(self):
+        return self._length
+
+    def set(self, index, value):
+        self[index] = value
+        return self
+
+    def append(self, value):
+        if self._length & _MASK:
+            self._chunk(len(self._chunks) - 1).append(value)
+        else:
+            self._owned.add(len(self._chunks))
+            self._chunks.append(array(self._original._typecode, (value,)))
+        self._length += 1
+        return self
+
+    def extend(self, values):
+        if not isinstance(values, array) or values.typecode != self._original._typecode:
+            values = array(self._original._typecode, values)
+        start = 0
+        if self._length & _MASK and values:
+            start = CHUNK - (self._length & _MASK)
+            self._chunk(len(self._chunks) - 1).extend(values[:start])
+        for offset in range(start, len(values), CHUNK):
+            self._owned.add(len(self._chunks))
+            self._chunks.append(values[offset:offset + CHUNK])
+        self._length += len(values)
+        return self
+
+    def delete(self, index):
+        del self[index]
+        return self
+
+
+globals.register_returns_self(TypedVector, ('append', 'delete', 'extend', 'mset', 'remove', 'set'))
+globals.register_evolver_methods(TypedVector, ('append', 'extend', 'set'))
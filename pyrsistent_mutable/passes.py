@@ -0,0 +1,410 @@
+'''
+The passes that rewrite a decorated function, the analyses they share, and the optimization levels that select them.
+
+Passes run in the order of `registry`. A pass runs if it's required, or if its level is at most the optimization level
+and its options apply, which ``pyrmute(passes={name: bool})`` can override. ``pyrmute(opt=...)`` selects the level;
+the default is 0, which runs only the passes that make the rewrite work, or ``PYRMUTE_OPT``. ``PYRMUTE_PASSES`` sets
+default switches as a comma separated list of names prefixed with ``+`` or ``-``, so the test suite can be run with
+a pass turned on or off:
+
+    PYRMUTE_OPT=2 PYRMUTE_PASSES=-lower_loops python -m pytest
+'''
+from ast import Assign, Attribute, Global, Load, Name, walk
+
+from pyrsistent_mutable import globals, views
+from pyrsistent_mutable.decorator import pass_defaults
+from pyrsistent_mutable.rewrite import (
+    LowerLoops, RewriteAssignments, SettleReturns, SliceViews, Specialize, WrapParameters, WrapReturns, boundaries,
+    name_of, settlers, _param_name
+)
+
+#: The level and switches used when ``pyrmute`` isn't given them.
+defaults = pass_defaults
+
+
+class Context(object):
+    '''
+    What the passes rewriting a module share: the options, the `Names` table, and analyses of the decorated function.
+
+    Analyses are computed when first asked for, and forgotten after every pass.
+    '''
+    def __init__(self, module, names, opt=0, interner=None, intern_returns=False, track_sharing=False,
+                 boundary=None, backend=None, types=None, fallback=None, guarded=None, namespace=None, options=None,
+                 unchanged=None, track_changes=False, records=False, return_view=False):
+        self.module = module
+        self.names = names
+        self.opt = opt
+        self.interner = interner
+        self.intern_returns = intern_returns
+        self.track_sharing = track_sharing
+        self.boundary = boundary
+        self.backend = backend
+        self.types = types
+        self.fallback = fallback
+        self.guarded = guarded
+        self.namespace = namespace
+        self.options = options
+        self.unchanged = unchanged
+        self.track_changes = track_changes
+        self.records = records
+        self.return_view = return_view
+        self._analyses = {}
+
+    @property
+    def function(self):
+        '''The decorated function, the first function defined by the module.'''
+        for stmt in self.module.body:
+            if type(stmt).__name__ in ('AsyncFunctionDef', 'FunctionDef'):
+                return stmt
+        return None
+
+    def analysis(self, name, compute):
+        if name not in self._analyses:
+            self._analyses[name] = compute(self)
+        return self._analyses[name]
+
+    def invalidate(self):
+        self._analyses.clear()
+
+    def def_use(self):
+        return self.analysis('def_use', DefUse)
+
+    def helper(self, node):
+        '''
+        Identify a call to a function from `globals`.
+        :return: The function called, or None.
+        '''
+        if type(node).__name__ != 'Call' or not isinstance(node.func, Name):
+            return None
+        return self.analysis('helpers', _helpers).get(node.func.id)
+
+    def type_facts(self):
+        '''
+        Find locals and parameters whose type is known throughout the decorated function.
+
+        Parameters have the types given for adaptive specialization. Locals have a type if they're made by a
+        constructor of the backend, and from level 2, if they're copied from a local of a known type. Either way, every
+        other assignment must be an update by a helper, as those preserve the type of persistent values.
+        :return: A dictionary of names to types.
+        '''
+        return self.analysis('type_facts', _type_facts)
+
+
+class DefUse(object):
+    '''
+    Where the names in the decorated function are bound and used, including in nested scopes, so it's conservative.
+
+    :ivar assigned: Names to the values of simple assignments ``name = value`` to them.
+    :ivar rebound: Names bound any other way, including declared ``global`` or ``nonlocal``.
+    :ivar loads: Names to the number of times they're read.
+    :ivar params: The names of the parameters.
+    '''
+    def __init__(self, context):
+        self.assigned = {}
+        self.rebound = set()
+        self.loads = {}
+        self.params = set()
+        function = context.function
+        if function is None:
+            return
+        args = function.args
+        params = list(getattr(args, 'posonlyargs', [])) + list(args.args) + list(getattr(args, 'kwonlyargs', []))
+        params += [param for param in (args.vararg, args.kwarg) if param is not None]
+        self.params = set(_param_name(param) for param in params)
+        simple = set()
+        for node in walk(function):
+            if isinstance(node, Assign) and len(node.targets) == 1 and isinstance(node.targets[0], Name):
+                self.assigned.setdefault(node.targets[0].id, []).append(node.value)
+                simple.add(id(node.targets[0]))
+            elif isinstance(node, Global) or type(node).__name__ == 'Nonlocal':
+                self.rebound.update(node.names)
+        for node in walk(function):
+            if isinstance(node, Name):
+                if isinstance(node.ctx, Load):
+                    self.loads[node.id] = self.loads.get(node.id, 0) + 1
+                elif id(node) not in simple:
+                    self.rebound.add(node.id)
+
+
+def _helpers(context):
+    helpers = {}
+    for name in dir(globals):
+        value = getattr(globals, name)
+        if callable(value) and getattr(value, '__module__', None) == globals.__name__:
+            local = context.names.imports.get(name_of(value))
+            if local is not None:
+                helpers[local] = value
+    return helpers
+
+
+_updates = (globals.del_attr, globals.del_slice, globals.invoke, globals.invoke_item, globals.invoke_item_unless_equal,
+            globals.set_via_attr, globals.set_via_attr_unless_equal, globals.set_via_attr_unless_identical,
+            globals.set_via_slice, globals.set_via_slice_unless_equal, globals.set_via_slice_unless_identical,
+            globals.setdefault_invoke, globals.setdefault_invoke_unless_equal)
+
+
+def _type_facts(context):
+    def_use = context.def_use()
+    evolvers = {}
+    for name, values in def_use.assigned.items():
+        for value in values:
+            if context.helper(value) is globals.batch and value.args and isinstance(value.args[0], Name):
+                evolvers[name] = value.args[0].id
+
+    def is_update(name, value):
+        if context.helper(value) in _updates:
+            return bool(value.args) and isinstance(value.args[0], Name) and value.args[0].id == name
+        # The end of a loop run on an evolver by `LowerLoops`.
+        return (type(value).__name__ == 'Call' and isinstance(value.func, Attribute)
+                and value.func.attr == 'persistent' and isinstance(value.func.value, Name)
+                and evolvers.get(value.func.value.id) == name)
+
+    constructors = {}
+    backend = context.backend
+    if backend is not None:
+        for con in (backend.map, backend.vector, backend.set):
+            local = context.names.imports.get(name_of(con))
+            if local is not None:
+                constructors[local] = type(con())
+
+    def origin(name, value, facts):
+        '''The type a value gives a local, or None if it doesn't.'''
+        if type(value).__name__ == 'Call' and isinstance(value.func, Name) and value.func.id in constructors:
+            return constructors[value.func.id]
+        if context.opt >= 2 and isinstance(value, Name) and value.id != name:
+            return facts.get(value.id)
+        return None
+
+    facts = {}
+    for name, cls in (context.types or {}).items():
+        if name in def_use.params and name not in def_use.rebound and all(
+                is_update(name, value) for value in def_use.assigned.get(name, ())):
+            facts[name] = cls
+
+    # Iterate to a fixed point, as copies can refer to locals found later.
+    changed = True
+    while changed:
+        changed = False
+        for name, values in def_use.assigned.items():
+            if name in facts or name in def_use.params or name in def_use.rebound:
+                continue
+            found = set()
+            for value in values:
+                if not is_update(name, value):
+                    found.add(origin(name, value, facts))
+            if len(found) == 1 and None not in found:
+                facts[name] = found.pop()
+                changed = True
+    return facts
+
+
+class Pass(object):
+    '''
+    A step of the rewrite.
+
+    :cvar name: The name used to switch the pass on or off, and to time it.
+    :cvar level: The lowest optimization level that runs the pass, or None if it only runs when switched on.
+    :cvar required: The rewrite doesn't work without the pass, so it always runs.
+    '''
+    name = None
+    level = 0
+    required = False
+
+    def applies(self, context):
+        '''Whether the options being rewritten with call for this pass.'''
+        return True
+
+    def run(self, context):
+        raise NotImplementedError
+
+
+class InlinePass(Pass):
+    '''Substitute small decorated functions from the same module into the decorated function; see `inline`.'''
+    name = 'inline'
+    level = None
+
+    def applies(self, context):
+        # The callee has the same options. Those that wrap its parameters, its returns or its writes don't carry over
+        # to an inlined copy, which would then mutate arguments or lose records, so those functions aren't inlined.
+        return (context.namespace is not None and context.options is not None and context.interner is None
+                and context.boundary is None and not context.track_changes and not context.return_view
+                and not context.track_sharing)
+
+    def run(self, context):
+        from pyrsistent_mutable.inline import Inline
+        Inline(context.names, context.namespace, context.options, context.def_use()).visit(context.module)
+
+
+class RewriteAssignmentsPass(Pass):
+    name = 'rewrite'
+    required = True
+
+    def run(self, context):
+        RewriteAssignments(context.names, context.interner, context.track_sharing, context.backend,
+                           context.unchanged, context.track_changes, context.records,
+                           context.namespace).visit(context.module)
+
+
+class LowerLoopsPass(Pass):
+    name = 'lower_loops'
+
+    def run(self, context):
+        LowerLoops(context.names).visit(context.module)
+
+
+class SpecializeLocalsPass(Pass):
+    '''Make direct method calls on locals whose type is known; see `Context.type_facts`.'''
+    name = 'specialize_locals'
+    level = 1
+
+    def run(self, context):
+        params = context.def_use().params
+        facts = dict((name, cls) for name, cls in context.type_facts().items() if name not in params)
+        if facts:
+            Specialize(context.names, facts).visit(context.module)
+
+
+class SliceViewsPass(Pass):
+    '''Take slices that are only read as views rather than copies; see `rewrite.SliceViews`\\.'''
+    name = 'slice_views'
+    level = 2
+
+    def run(self, context):
+        SliceViews(context.names, context.def_use(), context.namespace).visit(context.module)
+
+
+class SettleReturnsPass(Pass):
+    '''Settle the views a boundary leaves in returned values, before anything else wraps them.'''
+    name = 'settle_returns'
+    required = True
+
+    def applies(self, context):
+        return context.boundary in settlers
+
+    def run(self, context):
+        SettleReturns(context.names, *settlers[context.boundary]).visit(context.module)
+
+
+class WrapReturnsPass(Pass):
+    name = 'wrap_returns'
+    required = True
+
+    def applies(self, context):
+        return context.interner is not None and context.intern_returns
+
+    def run(self, context):
+        WrapReturns(context.names, context.interner, 'intern').visit(context.module)
+
+
+class ReturnViewsPass(Pass):
+    name = 'return_views'
+    required = True
+
+    def applies(self, context):
+        return context.return_view
+
+    def run(self, context):
+        WrapReturns(context.names, views.view, 'view', imported=True).visit(context.module)
+
+
+class WrapParametersPass(Pass):
+    name = 'wrap_parameters'
+    required = True
+
+    def applies(self, context):
+        return context.boundary is not None
+
+    def run(self, context):
+        WrapParameters(context.names, boundaries[context.boundary]).visit(context.module)
+
+
+class SpecializePass(Pass):
+    '''Specialize parameters for the types adaptive specialization saw, behind a guard.'''
+    name = 'specialize'
+    required = True
+
+    def applies(self, context):
+        return bool(context.types)
+
+    def run(self, context):
+        params = context.def_use().params
+        facts = dict((name, cls) for name, cls in context.type_facts().items() if name in params)
+        if facts:
+            Specialize(context.names, facts, context.fallback, context.guarded).visit(context.module)
+
+
+#: Every pass, in the order they run.
+registry = [
+    InlinePass(),
+    RewriteAssignmentsPass(),
+    LowerLoopsPass(),
+    SpecializeLocalsPass(),
+    SliceViewsPass(),
+    SettleReturnsPass(),
+    WrapReturnsPass(),
+    ReturnViewsPass(),
+    WrapParametersPass(),
+    SpecializePass(),
+]
+
+
+class Pipeline(object):
+    '''
+    The passes selected by an optimization level and switches.
+    '''
+    def __init__(self, opt=None, switches=None):
+        '''
+        :param opt: The optimization level, or None for the default.
+        :param switches: A dictionary of pass names to True or False to run them or not, regardless of the level.
+        '''
+        self.opt, self.switches = resolve(opt, switches)
+
+    def selected(self, context):
+        '''The passes to run for the given options.'''
+        for step in registry:
+            on = self.switches.get(step.name, step.required or step.level is not None and step.level <= self.opt)
+            if on and step.applies(context):
+                yield step
+
+    def run(self, context, profile):
+        for step in self.selected(context):
+            with profile(step.name):
+                step.run(context)
+            context.invalidate()
+
+
+def resolve(opt=None, switches=None):
+    '''
+    Fill in the optimization level and switches from `defaults`, and check them.
+    :return: A tuple of the level and a dictionary of switches.
+    '''
+    if opt is None:
+        opt = defaults['opt']
+    if opt not in (0, 1, 2):
+        raise ValueError('Expected opt to be 0, 1 or 2, got {!r}'.format(opt))
+    merged = dict(defaults['passes'])
+    merged.update(switches or {})
+    known = dict((step.name, step) for step in registry)
+    for name, on in merged.items():
+        if name not in known:
+            raise ValueError('Unknown pass {!r}; expected one of {}.'.format(name, ', '.join(sorted(known))))
+        if known[name].required and not on:
+            raise ValueError('The {} pass is required.'.format(name))
+    return opt, merged
+
+
+def set_defaults(opt=None, passes=None):
+    '''
+    Set the optimization level and switches used when ``pyrmute`` isn't given them.
+    :param opt: The level, or None to leave it.
+    :param passes: A dictionary of pass names to True or False, replacing the default switches, or None to leave them.
+    '''
+    opt = defaults['opt'] if opt is None else opt
+    passes = dict(defaults['passes'] if passes is None else passes)
+    # Check them before changing anything, so bad settings leave the defaults as they were.
+    resolve(opt, passes)
+    defaults['opt'], defaults['passes'] = opt, passes
+
+
+# Check the defaults read from the environment.
+resolve()
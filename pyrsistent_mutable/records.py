@@ -0,0 +1,214 @@
+'''
+Compact records for dict literals with a fixed set of string keys, built with ``pyrmute(records=True)``.
+
+A literal like ``{'id': i, 'name': n}`` becomes a `Record` of a class generated for its keys, in order, and shared by
+every literal with the same keys. A record holds its values in a tuple and finds keys through its class, so it takes
+a fraction of the memory of a ``pmap``. It behaves like one: it's a ``Mapping``\\, equal to and hashing like a
+``pmap`` with the same items, and ``set``\\, ``evolver`` and the rest return updated copies.
+
+Replacing the value of a key keeps the shape. The first change that adds or removes a key returns a ``pmap``
+instead, so code that grows a record carries on with the general structure.
+'''
+from pyrsistent import pmap
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from . import globals
+
+_shapes = {}
+
+
+def shape(keys):
+    '''
+    Get the `Record` class for a tuple of keys, in order, creating it the first time.
+    :raise ValueError: if a key is repeated.
+    '''
+    try:
+        return _shapes[keys]
+    except KeyError:
+        pass
+    keys = tuple(keys)
+    index = dict((key, number) for number, key in enumerate(keys))
+    if len(index) != len(keys):
+        raise ValueError('Expected distinct keys, got {!r}'.format(keys))
+    cls = type('Record', (Record,), {'__slots__': (), '_keys': keys, '_index': index})
+    return _shapes.setdefault(keys, cls)
+
+
+def make(keys, *values):
+    '''Build a record of the shape of `keys` from its values; the rewrite calls this with the keys as a constant.'''
+    return shape(keys)._make(values)
+
+
+def record(mapping=(), **kw):
+    '''Build a record with the items of a mapping, in its order, like ``dict``\\.'''
+    items = dict(mapping, **kw)
+    return shape(tuple(items))._make(tuple(items.values()))
+
+
+class Record(Mapping):
+    '''
+    An immutable map with the keys of its class, the base of the classes `shape` creates.
+    '''
+    __slots__ = ('_values', '__weakref__')
+    _keys = ()
+    _index = {}
+
+    @classmethod
+    def _make(cls, values):
+        self = object.__new__(cls)
+        self._values = values
+        return self
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self._values == other._values
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return len(self) == len(other) and dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        # The same as a pmap with these items.
+        return hash(frozenset(zip(self._keys, self._values)))
+
+    def __repr__(self):
+        return 'record({!r})'.format(dict(zip(self._keys, self._values)))
+
+    def __reduce__(self):
+        return make, (self._keys,) + self._values
+
+    def to_pmap(self):
+        '''A ``pmap`` with the same items.'''
+        return pmap(dict(zip(self._keys, self._values)))
+
+    def set(self, key, value):
+        '''Replace the value of a key, or add one, which returns a ``pmap``\\.'''
+        index = self._index.get(key)
+        if index is None:
+            return self.to_pmap().set(key, value)
+        values = self._values
+        return self._make(values[:index] + (value,) + values[index + 1:])
+
+    def remove(self, key):
+        '''Remove a key, which returns a ``pmap``\\; raises ``KeyError`` if there's no such key.'''
+        if key not in self._index:
+            raise KeyError(key)
+        return self.to_pmap().remove(key)
+
+    def discard(self, key):
+        '''Remove a key if there is one, which returns a ``pmap``\\.'''
+        if key not in self._index:
+            return self
+        return self.to_pmap().remove(key)
+
+    def update(self, *maps):
+        return self.update_with(lambda old, new: new, *maps)
+
+    __add__ = update
+
+    def update_with(self, update_fn, *maps):
+        evolver = self.evolver()
+        for other in maps:
+            for key, value in other.items():
+                evolver.set(key, update_fn(evolver[key], value) if key in evolver else value)
+        return evolver.persistent()
+
+    def transform(self, *transformations):
+        '''As ``pmap.transform``\\, which returns a ``pmap``\\.'''
+        return self.to_pmap().transform(*transformations)
+
+    def evolver(self):
+        return RecordEvolver(self)
+
+
+class RecordEvolver(object):
+    '''
+    Collects changes to a `Record`\\, in a list of values until a key is added or removed, then in a ``pmap`` evolver.
+    '''
+    __slots__ = ('_original', '_values', '_map')
+
+    def __init__(self, original):
+        self._original = original
+        self._values = None
+        self._map = None
+
+    def _current(self):
+        return self._original._values if self._values is None else self._values
+
+    def _reshape(self):
+        '''Continue with a ``pmap`` evolver, since the keys are changing.'''
+        self._map = pmap(dict(zip(self._original._keys, self._current()))).evolver()
+        return self._map
+
+    def __getitem__(self, key):
+        if self._map is not None:
+            return self._map[key]
+        return self._current()[self._original._index[key]]
+
+    def __contains__(self, key):
+        if self._map is not None:
+            return key in self._map
+        return key in self._original._index
+
+    def __len__(self):
+        return len(self._original) if self._map is None else len(self._map)
+
+    def __setitem__(self, key, value):
+        if self._map is None:
+            index = self._original._index.get(key)
+            if index is not None:
+                if self._values is None:
+                    self._values = list(self._original._values)
+                self._values[index] = value
+                return
+            self._reshape()
+        self._map[key] = value
+
+    def __delitem__(self, key):
+        if self._map is None:
+            if key not in self._original._index:
+                raise KeyError(key)
+            self._reshape()
+        del self._map[key]
+
+    def set(self, key, value):
+        self[key] = value
+        return self
+
+    def remove(self, key):
+        del self[key]
+        return self
+
+    def is_dirty(self):
+        return self._values is not None or self._map is not None
+
+    def persistent(self):
+        if self._map is not None:
+            return self._map.persistent()
+        if self._values is not None:
+            self._original = self._original._make(tuple(self._values))
+            self._values = None
+        return self._original
+
+
+globals.register_returns_self(Record, ('discard', 'remove', 'set', 'transform', 'update', 'update_with'))
+globals.register_evolver_methods(Record, ('remove', 'set'))
@@ -1,20 +1,93 @@
 from ast import (
-    Assign, Attribute, BinOp, Delete, Dict, DictComp, Expr, ImportFrom, Load, Name,
-    NodeTransformer, NodeVisitor, Store, Str, Subscript, alias, copy_location as cl, fix_missing_locations as fml
+    Assign, Attribute, BinOp, BoolOp, Compare, Del, Delete, Dict, DictComp, Expr, ExtSlice, GeneratorExp, Global, If,
+    ImportFrom, Index, IsNot, Lambda, List, ListComp, Load, Mult, Name, NameConstant, Num, NodeTransformer, NodeVisitor,
+    Or, Return, Slice, Starred, Store, Str, Subscript, Try, Tuple, alias, copy_location as cl, dump,
+    fix_missing_locations as fml, get_docstring, iter_child_nodes, keyword, walk
 )
 from collections import defaultdict
+from copy import deepcopy
 
 from pyrsistent_mutable.ast6 import match_ast, Context, deslicify, Cap
 from .ast6 import call6
 
-from pyrsistent import pmap, pset, pvector
-from pyrsistent_mutable import globals
+from pyrsistent import PClass, PMap, PSet, PVector, freeze
+from pyrsistent_mutable import changes, cow, globals, numeric, records, sharing, slices
+from pyrsistent_mutable.backends import pyrsistent_backend
+from pyrsistent_mutable.decorator import raw, typed
+from pyrsistent_mutable.timing import untimed
 
+#: Functions that convert parameters at entry for each ``boundary`` mode.
+boundaries = {
+    'cow': cow.cow,
+    'freeze': freeze,
+}
 
-def rewrite(module):
-    with Names(module) as imports:
-        RewriteAssignments(imports).visit(module)
-    return fml(module)
+#: For each ``boundary`` mode, a function that tells whether the converted parameters need settling, and one that
+#: converts returned values, so results don't alias the caller's objects; see `SettleReturns`\\.
+settlers = {
+    'cow': (cow.viewed, cow.settle),
+}
+
+#: The helpers that ``pyrmute(unchanged=...)`` uses instead of the usual ones, so writes that change nothing return
+#: the object they were given.
+unchanged_helpers = {
+    'identical': {
+        globals.set_via_attr: globals.set_via_attr_unless_identical,
+        globals.set_via_slice: globals.set_via_slice_unless_identical,
+    },
+    'equal': {
+        globals.invoke_item: globals.invoke_item_unless_equal,
+        globals.set_via_attr: globals.set_via_attr_unless_equal,
+        globals.set_via_slice: globals.set_via_slice_unless_equal,
+        globals.setdefault_invoke: globals.setdefault_invoke_unless_equal,
+    },
+}
+
+
+def rewrite(module, env=None, interner=None, intern_returns=False, track_sharing=False, boundary=None,
+            backend=pyrsistent_backend, types=None, fallback=None, guarded=None, profile=untimed, opt=None,
+            passes=None, namespace=None, options=None, unchanged=None, track_changes=False, records=False,
+            return_view=False):
+    '''
+    Rewrite a module containing a decorated function.
+    :param module: The parsed module.
+    :param env: A dictionary that receives values the rewritten code expects as globals.
+    :param interner: An `Interner` to canonicalize literals with.
+    :param intern_returns: Also canonicalize returned values with the interner.
+    :param track_sharing: Report the value of each rewritten assignment to `sharing.record`.
+    :param boundary: A key of `boundaries` naming how to convert parameters at entry.
+    :param backend: The `Backend` whose constructors literals are wrapped with.
+    :param types: A dictionary of parameter names to the types to specialize the function for; see `Specialize`.
+    :param fallback: Called with the arguments instead when the specialized function gets other types.
+    :param guarded: A dictionary that receives the parameters the specialized function checks, and their types.
+    :param profile: A `timing.Profile` to time each pass with.
+    :param opt: The optimization level, or None for the default; see `passes`.
+    :param passes: A dictionary of pass names to True or False, to run them or not regardless of the level.
+    :param namespace: The globals of the decorated function's module, to find functions to inline.
+    :param options: A tuple of the options that change what rewritten code does; only functions decorated with the
+        same options are inlined.
+    :param unchanged: A key of `unchanged_helpers` naming how to tell that a write changes nothing, or None.
+    :param track_changes: Report the writes to parameters of the decorated function to `changes`\\.
+    :param records: Build dict literals with fixed string keys as `records.Record`\\.
+    :param return_view: Pass returned values through `views.view`\\.
+    :return: The rewritten module.
+    '''
+    from pyrsistent_mutable.passes import Context, Pipeline
+    pipeline = Pipeline(opt, passes)
+    names = Names(module)
+    with profile('names'):
+        names.scan()
+    with names as imports:
+        context = Context(module, imports, pipeline.opt, interner, intern_returns, track_sharing, boundary, backend,
+                          types, fallback, guarded, namespace, options, unchanged, track_changes, records,
+                          return_view)
+        pipeline.run(context, profile)
+    if imports.injected:
+        if env is None:
+            raise TypeError('Rewriting requires an env to hold {}.'.format(', '.join(sorted(imports.injected))))
+        env.update(imports.injected)
+    with profile('fix_missing_locations'):
+        return fml(module)
 
 
 class NamesInUse(NodeVisitor):
@@ -52,13 +125,20 @@ class Names:
     def __init__(self, module, prefix='_'):
         self.module = module
         self.imports = {}
+        self.injected = {}
         self.prefix = prefix
+        self.names = None
 
     def __enter__(self):
+        if self.names is None:
+            self.scan()
+        return self
+
+    def scan(self):
+        '''Find the names in use in the module.'''
         niu = NamesInUse()
         niu.visit(self.module)
         self.names = niu.names
-        return self
 
     def dotted(self, *parts):
         '''
@@ -76,6 +156,20 @@ class Names:
         self.imports[parts] = name
         return name
 
+    def inject(self, value, hint):
+        '''
+        Give a runtime value a unique global name, for values that can't be imported by name.
+        :param value: The value the rewritten code will reference.
+        :param hint: Suggests the name, as in `unique`.
+        :return: a unique name that will be bound to the value.
+        '''
+        for name, existing in self.injected.items():
+            if existing is value:
+                return name
+        name = self.unique(hint)
+        self.injected[name] = value
+        return name
+
     def unique(self, part):
         '''
         Get a unique local or global name within this context given part of a name.
@@ -99,11 +193,13 @@ class Names:
         for parts, name in self.imports.items():
             modules[parts[:-1]].append((parts[-1], name))
         stmts = []
+        # Attribute the imports to the first statement, rather than line 1 of the file.
+        first = self.module.body[0] if self.module.body else None
         for mod, aliases in sorted(modules.items()):
             aliases = [alias(name=name, asname=asname)
                        for name, asname in sorted(aliases)]
-            stmts.append(ImportFrom(module='.'.join(mod), names=aliases,
-                                    lineno=1, col_offset=0, level=0))
+            stmt = ImportFrom(module='.'.join(mod), names=aliases, lineno=1, col_offset=0, level=0)
+            stmts.append(stmt if first is None else cl(stmt, first))
         self.module.body[0:0] = stmts
 
     def call_global(self, name, args, keywords=None, src=None):
@@ -115,7 +211,17 @@ class Names:
         :param src: A source node to copy the location of this call from.
         :return: The AST node calling the function as requested.
         '''
-        func = Name(id=self.dotted(name), ctx=Load())
+        return self._call(self.dotted(name), args, keywords, src)
+
+    def call_injected(self, value, hint, args, keywords=None, src=None):
+        '''
+        Call a runtime value we're providing to the rewritten module; see `inject` and `call_global`.
+        '''
+        return self._call(self.inject(value, hint), args, keywords, src)
+
+    @staticmethod
+    def _call(name, args, keywords, src):
+        func = Name(id=name, ctx=Load())
         if keywords is None:
             keywords = []
         call = call6(func=func, args=args, keywords=keywords)
@@ -130,15 +236,90 @@ def name_of(func):
     return tuple(parts)
 
 
-_slice = Attribute(value=Name(id='__builtins__', ctx=Load()), attr='slice', ctx=Load())
+def refers_to(node, namespace, value):
+    '''
+    Whether an expression naming a global, like ``raw`` or ``pyrmute.raw``, refers to a value.
+    :param node: The expression.
+    :param namespace: The globals of the decorated function's module, or None to compare only the last name with the
+        value's name.
+    :param value: The value.
+    '''
+    attrs = []
+    while isinstance(node, Attribute):
+        attrs.append(node.attr)
+        node = node.value
+    if not isinstance(node, Name):
+        return False
+    if namespace is None:
+        return (attrs[0] if attrs else node.id) == value.__name__
+    found = namespace.get(node.id, _missing)
+    for attr in reversed(attrs):
+        found = getattr(found, attr, _missing)
+    return found is value
+
+
+_missing = object()
 
 
 class RewriteAssignments(NodeTransformer):
     '''
     The main transformer, this converts assignments and literals. See methods for details.
     '''
-    def __init__(self, names):
+    def __init__(self, names, interner=None, track_sharing=False, backend=pyrsistent_backend, unchanged=None,
+                 track_changes=False, records=False, namespace=None):
         self.names = names
+        self.interner = interner
+        self.track_sharing = track_sharing
+        self.backend = backend
+        self.helpers = unchanged_helpers[unchanged] if unchanged is not None else {}
+        self.track_changes = track_changes
+        self.records = records
+        self.namespace = namespace
+        # The name and parameters of the decorated function while its own statements are visited, for track_changes,
+        # and the local that holds the collector its call claims on entry, once a write needs it.
+        self.scope = None
+        self.collector = None
+        self.depth = 0
+
+    def visit_FunctionDef(self, node):
+        outer = self.scope
+        self.depth += 1
+        self.scope = (node.name, _params(node.args)) if self.depth == 1 else None
+        try:
+            self.generic_visit(node)
+        finally:
+            self.depth -= 1
+            self.scope = outer
+        if self.depth == 0 and self.collector is not None:
+            # _collector = enter('update'), so only the call that claims it records, not recursive calls.
+            claim = Assign(targets=[Name(id=self.collector, ctx=Store())],
+                           value=self.names.call_global(changes.enter, [Str(s=node.name)]))
+            start = 1 if get_docstring(node) is not None else 0
+            node.body.insert(start, cl(claim, node.body[0]))
+            self.collector = None
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        outer, self.scope = self.scope, None
+        self.depth += 1
+        try:
+            return self.generic_visit(node)
+        finally:
+            self.depth -= 1
+            self.scope = outer
+
+    visit_Lambda = visit_ClassDef
+
+    def helper(self, func, leaf=True):
+        '''
+        The helper to call in place of one from `globals`, as ``unchanged`` selects.
+        :param leaf: False for the containers on the path to a nested target, which are unchanged exactly when the
+            update of the item they hold returned that item, so they're only compared by identity.
+        '''
+        helpers = self.helpers if leaf or not self.helpers else unchanged_helpers['identical']
+        return helpers.get(func, func)
 
     def visit_AugAssign(self, node):
         '''
@@ -148,15 +329,16 @@ class RewriteAssignments(NodeTransformer):
         :param node: An AugAssign node.
         :return: The same node transformed into a regular assignment.
         '''
+        written = self.written([node.target])
         node = cl(Assign(
             targets=[Context.set(Store, node.target)],
             value=BinOp(
-                left=Context.set(Load, node.target),
+                left=self.visit(Context.set(Load, node.target)),
                 op=node.op,
                 right=self.visit(node.value)
             )
         ), node)
-        return self.visit_Assign(node)
+        return self.recorded(written, 'set', self.assign(node, node.value), node)
 
     def visit_Assign(self, node):
         '''
@@ -184,34 +366,152 @@ class RewriteAssignments(NodeTransformer):
         :param node: An assignment node.
         :return: A destructured assignment.
         '''
-        def set_attr(lhs, attr, rhs):
-            return self.names.call_global(globals.set_via_attr,
-                                          [Context.set(Load, lhs), Str(s=attr), rhs],
+        return self.recorded(self.written(node.targets), 'set', self.assign(node, self.visit(node.value)), node)
+
+    def written(self, targets):
+        '''
+        Find the targets that are paths into parameters of the decorated function, when tracking changes. This copies
+        them, since rewriting the statement changes them.
+
+        The path is read by `changes.before` as well as by the write, so a key that might not give the same value
+        twice is assigned to a temporary first, and the target changed to read it, as in ``state[f()] = v``\\.
+        :param targets: The targets of a statement, as the function wrote them.
+        :return: A list of tuples of the assignments to those temporaries, the parameter, the keys and attribute names
+            on the path, and their kinds; see `changes.before`\\.
+        '''
+        if not self.track_changes or self.scope is None:
+            return []
+        params = self.scope[1]
+        found = []
+        for target in targets:
+            path = []
+            root = target
+            while isinstance(root, (Attribute, Subscript)):
+                path.append(root)
+                root = root.value
+            if not isinstance(root, Name) or root.id not in params:
+                continue
+            hoisted, keys, kinds = [], [], ''
+            for node in reversed(path):
+                if isinstance(node, Attribute):
+                    keys.append(Str(s=node.attr))
+                    kinds += 'a'
+                    continue
+                if not _simple(_item_key(node.slice)):
+                    temp = self.names.unique('key')
+                    hoisted.append(Assign(targets=[Name(id=temp, ctx=Store())],
+                                          value=Context.set(Load, _deslicify(self.names, node.slice))))
+                    node.slice = Index(value=Name(id=temp, ctx=Load()))
+                keys.append(Context.set(Load, _deslicify(self.names, deepcopy(node.slice))))
+                kinds += 'i'
+            found.append((hoisted, root.id, keys, kinds))
+        return found
+
+    def recorded(self, written, op, stmts, node):
+        '''
+        Report writes to parameters of the decorated function to `changes`\\:
+
+            _change = before(_collector, 'state', state, (key, 'value'), 'ia')
+            state = set_via_slice(state, key, set_via_attr(state[key], 'value', v))
+            after(_change, state, 'set')
+
+        ``_collector`` is what `changes.enter` returned on entry to the decorated function.
+
+        :param written: What `written` found in the targets.
+        :param op: What the statement does to them; see `changes.Change`\\.
+        :param stmts: The rewritten statements.
+        '''
+        before, after = [], []
+        if written and self.collector is None:
+            self.collector = self.names.unique('collector')
+        for hoisted, param, keys, kinds in written:
+            before.extend(cl(stmt, node) for stmt in hoisted)
+            temp = self.names.unique('change')
+            call = self.names.call_global(changes.before, [
+                Name(id=self.collector, ctx=Load()), Str(s=param), Name(id=param, ctx=Load()), Tuple(elts=keys, ctx=Load()),
+                Str(s=kinds)], src=node)
+            before.append(cl(Assign(targets=[Name(id=temp, ctx=Store())], value=call), node))
+            call = self.names.call_global(changes.after, [
+                Name(id=temp, ctx=Load()), Name(id=param, ctx=Load()), Str(s=op)], src=node)
+            after.append(cl(Expr(value=call), node))
+        return before + stmts + after
+
+    def assign(self, node, node_val, leaf=True):
+        '''
+        Destructure an assignment whose value has already been rewritten.
+        :param leaf: False if the value is an update of the target, so the target is only compared by identity; see
+            `helper`.
+        '''
+        hoisted = {}
+
+        def read(lhs):
+            temp = hoisted.get(dump(Context.set(Load, lhs)))
+            return Name(id=temp, ctx=Load()) if temp is not None else Context.set(Load, lhs)
+
+        def set_attr(lhs, attr, rhs, leaf):
+            return self.names.call_global(self.helper(globals.set_via_attr, leaf),
+                                          [read(lhs), Str(s=attr), rhs],
                                           src=node)
 
-        def set_sub(lhs, sub, rhs):
-            return self.names.call_global(globals.set_via_slice,
-                                          [Context.set(Load, lhs), deslicify(sub), rhs],
+        def set_sub(lhs, sub, rhs, leaf):
+            return self.names.call_global(self.helper(globals.set_via_slice, leaf),
+                                          [read(lhs), Context.set(Load, _deslicify(self.names, sub)), rhs],
                                           src=node)
 
-        def destructure(lhs, rhs):
+        def destructure(lhs, rhs, leaf=True):
             if isinstance(lhs, Attribute):
-                return destructure(lhs.value, set_attr(lhs.value, lhs.attr, rhs))
+                return destructure(lhs.value, set_attr(lhs.value, lhs.attr, rhs, leaf), False)
             elif isinstance(lhs, Subscript):
-                return destructure(lhs.value, set_sub(lhs.value, lhs.slice, rhs))
+                return destructure(lhs.value, set_sub(lhs.value, lhs.slice, rhs, leaf), False)
             else:
                 return lhs, rhs
 
         out = []
-        node_val = self.visit(node.value)
+        if len(node.targets) == 1:
+            out.extend(cl(stmt, node) for stmt in self.hoist(node.targets[0], node_val, hoisted))
+            node_val = _Substitute(hoisted).visit(node_val)
         for target in node.targets:
-            lhs, rhs = destructure(target, node_val)
+            lhs, rhs = destructure(target, node_val, leaf)
             cl(lhs, target)
             cl(rhs, node_val)
+            if self.track_sharing:
+                rhs = self.names.call_global(sharing.record, [Num(n=node.lineno), rhs], src=node)
             assign = cl(Assign(targets=[Context.set(Store, lhs)], value=rhs), node)
             out.append(assign)
         return out
 
+    def hoist(self, target, value, hoisted):
+        '''
+        Read each container on the path of a nested target once, if the value reads it too, so that
+        ``a[i][j] = a[i][j] + 1`` looks up ``a[i]`` once:
+
+            _item = a[i]
+            a = set_via_slice(a, i, set_via_slice(_item, j, _item[j] + 1))
+
+        Only paths whose keys are names or constants are hoisted, as other keys may not give the same item twice.
+        :param hoisted: Receives the dumps of the containers read, mapped to the temporaries holding them.
+        :return: The assignments to the temporaries.
+        '''
+        containers = []
+        node = target
+        while isinstance(node, (Attribute, Subscript)):
+            node = node.value
+            containers.append(node)
+        if not isinstance(node, Name):
+            return []
+        reads = set(dump(child) for child in walk(value) if isinstance(child, (Attribute, Subscript)))
+        out = []
+        for container in reversed(containers[:-1]):
+            if isinstance(container, Subscript) and not _simple(_item_key(container.slice)):
+                break
+            container = Context.set(Load, container)
+            key = dump(container)
+            if key in reads:
+                temp = self.names.unique('item')
+                out.append(Assign(targets=[Name(id=temp, ctx=Store())], value=_Substitute(hoisted).visit(container)))
+                hoisted[key] = temp
+        return out
+
     #: A pattern to match a method call.
     _method_pattern = call6(
         func=Attribute(
@@ -232,10 +532,41 @@ class RewriteAssignments(NodeTransformer):
         if match is None:
             return cl(Expr(value=self.visit(node.value)), node)
         subject = match['subject']
-        args = [subject, Str(s=match['method'])] + match['arguments']
-        assign = Assign(targets=[Context.set(Store, subject)],
-                        value=self.names.call_global(globals.invoke, args, match['keywords']))
-        return self.visit_Assign(cl(assign, node))
+        method = Str(s=match['method'])
+        default = match_ast(self._setdefault_pattern, subject)
+        if default is None:
+            written = self.written([subject])
+        else:
+            item = Subscript(value=default['subject'], slice=Index(value=default['key']), ctx=Load())
+            written = self.written([item])
+            default['key'] = _item_key(item.slice)
+        fused = True
+        if isinstance(subject, Subscript) and _item_key(subject.slice) is not None:
+            # Fuse the lookup and the update of the item: x[k].append(v)
+            subject, key = subject.value, _item_key(subject.slice)
+            value = self.names.call_global(self.helper(globals.invoke_item),
+                                           [subject, key, method] + match['arguments'], match['keywords'])
+        elif default is not None:
+            # x.setdefault(k, []).append(v)
+            subject = default['subject']
+            args = [subject, default['key'], default['default'], method] + match['arguments']
+            value = self.names.call_global(self.helper(globals.setdefault_invoke), args, match['keywords'])
+        else:
+            fused = False
+            value = self.names.call_global(globals.invoke, [subject, method] + match['arguments'],
+                                           match['keywords'])
+        if not isinstance(subject, (Attribute, Name, Subscript)):
+            # There's nowhere to store the result, as in f().append(x).
+            return cl(Expr(value=node.value), node)
+        assign = Assign(targets=[Context.set(Store, subject)], value=value)
+        return self.recorded(written, match['method'], self.assign(cl(assign, node), value, not fused), node)
+
+    #: A pattern to match ``subject.setdefault(key, default)``.
+    _setdefault_pattern = call6(
+        func=Attribute(value=Cap('subject'), attr='setdefault', ctx=Load()),
+        args=[Cap('key'), Cap('default')],
+        keywords=[]
+    )
 
     def visit_Delete(self, node):
         '''
@@ -249,44 +580,104 @@ class RewriteAssignments(NodeTransformer):
                 out.append(cl(Delete(targets=list(unchanged)), node))
                 del unchanged[:]
 
-        def change(func, subject, tail, target):
+        def change(func, subject, tail, target, written):
             clear_unchanged()
             value = self.names.call_global(func, [Context.set(Load, subject), tail], src=target)
-            stmts = self.visit_Assign(cl(Assign(targets=[Context.set(Store, subject)], value=value), target))
-            out.extend(stmts)
+            assign = cl(Assign(targets=[Context.set(Store, subject)], value=value), target)
+            out.extend(self.recorded(written, 'delete', self.assign(assign, self.visit(value)), target))
 
         for target in node.targets:
+            written = self.written([target])
             if isinstance(target, Attribute):
-                change(globals.del_attr, target.value, Str(s=target.attr), target)
+                change(globals.del_attr, target.value, Str(s=target.attr), target, written)
             elif isinstance(target, Subscript):
-                change(globals.del_slice, target.value, deslicify(target.slice), target)
+                change(globals.del_slice, target.value, _deslicify(self.names, target.slice), target, written)
             else:
                 unchanged.append(target)
 
         clear_unchanged()
         return out
 
-    def literal(self, node, con):
-        '''Wrap a literal node with a call to the appropriate global constructor.'''
-        return self.names.call_global(con, [self.generic_visit(node)], src=node)
+    def literal(self, node, con, args=None):
+        '''
+        Wrap a literal node with a call to the appropriate global constructor.
+        :param args: The arguments to call it with, if not the visited node.
+        '''
+        if args is None:
+            args = [self.generic_visit(node)]
+        call = self.names.call_global(con, args, src=node)
+        if self.interner is not None:
+            call = self.names.call_injected(self.interner, 'intern', [call], src=node)
+        return call
 
     def visit_Dict(self, node):
-        return self.literal(node, pmap)
+        if self.records:
+            keys = _record_keys(node)
+            if keys is not None:
+                shape = Tuple(elts=[Str(s=key) for key in keys], ctx=Load())
+                return self.literal(node, records.make, [shape] + [self.visit(value) for value in node.values])
+        return self.literal(node, self.backend.map)
 
     def visit_DictComp(self, node):
-        return self.literal(node, pmap)
+        return self.literal(node, self.backend.map)
 
     def visit_List(self, node):
-        return self.literal(node, pvector)
+        return self.literal(node, self.backend.vector)
 
     def visit_ListComp(self, node):
-        return self.literal(node, pvector)
+        return self.literal(node, self.backend.vector)
 
     def visit_Set(self, node):
-        return self.literal(node, pset)
+        return self.literal(node, self.backend.set)
 
     def visit_SetComp(self, node):
-        return self.literal(node, pset)
+        return self.literal(node, self.backend.set)
+
+    #: Matches calls like ``typed(element, values)``\\; `refers_to` checks that it's the package's `typed`\\.
+    _typed_pattern = call6(func=Cap('func'), args=[Cap('element'), Cap('values')], keywords=[])
+
+    def typed(self, node, element, values):
+        '''
+        Build a `numeric.TypedVector` from a list literal, comprehension or repeated literal, like ``[0.0] * n``,
+        without making a `pvector` of it first.
+        '''
+        call = self.names.call_global(numeric.tvector, [element, self.plain(values)], src=node)
+        if self.interner is not None:
+            call = self.names.call_injected(self.interner, 'intern', [call], src=node)
+        return call
+
+    def plain(self, node):
+        '''Rewrite inside a list literal, but leave the list itself as it is.'''
+        if isinstance(node, (List, ListComp)):
+            return self.generic_visit(node)
+        if isinstance(node, BinOp) and isinstance(node.op, Mult):
+            if isinstance(node.left, List):
+                node.left, node.right = self.generic_visit(node.left), self.visit(node.right)
+                return node
+            if isinstance(node.right, List):
+                node.left, node.right = self.visit(node.left), self.generic_visit(node.right)
+                return node
+        return self.visit(node)
+
+    def visit_Call(self, node):
+        '''Build ``typed(float, [...])`` as a typed vector.'''
+        match = match_ast(self._typed_pattern, node)
+        if match is not None and refers_to(match['func'], self.namespace, typed):
+            return self.typed(node, self.visit(match['element']), match['values'])
+        return self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        '''Build a value annotated as ``List[float]`` or ``List[int]`` as a typed vector.'''
+        code = _element_code(node.annotation)
+        if code is not None and node.value is not None:
+            node.value = self.typed(node.value, Str(s=code), node.value)
+            node.target = self.visit(node.target)
+            return node
+        return self.generic_visit(node)
+
+    def visit_With(self, node):
+        '''Leave the body of ``with pyrmute.raw():`` untransformed.'''
+        return node if is_raw(node, self.namespace) else self.generic_visit(node)
 
     def visit_keyword(self, node):
         '''
@@ -300,3 +691,494 @@ class RewriteAssignments(NodeTransformer):
             return node
         else:
             return self.generic_visit(node)
+
+
+#: Matches calls with no arguments, like ``raw()``\\.
+_raw_pattern = call6(func=Cap('func'), args=[], keywords=[])
+
+
+def is_raw(node, namespace):
+    '''
+    Whether a ``with`` statement opens a raw block, with the package's `raw`\\.
+
+    In python 2, the context manager is on the node itself rather than in `items`.
+    :param namespace: The globals of the decorated function's module; see `refers_to`\\.
+    '''
+    for item in getattr(node, 'items', None) or [node]:
+        match = match_ast(_raw_pattern, item.context_expr)
+        if match is not None and refers_to(match['func'], namespace, raw):
+            return True
+    return False
+
+
+def _record_keys(node):
+    '''The keys of a dict literal, if they're distinct strings, so it can be a `records.Record`\\.'''
+    if not node.keys or not all(isinstance(key, Str) for key in node.keys):
+        return None
+    keys = tuple(key.s for key in node.keys)
+    return keys if len(set(keys)) == len(keys) else None
+
+
+def _deslicify(names, index):
+    '''The value of a subscript, as `ast6.deslicify` makes it, importing the builtin ``slice`` to call.'''
+    return deslicify(index, lambda: Name(id=names.dotted(slice), ctx=Load()))
+
+
+def _params(args):
+    '''The names of the parameters of a function.'''
+    params = list(getattr(args, 'posonlyargs', [])) + list(args.args) + list(getattr(args, 'kwonlyargs', []))
+    params += [param for param in (args.vararg, args.kwarg) if param is not None]
+    return set(_param_name(param) for param in params)
+
+
+def _item_key(index):
+    '''The key of a subscript that takes one item, or None if it takes a slice.'''
+    if isinstance(index, Index):
+        return index.value
+    if isinstance(index, (ExtSlice, Slice)) or isinstance(index, Tuple) and any(
+            isinstance(elt, Slice) for elt in index.elts):
+        return None
+    return index
+
+
+def _simple(node):
+    '''Whether an expression is a name or a constant, so reading it again gives the same value.'''
+    return isinstance(node, (Name, NameConstant, Num, Str)) or type(node).__name__ == 'Constant'
+
+
+class _Substitute(NodeTransformer):
+    '''Replace expressions with the temporaries they were hoisted to by `RewriteAssignments.hoist`.'''
+    def __init__(self, hoisted):
+        self.hoisted = hoisted
+
+    def generic_visit(self, node):
+        if self.hoisted and isinstance(node, (Attribute, Subscript)):
+            temp = self.hoisted.get(dump(node))
+            if temp is not None:
+                return cl(Name(id=temp, ctx=Load()), node)
+        return NodeTransformer.generic_visit(self, node)
+
+
+def _element_code(annotation):
+    '''The type code of an annotation like ``List[float]``\\, or None.'''
+    if not isinstance(annotation, Subscript):
+        return None
+    container = annotation.value
+    name = container.id if isinstance(container, Name) else getattr(container, 'attr', None)
+    element = annotation.slice
+    if isinstance(element, Index):
+        element = element.value
+    if name not in ('List', 'list') or not isinstance(element, Name):
+        return None
+    return numeric.typecodes.get(element.id)
+
+
+class WrapReturns(NodeTransformer):
+    '''
+    Pass the value of each ``return`` in the decorated function through a runtime value, or through a function we
+    provide if ``imported``\\, which keeps the rewrite cacheable.
+
+    Nested functions, lambdas and classes keep their own returns.
+    '''
+    def __init__(self, names, wrapper, hint, imported=False):
+        self.names = names
+        self.wrapper = wrapper
+        self.hint = hint
+        self.imported = imported
+        self.depth = 0
+
+    def visit_FunctionDef(self, node):
+        self.depth += 1
+        try:
+            if self.depth == 1:
+                return self.generic_visit(node)
+            return node
+        finally:
+            self.depth -= 1
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        return node
+
+    def visit_Lambda(self, node):
+        return node
+
+    def visit_Return(self, node):
+        if node.value is None:
+            return node
+        if self.imported:
+            node.value = self.names.call_global(self.wrapper, [node.value], src=node.value)
+        else:
+            node.value = self.names.call_injected(self.wrapper, self.hint, [node.value], src=node.value)
+        return node
+
+
+class SettleReturns(WrapReturns):
+    '''
+    Settle returned values, as `WrapReturns` does, telling the settler whether the parameters converted on entry need
+    it, so a call that converted none doesn't walk its result:
+
+        def f(doc):                         def f(doc):
+            ...                                 _viewed = viewed(doc)
+            return doc                          ...
+                                                return settle(doc, _viewed)
+
+    This runs before `WrapParameters`\\, which inserts the conversions ahead of the flag.
+    '''
+    def __init__(self, names, check, settler):
+        super(SettleReturns, self).__init__(names, settler, 'settle', imported=True)
+        self.check = check
+        self.flag = None
+
+    def visit_FunctionDef(self, node):
+        if self.depth == 0:
+            self.flag = self.names.unique('views')
+            params = sorted(_params(node.args))
+            flag = Assign(targets=[Name(id=self.flag, ctx=Store())],
+                          value=self.names.call_global(self.check, [Name(id=name, ctx=Load()) for name in params]))
+            start = 1 if get_docstring(node) is not None else 0
+            node.body.insert(start, cl(flag, node.body[0]))
+        return super(SettleReturns, self).visit_FunctionDef(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Return(self, node):
+        if node.value is not None:
+            node.value = self.names.call_global(self.wrapper, [node.value, Name(id=self.flag, ctx=Load())],
+                                                src=node.value)
+        return node
+
+
+class WrapParameters(NodeVisitor):
+    '''
+    Rebind the parameters of the decorated function to the result of a global function on entry.
+    '''
+    def __init__(self, names, func):
+        self.names = names
+        self.func = func
+
+    def visit_Module(self, node):
+        for stmt in node.body:
+            if type(stmt).__name__ in ('FunctionDef', 'AsyncFunctionDef'):
+                self.wrap(stmt)
+
+    def wrap(self, node):
+        args = node.args
+        params = list(getattr(args, 'posonlyargs', [])) + list(args.args) + list(getattr(args, 'kwonlyargs', []))
+        if args.kwarg is not None:
+            params.append(args.kwarg)
+        stmts = []
+        for param in params:
+            name = _param_name(param)
+            stmts.append(Assign(targets=[Name(id=name, ctx=Store())],
+                                value=self.names.call_global(self.func, [Name(id=name, ctx=Load())])))
+        if args.vararg is not None:
+            name = _param_name(args.vararg)
+            each = call6(func=Name(id='map', ctx=Load()),
+                         args=[Name(id=self.names.dotted(self.func), ctx=Load()), Name(id=name, ctx=Load())])
+            stmts.append(Assign(targets=[Name(id=name, ctx=Store())],
+                                value=call6(func=Name(id='tuple', ctx=Load()), args=[each])))
+        start = 1 if get_docstring(node) is not None else 0
+        for stmt in stmts:
+            cl(stmt, node.body[0])
+        node.body[start:start] = stmts
+
+
+def _param_name(param):
+    '''Get the name of a parameter, which is an `arg` node in python 3, or a name in python 2.'''
+    if isinstance(param, str):
+        return param
+    return getattr(param, 'arg', None) or param.id
+
+
+class LowerLoops(NodeTransformer):
+    '''
+    Run loops whose body is a single rewritten update of a local on one evolver, rather than making a new version
+    of the local on every iteration. This runs after `RewriteAssignments`, so it recognizes:
+
+        for k, v in pairs:                  _evolver = batch(m)
+            m = set_via_slice(m, k, v)      try:
+                                                for k, v in pairs:
+                                                    _evolver[k] = v
+                                            finally:
+                                                m = _evolver.persistent()
+
+    Likewise ``del_slice`` becomes ``del _evolver[k]``, ``invoke`` of a method in `globals.evolver_methods`
+    becomes ``_evolver.method(...)``, and ``invoke_item`` and ``setdefault_invoke`` update the item through the
+    evolver. See `globals.batch` for objects that lack a suitable evolver.
+
+    The local can't appear anywhere else in the loop, nor be used by a nested function, lambda or generator, as
+    those could see it before it's updated.
+    '''
+    def __init__(self, names):
+        self.names = names
+        self.shared = set()
+
+    def visit_Module(self, node):
+        for child in walk(node):
+            if isinstance(child, Global) or type(child).__name__ == 'Nonlocal':
+                self.shared.update(child.names)
+            elif isinstance(child, (GeneratorExp, Lambda)) or type(child).__name__ in (
+                    'AsyncFunctionDef', 'ClassDef', 'FunctionDef'):
+                if child not in node.body:
+                    self.shared.update(_names(child))
+        return self.generic_visit(node)
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        if node.orelse or len(node.body) != 1:
+            return node
+        update = self.match(node.body[0])
+        if update is None:
+            return node
+        subject, method, args = update
+        if subject in self.shared or _names(node.target) & {subject} or any(
+                subject in _names(arg) for arg in args) or subject in _names(node.iter):
+            return node
+        stmt = node.body[0]
+        value = self.names.call_global(globals.batch, [Name(id=subject, ctx=Load())] + (
+            [Str(s=method)] if isinstance(method, str) else []), src=node)
+        name = self.names.unique('evolver')
+        start = Assign(targets=[Name(id=name, ctx=Store())], value=value)
+        if callable(method):
+            body = Expr(value=self.names.call_global(method, [Name(id=name, ctx=Load())] + args))
+        elif method is None:
+            item = Index(value=args[0])
+            if len(args) == 2:
+                body = Assign(targets=[Subscript(value=Name(id=name, ctx=Load()), slice=item, ctx=Store())],
+                              value=args[1])
+            else:
+                body = Delete(targets=[Subscript(value=Name(id=name, ctx=Load()), slice=item, ctx=Del())])
+        else:
+            body = Expr(value=call6(func=Attribute(value=Name(id=name, ctx=Load()), attr=method, ctx=Load()),
+                                    args=args))
+        node.body = [cl(body, stmt)]
+        finish = Assign(targets=[Name(id=subject, ctx=Store())],
+                        value=call6(func=Attribute(value=Name(id=name, ctx=Load()), attr='persistent', ctx=Load())))
+        lowered = Try(body=[node], handlers=[], orelse=[], finalbody=[cl(finish, node)])
+        return [cl(start, node), cl(lowered, node)]
+
+    def match(self, stmt):
+        '''
+        Match a statement that rebinds a local to an update of itself.
+        :return: A tuple of the local, the method, a fused helper or None, and the arguments, or None if there's no
+            match.
+        '''
+        if not isinstance(stmt, Assign) or len(stmt.targets) != 1 or not isinstance(stmt.targets[0], Name):
+            return None
+        subject = stmt.targets[0].id
+        call = stmt.value
+        if type(call).__name__ != 'Call' or call.keywords or not isinstance(call.func, Name) or not call.args:
+            return None
+        if not isinstance(call.args[0], Name) or call.args[0].id != subject:
+            return None
+        if any(type(arg).__name__ == 'Starred' for arg in call.args):
+            return None
+        helper, args = call.func.id, call.args[1:]
+        if helper == self.names.imports.get(name_of(globals.set_via_slice)) and len(args) == 2:
+            return subject, None, args
+        if helper == self.names.imports.get(name_of(globals.del_slice)) and len(args) == 1:
+            return subject, None, args
+        if helper == self.names.imports.get(name_of(globals.invoke)) and args and isinstance(args[0], Str):
+            if args[0].s in globals.evolver_methods:
+                return subject, args[0].s, args[1:]
+        for fused in _fused:
+            if helper == self.names.imports.get(name_of(fused)):
+                return subject, fused, args
+        return None
+
+
+#: Helpers that update an item of their first argument, and work on evolvers as well.
+_fused = (
+    globals.invoke_item, globals.invoke_item_unless_equal, globals.set_via_slice_unless_equal,
+    globals.set_via_slice_unless_identical, globals.setdefault_invoke, globals.setdefault_invoke_unless_equal,
+)
+
+
+def _names(node):
+    '''The identifiers of every name in a tree.'''
+    return set(child.id for child in walk(node) if isinstance(child, Name))
+
+
+class Specialize(NodeTransformer):
+    '''
+    Specialize the decorated function for the types of some of its locals or parameters.
+
+    Helper calls that update a name of a persistent type become direct method calls, so
+    ``m = set_via_slice(m, k, v)`` becomes ``m = m.set(k, v)`` when ``m`` is a `PMap`. Given a fallback, a guard at
+    entry calls it instead if any of those names, which must be parameters, has another type.
+
+    The types must hold throughout the function; see `passes.Context.type_facts`. Only the body of the decorated
+    function is changed, as nested functions may reuse the names.
+    '''
+    #: The types whose updates preserve their type, and how each helper is specialized for them.
+    closed = (PClass, PMap, PSet, PVector)
+
+    def __init__(self, names, facts, fallback=None, guarded=None):
+        self.names = names
+        self.facts = facts
+        self.fallback = fallback
+        self.guarded = {} if guarded is None else guarded
+        self.stable = {}
+        self.used = {}
+
+    def visit_Module(self, node):
+        for stmt in node.body:
+            if type(stmt).__name__ == 'FunctionDef':
+                self.specialize(stmt)
+        return node
+
+    def specialize(self, node):
+        self.stable = dict((name, cls) for name, cls in self.facts.items() if issubclass(cls, self.closed))
+        if not self.stable:
+            return
+        used = self.used = {}
+        node.body = [self.visit(stmt) for stmt in node.body]
+        if not used or self.fallback is None:
+            return
+        self.guarded.update(used)
+        start = 1 if get_docstring(node) is not None else 0
+        node.body.insert(start, cl(self.guard(node, used), node.body[start]))
+
+    def visit_FunctionDef(self, node):
+        return node
+
+    visit_AsyncFunctionDef = visit_ClassDef = visit_Lambda = visit_FunctionDef
+
+    def visit_Call(self, node):
+        node = self.generic_visit(node)
+        if not isinstance(node.func, Name) or not node.args or not isinstance(node.args[0], Name):
+            return node
+        subject = node.args[0].id
+        cls = self.stable.get(subject)
+        if cls is None:
+            return node
+        helper = dict((self.names.imports.get(name_of(helper)), helper) for helper in (
+            globals.batch, globals.del_attr, globals.del_slice, globals.invoke, globals.set_via_attr,
+            globals.set_via_slice)).get(node.func.id)
+        method, args, keywords = self.direct(helper, cls, node.args[1:], node.keywords)
+        if method is None:
+            return node
+        self.used[subject] = cls
+        return cl(call6(func=Attribute(value=Name(id=subject, ctx=Load()), attr=method, ctx=Load()),
+                        args=args, keywords=keywords), node)
+
+    def direct(self, helper, cls, args, keywords):
+        '''
+        Find the method a helper would call on an instance of a type.
+        :return: The method and its arguments, or a tuple of None if the helper does anything else.
+        '''
+        if helper in (globals.set_via_attr, globals.set_via_slice):
+            if issubclass(cls, (PClass, PMap, PVector)):
+                return 'set', args, keywords
+        elif helper in (globals.del_attr, globals.del_slice):
+            if issubclass(cls, PMap) or helper is globals.del_attr and issubclass(cls, PClass):
+                return 'remove', args, keywords
+        elif helper is globals.invoke:
+            if args and isinstance(args[0], Str) and issubclass(cls, globals.returns_self.get(args[0].s, ())):
+                return args[0].s, args[1:], keywords
+        elif helper is globals.batch:
+            if not args and issubclass(cls, (PClass, PMap, PVector)) or (
+                    len(args) == 1 and isinstance(args[0], Str)
+                    and issubclass(cls, globals.evolver_methods.get(args[0].s, ()))):
+                return 'evolver', [], []
+        return None, None, None
+
+    def guard(self, node, used):
+        '''Build ``if type(p) is not T or ...: return fallback(<parameters>)``.'''
+        type_name = self.names.inject(type, 'type')
+        tests = [Compare(left=call6(func=Name(id=type_name, ctx=Load()), args=[Name(id=name, ctx=Load())]),
+                         ops=[IsNot()], comparators=[Name(id=self.names.inject(cls, cls.__name__), ctx=Load())])
+                 for name, cls in sorted(used.items())]
+        test = tests[0] if len(tests) == 1 else BoolOp(op=Or(), values=tests)
+        params = node.args
+        args = [Name(id=_param_name(param), ctx=Load())
+                for param in list(getattr(params, 'posonlyargs', [])) + list(params.args)]
+        if params.vararg is not None:
+            args.append(Starred(value=Name(id=_param_name(params.vararg), ctx=Load()), ctx=Load()))
+        keywords = [keyword(arg=_param_name(param), value=Name(id=_param_name(param), ctx=Load()))
+                    for param in getattr(params, 'kwonlyargs', [])]
+        if params.kwarg is not None:
+            keywords.append(keyword(arg=None, value=Name(id=_param_name(params.kwarg), ctx=Load())))
+        call = self.names.call_injected(self.fallback, 'generic', args, keywords)
+        return If(test=test, body=[Return(value=call)], orelse=[])
+
+
+class SliceViews(NodeTransformer):
+    '''
+    Take slices that are only read as `slices.SliceView`\\, so ``sum(v[i:i + k])`` doesn't copy the window.
+
+    A slice is only read if it's iterated, passed to a builtin in `consumers`\\, or to one in `iterators` that is only
+    read in turn, tested with ``in`` or indexed. A local assigned once, from a slice, and only read in those ways is
+    a view as well. Builtins are only trusted if the module and the function don't bind their names.
+    '''
+    #: Builtins that read their arguments without keeping them.
+    consumers = frozenset(('all', 'any', 'frozenset', 'len', 'list', 'max', 'min', 'set', 'sorted', 'sum', 'tuple'))
+
+    #: Builtins that return an iterator over their arguments.
+    iterators = frozenset(('enumerate', 'reversed', 'zip'))
+
+    def __init__(self, names, def_use, namespace=None):
+        self.names = names
+        self.def_use = def_use
+        self.shadowed = set(def_use.assigned) | def_use.rebound | def_use.params | set(namespace or ())
+        self.parents = {}
+        self.views = set()
+
+    def visit_Module(self, node):
+        for stmt in node.body:
+            if type(stmt).__name__ in ('AsyncFunctionDef', 'FunctionDef'):
+                self.find(stmt)
+                break
+        return self.generic_visit(node) if self.views else node
+
+    def find(self, function):
+        '''Find the slices to take as views.'''
+        for parent in walk(function):
+            for child in iter_child_nodes(parent):
+                self.parents[id(child)] = parent
+        loads = defaultdict(list)
+        for node in walk(function):
+            if _is_slice(node) and self.read(node):
+                self.views.add(id(node))
+            elif isinstance(node, Name) and isinstance(node.ctx, Load):
+                loads[node.id].append(node)
+        for name, values in self.def_use.assigned.items():
+            if len(values) != 1 or not _is_slice(values[0]) or name in self.def_use.rebound:
+                continue
+            if name not in self.def_use.params and all(self.read(load) for load in loads[name]):
+                self.views.add(id(values[0]))
+
+    def read(self, node):
+        '''Whether the value of an expression is only read where it's used.'''
+        parent = self.parents.get(id(node))
+        kind = type(parent).__name__
+        if kind in ('AsyncFor', 'For', 'comprehension'):
+            return parent.iter is node
+        if kind == 'Call':
+            if not isinstance(parent.func, Name) or parent.func.id in self.shadowed:
+                return False
+            if not any(arg is node for arg in parent.args):
+                return False
+            if parent.func.id in self.consumers:
+                return True
+            return parent.func.id in self.iterators and self.read(parent)
+        if isinstance(parent, Compare):
+            return any(comparator is node and type(op).__name__ in ('In', 'NotIn')
+                       for op, comparator in zip(parent.ops, parent.comparators))
+        if isinstance(parent, Subscript):
+            return parent.value is node and isinstance(parent.ctx, Load)
+        return False
+
+    def visit_Subscript(self, node):
+        viewed = id(node) in self.views
+        node = self.generic_visit(node)
+        if not viewed:
+            return node
+        return self.names.call_global(slices.view, [node.value, _deslicify(self.names, node.slice)], src=node)
+
+
+def _is_slice(node):
+    '''Whether a node reads a plain slice, like ``v[a:b]``\\.'''
+    return isinstance(node, Subscript) and isinstance(node.ctx, Load) and isinstance(node.slice, Slice)
@@ -0,0 +1,215 @@
+'''
+Structural-sharing accounting for rewritten functions.
+
+Decorate a function with ``pyrmute(sharing=True)`` and call it through `measure` to find out how much of its result is
+shared with its inputs and which statements allocated the rest.
+
+Nodes are the objects reachable from a value, not counting scalars such as numbers and strings, which are payload
+rather than structure. The trie nodes inside the C implementation of ``pvector`` aren't Python objects, so `measure`
+passes the function copies of its arguments whose vectors, maps and sets are built on pyrsistent's pure Python vector
+instead, whose nodes are lists, and what the function shares with them is counted node by node. A C vector made during
+the call is counted as the nodes a trie of its length has, `BRANCHING` elements to a node, as though it shared none.
+'''
+from collections import namedtuple
+from gc import get_referents
+import struct
+import sys
+from threading import local
+from types import BuiltinFunctionType, CodeType, FrameType, FunctionType, MethodType, ModuleType
+
+from pyrsistent import PMap, PSet, pvector
+from pyrsistent._pvector import python_pvector
+
+#: A count of nodes and their size in bytes.
+Usage = namedtuple('Usage', 'nodes bytes')
+
+#: Nodes first allocated by a rewritten statement over every time it ran, and how many of them are in the result.
+StatementUsage = namedtuple('StatementUsage', 'lineno runs allocated retained')
+
+_scalars = (bool, bytes, complex, float, int, str, type(None), type(Ellipsis))
+_opaque = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType, CodeType, FrameType)
+
+#: How many elements or branches a node of a ``pvector`` holds.
+BRANCHING = 32
+
+#: The type of C vectors, whose nodes `_reachable` estimates, or None without the C extension.
+_c_vector = type(pvector()) if pvector.__module__ == 'pvectorc' else None
+
+#: The size of a node of a C vector: a pointer to each branch and a reference count.
+_node_bytes = BRANCHING * struct.calcsize('P') + struct.calcsize('I')
+
+_state = local()
+
+
+def record(lineno, value):
+    '''
+    Called by code rewritten with ``sharing=True`` with the value of each rewritten assignment.
+    :return: the value, unchanged.
+    '''
+    tracker = getattr(_state, 'tracker', None)
+    if tracker is not None:
+        tracker.record(lineno, value)
+    return value
+
+
+def measure(func, *args, **kw):
+    '''
+    Call a function and account for the structure of its result.
+    :param func: A function, ideally decorated with ``pyrmute(sharing=True)`` to break allocation down by statement.
+    :return: A tuple of the result and a `SharingReport`.
+    '''
+    memo = {}
+    args = [_pure(arg, memo) for arg in args]
+    kw = dict((key, _pure(value, memo)) for key, value in kw.items())
+    names = _param_names(func, args, kw)
+    inputs = [(name, _reachable(value)) for name, value in names]
+    tracker = _Tracker(inputs)
+    outer = getattr(_state, 'tracker', None)
+    _state.tracker = tracker
+    try:
+        result = func(*args, **kw)
+    finally:
+        _state.tracker = outer
+    return result, tracker.report(result)
+
+
+class SharingReport(object):
+    '''
+    How the result of a call was put together.
+
+    :ivar result: The total `Usage` of the result.
+    :ivar allocated: The `Usage` of nodes in the result that aren't part of any input.
+    :ivar shared: A dictionary of parameter name to the `Usage` of nodes the result shares with that input.
+    :ivar statements: A list of `StatementUsage`, by line number, of nodes that rewritten statements allocated.
+        Nodes allocated but not retained were thrown away before the function returned.
+    '''
+    def __init__(self, result, allocated, shared, statements):
+        self.result = result
+        self.allocated = allocated
+        self.shared = shared
+        self.statements = statements
+
+    def __repr__(self):
+        return 'SharingReport(result={!r}, allocated={!r}, shared={!r}, statements={!r})'.format(
+            self.result, self.allocated, self.shared, self.statements)
+
+    def __str__(self):
+        lines = ['result: {0.nodes} nodes, {0.bytes} bytes'.format(self.result),
+                 'allocated: {0.nodes} nodes, {0.bytes} bytes'.format(self.allocated)]
+        for name, usage in sorted(self.shared.items()):
+            lines.append('shared with {0}: {1.nodes} nodes, {1.bytes} bytes'.format(name, usage))
+        for stmt in self.statements:
+            lines.append('line {0.lineno} ({0.runs} runs): allocated {1.nodes} nodes, {1.bytes} bytes; '
+                         'retained {2.nodes} nodes, {2.bytes} bytes'.format(stmt, stmt.allocated, stmt.retained))
+        return '\n'.join(lines)
+
+
+class _Tracker(object):
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.known = {}
+        for _, nodes in inputs:
+            self.known.update(nodes)
+        self.seen = dict(self.known)
+        self.origin = {}
+        self.runs = {}
+        # Hold on to recorded values so their ids aren't reused while we're measuring.
+        self.values = []
+
+    def record(self, lineno, value):
+        self.values.append(value)
+        nodes = _reachable(value, self.seen)
+        for key, size in nodes.items():
+            if key not in self.seen:
+                self.seen[key] = size
+                self.origin[key] = lineno
+        self.runs[lineno] = self.runs.get(lineno, 0) + 1
+
+    def report(self, result):
+        nodes = _reachable(result)
+        shared = {}
+        for name, inputs in self.inputs:
+            shared[name] = _usage(size for key, size in nodes.items() if key in inputs)
+        allocated = _usage(size for key, size in nodes.items() if key not in self.known)
+        by_line = {}
+        for key, lineno in self.origin.items():
+            by_line.setdefault(lineno, []).append(key)
+        statements = []
+        for lineno, runs in sorted(self.runs.items()):
+            keys = by_line.get(lineno, ())
+            statements.append(StatementUsage(lineno, runs, _usage(self.seen[key] for key in keys),
+                                             _usage(nodes[key] for key in keys if key in nodes)))
+        return SharingReport(_usage(nodes.values()), allocated, shared, statements)
+
+
+def _reachable(value, stop=None):
+    '''
+    Find the nodes reachable from a value.
+    :param stop: Nodes not to look inside, because everything they reach has been seen; they are still included.
+    :return: A dictionary of node ids to their size.
+    '''
+    found = {}
+    pending = [value]
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, _scalars) or isinstance(obj, _opaque):
+            continue
+        key = id(obj)
+        if key in found:
+            continue
+        found[key] = sys.getsizeof(obj)
+        if type(obj) is _c_vector:
+            for node in range(_trie_nodes(len(obj))):
+                found[key, node] = _node_bytes
+        if stop is None or key not in stop:
+            pending.extend(get_referents(obj))
+    return found
+
+
+def _trie_nodes(length):
+    '''How many nodes a C vector of some length has: a leaf for each `BRANCHING` elements, and the branches above.'''
+    level = nodes = -(-length // BRANCHING)
+    while level > 1:
+        level = -(-level // BRANCHING)
+        nodes += level
+    return nodes
+
+
+def _pure(value, memo):
+    '''
+    Copy a value, building its vectors, maps and sets on the pure Python vector, whose nodes are visible to
+    `_reachable`\\. Other values are returned as they are.
+    :param memo: Copies made so far by id, so a part that appears twice is copied once.
+    '''
+    key = id(value)
+    if key in memo:
+        return memo[key][1]
+    if type(value) is _c_vector:
+        copy = python_pvector(_pure(item, memo) for item in value)
+    elif type(value) is PMap:
+        copy = PMap(value._size, python_pvector(bucket and [(k, _pure(v, memo)) for k, v in bucket]
+                                                for bucket in value._buckets))
+    elif type(value) is PSet:
+        copy = PSet(_pure(value._map, memo))
+    else:
+        return value
+    # Keep the original alive so its id isn't reused.
+    memo[key] = value, copy
+    return copy
+
+
+def _usage(sizes):
+    nodes = total = 0
+    for size in sizes:
+        nodes += 1
+        total += size
+    return Usage(nodes, total)
+
+
+def _param_names(func, args, kw):
+    import inspect
+    try:
+        bound = inspect.signature(func).bind(*args, **kw)
+    except (AttributeError, TypeError, ValueError):
+        return [('arg{}'.format(index), value) for index, value in enumerate(args)] + sorted(kw.items())
+    return list(bound.arguments.items())
@@ -0,0 +1,99 @@
+'''
+Read-only views of slices of persistent vectors, which the ``slice_views`` pass takes in place of copies.
+
+``v[i:i + k]`` on a ``pvector`` copies the ``k`` elements it covers. A `SliceView` holds the vector and the ``range``
+of indices instead, so taking it is O(1) however long it is, and reading an element reads the vector. Since the
+vector can't change, neither can the view.
+
+A view keeps the whole vector alive and doesn't have the methods that update a ``pvector``\\, so the pass only takes
+views of slices that are read where they're taken: iterated, passed to ``len``\\, ``sum`` and other builtins that
+don't keep their argument, tested with ``in`` or indexed, directly or through a local used only in those ways.
+Anything else, like returning the slice or calling its methods, gets a real slice, and `SliceView.materialize`
+makes one from a view.
+'''
+from itertools import chain
+
+from pyrsistent import PVector, pvector
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+#: The most elements iterating a view copies at once.
+CHUNK = 256
+
+
+def view(obj, index):
+    '''
+    Take a slice of an object as a `SliceView` if it's a persistent vector, or else as ``obj[index]`` does.
+    :param obj: The object sliced.
+    :param index: A ``slice``\\.
+    '''
+    if isinstance(obj, PVector) and isinstance(index, slice):
+        return SliceView(obj, range(*index.indices(len(obj))))
+    return obj[index]
+
+
+class SliceView(Sequence):
+    '''The elements of a persistent vector at a ``range`` of indices.'''
+    __slots__ = ('_source', '_range', '__weakref__')
+
+    def __init__(self, source, indices):
+        '''
+        :param source: The vector.
+        :param indices: A ``range`` of valid indices into it.
+        '''
+        self._source = source
+        self._range = indices
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SliceView(self._source, self._range[index])
+        return self._source[self._range[index]]
+
+    def __iter__(self):
+        indices = self._range
+        if indices.step != 1:
+            return map(self._source.__getitem__, indices)
+        return chain.from_iterable(self._chunks(indices.start, indices.stop))
+
+    def _chunks(self, start, stop):
+        # Slicing a chunk at a time runs at the speed of copying, with no more than a chunk copied at once.
+        source = self._source
+        for first in range(start, stop, CHUNK):
+            yield source[first:min(first + CHUNK, stop)]
+
+    def __reversed__(self):
+        return map(self._source.__getitem__, reversed(self._range))
+
+    def __len__(self):
+        return len(self._range)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, Sequence)) and not isinstance(other, (tuple, str, bytes)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.materialize())
+
+    def __repr__(self):
+        return 'SliceView({!r})'.format(list(self))
+
+    def __reduce__(self):
+        return pvector, (list(self),)
+
+    def materialize(self):
+        '''A ``pvector`` of the elements, which no longer keeps the rest of the vector alive.'''
+        indices = self._range
+        if indices.step > 0:
+            return self._source[indices.start:indices.stop:indices.step]
+        return pvector(self)
+
+    def tolist(self):
+        return list(self)
@@ -0,0 +1,101 @@
+'''
+Small persistent collections that grow into pyrsistent ones, selected with ``pyrmute(backend='small')``\\.
+
+Most literals hold a handful of elements, for which pyrsistent's tries cost more to build and look up than the
+elements themselves. Up to `LIMIT` elements, these are the copy-on-write collections of `frozen`\\: a vector is a
+``tuple``\\, a map a ``dict`` and a set a ``frozenset``\\, so construction and lookup run at builtin speed and an update
+copies a few pointers. An update or evolver that leaves more than `LIMIT` elements returns a ``pvector``\\, ``pmap``
+or ``pset`` instead, which carries on sharing structure as it grows.
+
+pyrsistent's C extension already makes a small ``pvector`` smaller and faster to build than a tuple in a wrapper, so
+when it's installed `svector` just builds a ``pvector``\\.
+
+These compare equal to their pyrsistent counterparts, and maps and sets hash the same way.
+'''
+from pyrsistent import pmap, pset, pvector
+
+from .frozen import FrozenMap, FrozenSet, FrozenVector
+
+#: The most elements a small collection holds.
+LIMIT = 8
+
+#: Whether ``pvector`` is pyrsistent's C extension, which `svector` uses directly.
+native_vectors = pvector.__module__ == 'pvectorc'
+
+
+def smap(initial=(), **kw):
+    '''Create a `SmallMap`\\, or a ``pmap`` if there are too many items, from a mapping or pairs, and keywords.'''
+    data = dict(initial)
+    if kw:
+        data.update(kw)
+    return SmallMap._wrap(data)
+
+
+def svector(iterable=()):
+    '''Create a `SmallVector`\\, or a ``pvector`` if there are too many elements or `native_vectors`\\.'''
+    if native_vectors:
+        return pvector(iterable)
+    return SmallVector._wrap(tuple(iterable))
+
+
+def sset(iterable=()):
+    '''Create a `SmallSet`\\, or a ``pset`` if there are too many elements, from an iterable.'''
+    return SmallSet._wrap(frozenset(iterable))
+
+
+class SmallMap(FrozenMap):
+    '''A `FrozenMap` of at most `LIMIT` items.'''
+    __slots__ = ()
+
+    @classmethod
+    def _wrap(cls, data):
+        if len(data) > LIMIT:
+            return pmap(data)
+        self = object.__new__(cls)
+        self._data = data
+        return self
+
+    def __repr__(self):
+        return 'smap({!r})'.format(self._data)
+
+    def __reduce__(self):
+        return smap, (self._data,)
+
+
+class SmallVector(FrozenVector):
+    '''A `FrozenVector` of at most `LIMIT` elements.'''
+    __slots__ = ()
+
+    @classmethod
+    def _wrap(cls, data):
+        if len(data) > LIMIT:
+            return pvector(data)
+        self = object.__new__(cls)
+        self._data = data
+        return self
+
+    def __repr__(self):
+        return 'svector({!r})'.format(list(self._data))
+
+    def __reduce__(self):
+        return svector, (self._data,)
+
+
+class SmallSet(FrozenSet):
+    '''A `FrozenSet` of at most `LIMIT` elements.'''
+    __slots__ = ()
+
+    @classmethod
+    def _wrap(cls, data):
+        if len(data) > LIMIT:
+            return pset(data)
+        self = object.__new__(cls)
+        self._data = data
+        return self
+
+    def __repr__(self):
+        return 'sset({!r})'.format(list(self._data))
+
+    def __reduce__(self):
+        return sset, (self._data,)
+
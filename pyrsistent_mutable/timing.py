@@ -0,0 +1,126 @@
+'''
+Profiling of decoration, to find out which rewritten functions are slow to import.
+
+Every decorated function gets a `DecorationStats` record, available from ``pyrmute.stats()``. Set ``PYRMUTE_STATS``
+to a file name to append the records to it as JSON lines when the process exits, or to ``-`` to print a table of
+them, slowest first, to stderr.
+'''
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+import os
+import sys
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import time as clock
+
+#: How long each phase of decorating a function took, in seconds, and the size of the result. Phases are in the order
+#: they ran; a function loaded from the cache has no rewriting phases, and its node and call site counts are None.
+DecorationStats = namedtuple('DecorationStats', 'module qualname phases total nodes call_sites cached')
+
+#: Records of every decorated function, in the order they were decorated.
+records = []
+
+_dumping = False
+
+
+class Profile(object):
+    '''
+    Collects timings and counts while a function is decorated.
+    '''
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.nodes = self.call_sites = None
+        self.cached = False
+
+    @contextmanager
+    def __call__(self, phase):
+        start = clock()
+        try:
+            yield
+        finally:
+            self.phases[phase] = self.phases.get(phase, 0.0) + clock() - start
+
+    def count(self, tree, env):
+        '''
+        Count the nodes of a rewritten tree and its calls to helpers, which are imported or in `env`.
+        '''
+        from ast import ImportFrom, Name, walk
+        helpers = set(env)
+        for stmt in tree.body:
+            if isinstance(stmt, ImportFrom):
+                helpers.update(alias.asname or alias.name for alias in stmt.names)
+        self.nodes = self.call_sites = 0
+        for node in walk(tree):
+            self.nodes += 1
+            if type(node).__name__ == 'Call' and isinstance(node.func, Name) and node.func.id in helpers:
+                self.call_sites += 1
+
+
+class _Untimed(object):
+    '''Stands in for a `Profile` when nothing is being recorded.'''
+    def __call__(self, phase):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+untimed = _Untimed()
+
+
+def record(func, profile):
+    '''
+    Keep the record of a decorated function.
+    :return: The `DecorationStats`.
+    '''
+    global _dumping
+    phases = dict(profile.phases)
+    stats = DecorationStats(func.__module__, getattr(func, '__qualname__', func.__name__), phases,
+                            sum(phases.values()), profile.nodes, profile.call_sites, profile.cached)
+    records.append(stats)
+    if not _dumping and os.environ.get('PYRMUTE_STATS'):
+        import atexit
+        _dumping = True
+        atexit.register(dump)
+    return stats
+
+
+def report(stats=None):
+    '''
+    Format records as a table, slowest first.
+    :param stats: The records, or None for all of them.
+    '''
+    stats = sorted(records if stats is None else stats, key=lambda entry: entry.total, reverse=True)
+    phases = []
+    for entry in stats:
+        phases.extend(phase for phase in entry.phases if phase not in phases)
+    lines = ['\t'.join(['total'] + phases + ['nodes', 'call_sites', 'function'])]
+    for entry in stats:
+        row = ['{:.6f}'.format(entry.total)]
+        row.extend('{:.6f}'.format(entry.phases[phase]) if phase in entry.phases else '-' for phase in phases)
+        row.extend('-' if count is None else str(count) for count in (entry.nodes, entry.call_sites))
+        row.append('{}.{}'.format(entry.module, entry.qualname))
+        lines.append('\t'.join(row))
+    return '\n'.join(lines)
+
+
+def dump(target=None):
+    '''
+    Write the records as ``PYRMUTE_STATS`` asks.
+    :param target: A file name to append JSON lines to, or ``-`` for a table on stderr; defaults to ``PYRMUTE_STATS``.
+    '''
+    target = target or os.environ.get('PYRMUTE_STATS')
+    if not target or not records:
+        return
+    if target == '-':
+        sys.stderr.write(report() + '\n')
+        return
+    import json
+    with open(target, 'a') as fh:
+        for entry in records:
+            fh.write(json.dumps(entry._asdict()) + '\n')
@@ -0,0 +1,166 @@
+'''
+Read-only views of persistent values that pass for builtins, for code that checks ``isinstance(x, dict)`` or ``list``\\.
+
+``thaw`` copies a whole structure into builtins. `view` copies just the top level of the value it's given, and
+its parts are wrapped in turn as they're read, so parts that aren't read are never converted. A map becomes a
+`MapView`\\, a ``dict`` of its items that wraps each value as it's read, and a vector a `ListView`\\, a ``list`` of its
+elements that wraps each the same way. A set becomes a `SetView` of its elements, which have to stay persistent to be
+hashable, and a tuple a tuple of views.
+
+The ``json`` module and the builtins that copy a list or dict read a view through its methods, so they see the parts
+wrapped too, and ``json.dumps`` gives the text it gives for the thawed value. Only code that calls the methods of
+``list`` or ``dict`` itself on a view, such as ``list.__getitem__(view, 0)``\\, sees the persistent parts.
+`jsonstream.dumps` encodes persistent values without making views at all.
+
+Views are read-only: the methods that would change them raise ``TypeError``\\. ``pyrmute(return_view=True)`` passes
+every value the decorated function returns through `view`\\.
+'''
+try:
+    from collections.abc import ItemsView, Mapping, Sequence, Set, ValuesView
+except ImportError:
+    from collections import ItemsView, Mapping, Sequence, Set, ValuesView
+
+#: Builtins that `view` returns as they are; tuples have their elements wrapped.
+_builtins = (str, bytes, bytearray, list, dict, set, frozenset, range, memoryview)
+
+
+def view(value):
+    '''
+    Wrap a persistent value as the builtin it stands for, or return anything else as it is.
+    :param value: A map, vector or set that isn't a builtin, or a tuple of values, are wrapped.
+    '''
+    cls = type(value)
+    try:
+        wrap = _wrappers[cls]
+    except KeyError:
+        wrap = _wrappers.setdefault(cls, _wrapper(value))
+    return value if wrap is None else wrap(value)
+
+
+def _wrapper(value):
+    '''How `view` wraps values of the type of this one, or None to leave them alone.'''
+    if isinstance(value, (int, float, _builtins)) or value is None:
+        return None
+    if type(value) is tuple:
+        return lambda value: tuple(map(view, value))
+    if isinstance(value, Mapping):
+        return MapView
+    if isinstance(value, Sequence):
+        return ListView
+    if isinstance(value, Set):
+        return SetView
+    return None
+
+
+#: How `view` wraps each type, from `_wrapper`\\.
+_wrappers = {}
+
+
+def unwrap(value):
+    '''The persistent value a view wraps, or the value itself if it isn't a view.'''
+    return value._persistent if isinstance(value, (MapView, ListView, SetView)) else value
+
+
+def _read_only(self, *args, **kw):
+    raise TypeError("'{}' object is read-only".format(type(self).__name__))
+
+
+class MapView(dict):
+    '''
+    A ``dict`` of the items of a persistent map, made once, when the view is, that wraps each value with `view` as
+    it's read. Calling the methods of ``dict`` itself on it gives the values unwrapped.
+    '''
+    __slots__ = ('_persistent',)
+
+    def __init__(self, mapping):
+        dict.__init__(self, mapping)
+        self._persistent = mapping
+
+    def __getitem__(self, key):
+        return view(dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        # Overriding this makes dict(view) and {**view} read the values through __getitem__, so they're wrapped.
+        return dict.__iter__(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        return MapView, (self._persistent,)
+
+    def copy(self):
+        return dict(self.items())
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+
+class ListView(list):
+    '''
+    A ``list`` of the elements of a persistent vector, made once, when the view is, that wraps each element with
+    `view` as it's read. Calling the methods of ``list`` itself on it gives the elements unwrapped.
+    '''
+    __slots__ = ('_persistent',)
+
+    def __init__(self, vector):
+        list.__init__(self, vector)
+        self._persistent = vector
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(map(view, list.__getitem__(self, index)))
+        return view(list.__getitem__(self, index))
+
+    def __iter__(self):
+        # Overriding this makes list(view) and [*view] read the elements through it, so they're wrapped.
+        return map(view, list.__iter__(self))
+
+    def __reversed__(self):
+        return map(view, list.__reversed__(self))
+
+    def __add__(self, other):
+        return list(self) + other
+
+    def __mul__(self, count):
+        return list(self) * count
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __reduce__(self):
+        return ListView, (self._persistent,)
+
+    def copy(self):
+        return list(self)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = append = clear = extend = insert = pop = remove = reverse = \
+        sort = _read_only
+
+
+class SetView(set):
+    '''A ``set`` of the elements of a persistent set, which stay as they are since they have to be hashable.'''
+    __slots__ = ('_persistent',)
+
+    def __init__(self, values):
+        set.__init__(self, values)
+        self._persistent = values
+
+    def __reduce__(self):
+        return SetView, (self._persistent,)
+
+    def copy(self):
+        return set(self)
+
+    __ior__ = __iand__ = __isub__ = __ixor__ = add = clear = difference_update = discard = intersection_update = \
+        pop = remove = symmetric_difference_update = update = _read_only
@@ -24,7 +24,7 @@ setup(
         'Programming Language :: Python :: 3.6',
     ], python_requires='>=2.6',
     install_requires=[
-        'pyrsistent', 'astunparse', 'six'
+        'pyrsistent', 'astunparse; python_version < "3.9"'
     ], license='MIT',
     extras_require={},
     tests_require=['pytest', 'mock'],
@@ -0,0 +1,96 @@
+from threading import Thread
+
+from pyrsistent import PRecord, field, pmap, pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+
+
+class Point(PRecord):
+    x = field()
+    y = field()
+
+
+def make():
+    @pyrmute(adaptive=2)
+    def update(m, point, xs, key):
+        m[key] = 1
+        point.x = key
+        for x in xs:
+            m[x] = x
+        xs.append(key)
+        return m, point, xs
+    return update
+
+
+def test_specializes_after_warmup():
+    update = make()
+    for _ in range(2):
+        assert update(pmap(), Point(), pvector([1]), 'k') == (pmap({'k': 1, 1: 1}), Point(x='k'), pvector([1, 'k']))
+    info = update.adaptive_info()
+    assert info.state == 'specialized'
+    assert info.types == {'m': type(pmap()), 'point': Point, 'xs': type(pvector())}
+    assert 'm.set(key, 1)' in update.__source__
+    assert "point.set('x', key)" in update.__source__
+    assert update(pmap(), Point(), pvector([1]), 'k') == (pmap({'k': 1, 1: 1}), Point(x='k'), pvector([1, 'k']))
+
+
+def test_guard_falls_back_and_deoptimizes():
+    update = make()
+    for _ in range(2):
+        update(pmap(), Point(), pvector(), 'k')
+    m = {}
+    assert update(m, Point(), pvector(), 'k')[0] is m
+    assert m == {'k': 1}
+    assert update.adaptive_info().state == 'specialized'
+    update({}, Point(), pvector(), 'k')
+    assert update.adaptive_info()[:3] == ('deoptimized', 2, 2)
+    assert update(pmap(), Point(), pvector(), 'k')[0] == pmap({'k': 1})
+
+
+@pyrmute(adaptive=1)
+def reassigned(m):
+    m['a'] = 1
+    m = dict(m)
+    return m
+
+
+@pyrmute(adaptive=2)
+def mixed(m, key):
+    m[key] = 1
+    return m
+
+
+def test_nothing_to_specialize():
+    reassigned(pmap())
+    assert reassigned.adaptive_info().state == 'generic'
+    mixed(pmap(), 'a')
+    mixed({}, 'a')
+    assert mixed.adaptive_info() == ('generic', 2, 0, {})
+
+
+def test_adaptive_arguments():
+    with raises(ValueError):
+        pyrmute(adaptive=0)
+    with raises(TypeError):
+        @pyrmute(adaptive=True)
+        def gen(m):
+            yield m
+
+
+def test_calls_counted_from_threads():
+    @pyrmute(adaptive=10 ** 6)
+    def bump(m):
+        m['n'] = 1
+        return m
+
+    def work():
+        for _ in range(500):
+            bump(pmap())
+
+    threads = [Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert bump.adaptive_info().calls == 2000
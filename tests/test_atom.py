@@ -0,0 +1,105 @@
+from threading import Thread
+
+from pyrsistent import pmap, pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.atom import Atom
+
+
+@pyrmute
+def add(state, key, amount=1):
+    state[key] = state.get(key, 0) + amount
+    return state
+
+
+@pyrmute(unchanged='identical')
+def put(state, key, value):
+    state[key] = value
+    return state
+
+
+def test_swap_from_threads():
+    atom = Atom(pmap())
+
+    def work():
+        for _ in range(500):
+            atom.swap(add, 'n')
+
+    threads = [Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert atom.deref() == pmap({'n': 2000})
+
+
+def test_retries_from_threads():
+    atom = Atom(pmap())
+    calls = []
+
+    def counted(state):
+        calls.append(None)
+        return add(state, 'n')
+
+    def work():
+        for _ in range(500):
+            atom.swap(counted)
+
+    threads = [Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 2000 + atom.retries
+
+
+def test_compare_and_set():
+    first = pvector([1])
+    atom = Atom(first)
+    assert not atom.compare_and_set(pvector([1]), pvector())
+    assert atom.compare_and_set(first, pvector([2]))
+    assert atom.value == pvector([2])
+    assert atom.reset(pvector()) == pvector()
+
+
+def test_retry():
+    atom = Atom(pmap())
+    calls = []
+
+    def racing(state):
+        calls.append(state)
+        if len(calls) == 1:
+            atom.swap(add, 'other')
+        return add(state, 'n')
+
+    assert atom.swap(racing) == pmap({'n': 1, 'other': 1})
+    assert len(calls) == 2 and atom.retries == 1
+
+
+def test_watches():
+    atom = Atom(pmap())
+    seen = []
+    atom.add_watch('log', lambda key, ref, old, new: seen.append((key, old, new)))
+    atom.swap(put, 'a', 1)
+    atom.swap(put, 'a', 1)
+    assert seen == [('log', pmap(), pmap({'a': 1}))]
+    atom.remove_watch('log')
+    atom.swap(put, 'a', 2)
+    assert len(seen) == 1
+
+
+def test_batching():
+    atom = Atom(pmap())
+    seen = []
+    atom.add_watch('count', lambda *args: seen.append(args[-1]))
+    atom._flushing.acquire()
+    for amount in range(1, 5):
+        atom.send(add, 'n', amount)
+    assert atom.value == pmap()
+    atom._flushing.release()
+    assert atom.flush() == pmap({'n': 10})
+    assert seen == [pmap({'n': 10})]
+    with raises(TypeError):
+        atom.send(add, 'n', None)
+    assert atom.value == pmap({'n': 10})
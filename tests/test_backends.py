@@ -0,0 +1,66 @@
+from pyrsistent import pmap, pset, pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.backends import Backend, backends, get_backend, pyrsistent_backend
+from pyrsistent_mutable.frozen import FrozenMap, FrozenSet, FrozenVector, fmap, fset, fvector
+
+
+@pyrmute(backend='frozen')
+def build(n):
+    local = {'items': [], 'seen': set()}
+    for i in range(n):
+        local['items'].append(i)
+        local['seen'] |= {i % 2}
+    del local['items'][0]
+    local['count'] = len(local['items'])
+    return local
+
+
+def test_frozen_backend_literals():
+    "Test that literals target the selected backend."
+    actual = build(3)
+
+    assert isinstance(actual, FrozenMap)
+    assert isinstance(actual['items'], FrozenVector)
+    assert isinstance(actual['seen'], FrozenSet)
+    assert actual == pmap({'items': pvector([1, 2]), 'seen': pset([0, 1]), 'count': 2})
+
+
+def test_frozen_equality_and_hash():
+    "Test that frozen collections compare and hash like pyrsistent ones."
+    assert fmap({'a': 1}) == pmap({'a': 1}) and pmap({'a': 1}) == fmap({'a': 1})
+    assert hash(fmap({'a': 1})) == hash(pmap({'a': 1}))
+    assert fset([1, 2]) == pset([1, 2]) and pset([1, 2]) == fset([1, 2])
+    assert hash(fset([1, 2])) == hash(pset([1, 2]))
+    assert fvector([1, 2]) == pvector([1, 2]) and pvector([1, 2]) == fvector([1, 2])
+    assert fvector([1, 2]) == [1, 2]
+    assert fvector([1, 2]) != (1, 2)
+
+
+def test_frozen_evolver_copies_once():
+    "Test that an evolver leaves the original alone."
+    original = fmap({'a': 1})
+    evolver = original.evolver()
+    evolver['b'] = 2
+    del evolver['a']
+
+    assert evolver.is_dirty()
+    assert evolver.persistent() == fmap({'b': 2})
+    assert original == fmap({'a': 1})
+
+    vector = fvector([1, 2, 3])
+    evolver = vector.evolver()
+    evolver[0] = 10
+    evolver.append(4)
+    assert evolver.persistent() == fvector([10, 2, 3, 4])
+    assert vector == fvector([1, 2, 3])
+
+
+def test_get_backend():
+    assert get_backend(None) is pyrsistent_backend
+    assert get_backend('frozen') is backends['frozen']
+    custom = Backend('custom', fmap, fvector, fset, {})
+    assert get_backend(custom) is custom
+    with raises(ValueError):
+        get_backend('missing')
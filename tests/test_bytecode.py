@@ -0,0 +1,172 @@
+import sys
+
+import pytest
+from pyrsistent import PClass, field, pmap, pset, pvector
+
+from pyrsistent_mutable import pyrmute, raw
+from pyrsistent_mutable.bytecode import supported
+
+bytecode_only = pytest.mark.skipif(sys.version_info[:2] not in supported, reason='bytecode differs by version')
+
+
+class Record(PClass):
+    n = field()
+    tags = field()
+
+
+def update(m, k, v, r, xs):
+    a = [1, 2, v]
+    b = {k: v, 'other': {v}}
+    d = [x * 2 for x in xs]
+    e = {x: [x] for x in xs}
+    m[k] = v
+    m[k] += 1
+    r.n += 1
+    r.tags.append(v)
+    a.append(k if v else None)
+    a[0] = [9]
+    a[0][0] = 8
+    del b[k]
+    b['other'].add(0)
+    for x in xs:
+        if x < 0:
+            continue
+        xs = xs.set(0, x)
+    with raw():
+        untouched = [v]
+    return a, b, d, e, m, r, xs, untouched
+
+
+def call(*args, **kw):
+    return args, kw
+
+
+def starred(m, xs, r):
+    a = [*xs, 1]
+    b = {**m, 'z': [1]}
+    c = [[*xs], {1, 2, 3}]
+    args, kw = call(*xs, 1, **m)
+    a.extend(*[xs], **{})
+    r.tags.extend(*[xs])
+    r.set(n=5)
+    return a, b, c, args, kw, r
+
+
+def guarded(m, xs):
+    try:
+        m['a'] = 1
+        xs[len(xs)]
+    except IndexError:
+        m['b'] = [2]
+    finally:
+        m['c'] = 3
+    for x in xs:
+        try:
+            if x > 1:
+                break
+            m[x] = x
+        except TypeError:
+            pass
+    return m
+
+
+source = '''
+def fill(v, pairs):
+    for i, x in pairs:
+        v[i] = x
+    return v
+
+
+def made(v, pairs):
+    for i, x in pairs:
+        v[i] = x
+    v.append([x for _, x in pairs])
+    return v
+'''
+
+
+@bytecode_only
+def test_same_as_source():
+    args = pmap({'k': 1}), 'k', 3, Record(n=1, tags=pvector()), pvector([1, -1, 2])
+    by_source = pyrmute(update)(*args)
+    by_bytecode = pyrmute(update, rewriter='bytecode')(*args)
+    assert by_bytecode == by_source
+    a, b, d, e, m, r, xs, untouched = by_bytecode
+    assert a == pvector([pvector([8]), 2, 3, 'k'])
+    assert b == pmap({'other': pset([3, 0])})
+    assert isinstance(d, type(pvector())) and isinstance(e, type(pmap()))
+    assert m == pmap({'k': 4}) and args[0] == pmap({'k': 1})
+    assert r == Record(n=2, tags=pvector([3]))
+    assert type(untouched) is list
+
+
+@bytecode_only
+def test_without_source():
+    namespace = {}
+    exec(source, namespace)
+    made = pyrmute(namespace['made'], rewriter='auto')
+    assert 'LOAD_CONST' in made.__source__
+    v = pvector([0, 0])
+    assert made(v, [(0, 1), (1, 2)]) == pvector([1, 2, pvector([1, 2])])
+    assert v == pvector([0, 0])
+    with pytest.raises(TypeError):
+        pyrmute(namespace['made'], rewriter='auto', intern=True)
+
+
+@bytecode_only
+def test_unchanged():
+    namespace = {}
+    exec(source, namespace)
+    fill = pyrmute(namespace['fill'], rewriter='bytecode', unchanged='identical')
+    v = pvector([1, 2])
+    assert fill(v, [(0, 1)]) is v
+    assert fill(v, [(0, 5)]) == pvector([5, 2])
+    assert pyrmute(namespace['fill'], rewriter='bytecode')(v, [(0, 1)]) is not v
+
+
+@bytecode_only
+def test_tracebacks():
+    namespace = {}
+    exec(source, namespace)
+    made = pyrmute(namespace['made'], rewriter='bytecode')
+    with pytest.raises(IndexError) as info:
+        made(pvector(), [(3, 1)])
+    assert info.traceback[1].lineno + 1 == 10
+
+
+@bytecode_only
+def test_starred_and_calls():
+    args = pmap({'k': 1}), pvector([5, 6]), Record(n=1, tags=pvector())
+    by_bytecode = pyrmute(starred, rewriter='bytecode')(*args)
+    assert by_bytecode == pyrmute(starred)(*args)
+    a, b, c, call_args, kw, r = by_bytecode
+    assert a == pvector([5, 6, 1, 5, 6]) and isinstance(b, type(pmap())) and b['z'] == pvector([1])
+    assert isinstance(c[0], type(pvector())) and c[1] == pset([1, 2, 3])
+    assert type(call_args) is tuple and type(kw) is dict
+    assert r == Record(n=5, tags=pvector([5, 6]))
+
+
+@bytecode_only
+def test_handlers():
+    m, xs = pmap(), pvector([0, 1, 2, 3])
+    assert pyrmute(guarded, rewriter='bytecode')(m, xs) == pyrmute(guarded)(m, xs)
+    assert pyrmute(guarded, rewriter='bytecode')(m, xs) == pmap({'a': 1, 'b': pvector([2]), 'c': 3, 0: 0, 1: 1})
+
+
+def test_options():
+    with pytest.raises(ValueError):
+        pyrmute(rewriter='ast')
+    with pytest.raises(TypeError):
+        pyrmute(rewriter='bytecode', sharing=True)
+
+
+@pytest.mark.skipif(sys.version_info[:2] in supported, reason='bytecode is supported')
+def test_unsupported_version():
+    namespace = {}
+    exec(source, namespace)
+    with pytest.raises(ValueError):
+        pyrmute(namespace['made'], rewriter='bytecode')
+    with pytest.raises(ValueError):
+        pyrmute(namespace['made'], rewriter='auto')
+    by_source = pyrmute(update, rewriter='auto')(pmap(), 'k', 3, Record(n=1, tags=pvector()), pvector())
+    assert by_source[4] == pmap({'k': 4})
@@ -0,0 +1,96 @@
+from pyrsistent import PClass, field, pmap, pset, pvector
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.changes import Attr, Change, collect, missing
+
+
+class User(PClass):
+    name = field()
+    tags = field()
+
+
+@pyrmute(changes=True)
+def update(state, uid, name, tag):
+    scratch = {}
+    scratch['x'] = 1
+    state['users'][uid].name = name
+    state['users'][uid].tags.add(tag)
+    state['count'] += 1
+    del state['old']
+    state.setdefault('log', []).append(name)
+    return state
+
+
+@pyrmute(changes=True)
+def fill(v, n):
+    for i in range(n):
+        v[i] = i
+    v = v.append(n)
+    return v
+
+
+@pyrmute(changes=True)
+def nest(m, depth):
+    if depth:
+        m['inner'] = nest(m['inner'], depth - 1)
+    m['depth'] = depth
+    return m
+
+
+def key(name, seen):
+    seen.append(name)
+    return name
+
+
+@pyrmute(changes=True)
+def keyed(m, seen):
+    m[key('a', seen)] = 1
+    m[key('b', seen)] += 1
+    m[key('c', seen)].append(2)
+    m.setdefault(key('d', seen), []).append(3)
+    del m[key('e', seen)]
+    return m
+
+
+def test_collect():
+    state = pmap({'users': pmap({1: User(name='a', tags=pset())}), 'count': 0, 'old': 1})
+    result, changes = collect(update, state, 1, 'b', 't')
+    assert changes == [
+        Change(('state', 'users', 1, Attr('name')), 'set', 'a', 'b'),
+        Change(('state', 'users', 1, Attr('tags')), 'add', pset(), pset(['t'])),
+        Change(('state', 'count'), 'set', 0, 1),
+        Change(('state', 'old'), 'delete', 1, missing),
+        Change(('state', 'log'), 'append', missing, pvector(['b'])),
+    ]
+    assert result == update(state, 1, 'b', 't')
+    assert "_collector = _enter('update')" in update.__source__
+    assert "_before(_collector, 'state', state, ('count',), 'i')" in update.__source__
+    assert 'scratch' not in update.__source__.split('_before', 1)[1].split('\n')[0]
+
+
+def test_loops_and_rebinding():
+    result, changes = collect(fill, pvector([9, 9]), 2)
+    assert result == pvector([0, 1, 2])
+    assert changes == [Change(('v', 0), 'set', 9, 0), Change(('v', 1), 'set', 9, 1),
+                       Change(('v',), 'set', pvector([0, 1]), pvector([0, 1, 2]))]
+
+
+def test_not_collecting():
+    assert fill(pvector(), 1) == pvector([0, 1])
+    result, changes = collect(lambda v: fill(v, 1), pvector())
+    assert result == pvector([0, 1]) and changes == []
+
+
+def test_recursive_calls_not_collected():
+    inner = pmap({'inner': pmap()})
+    result, changes = collect(nest, pmap({'inner': inner}), 2)
+    assert result == pmap({'inner': pmap({'inner': pmap({'depth': 0}), 'depth': 1}), 'depth': 2})
+    assert changes == [Change(('m', 'inner'), 'set', inner, result['inner']), Change(('m', 'depth'), 'set', missing, 2)]
+
+
+def test_keys_evaluated_once():
+    seen = []
+    result, changes = collect(keyed, pmap({'b': 1, 'c': pvector(), 'e': 0}), seen)
+    assert seen == ['a', 'b', 'c', 'd', 'e']
+    assert result == pmap({'a': 1, 'b': 2, 'c': pvector([2]), 'd': pvector([3])})
+    assert [change.path for change in changes] == [('m', 'a'), ('m', 'b'), ('m', 'c'), ('m', 'd'), ('m', 'e')]
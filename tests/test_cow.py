@@ -0,0 +1,131 @@
+from pyrsistent import PMap, PRecord, PVector, field, pmap, pvector, pset
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.cow import CowMap, CowSet, CowVector, cow
+
+
+@pyrmute(boundary='cow')
+def tag(doc, tag):
+    doc['meta']['tags'].append(tag)
+    doc['count'] += 1
+    return doc
+
+
+@pyrmute(boundary='cow')
+def total(doc):
+    return sum(doc['values'])
+
+
+@pyrmute(boundary='cow')
+def views_inside(doc):
+    doc['count'] += 1
+    return type(doc['meta']['owner']), type(doc['values'])
+
+
+@pyrmute(boundary='cow')
+def same(doc):
+    return doc, (doc['meta'], 1)
+
+
+@pyrmute(boundary='cow')
+def identity(doc):
+    return doc
+
+
+class Unwalkable(PRecord):
+    count = field()
+
+    def items(self):
+        raise AssertionError('walked')
+
+
+@pyrmute(boundary='freeze')
+def frozen(doc):
+    doc['count'] += 1
+    return doc
+
+
+def make_doc():
+    return {'meta': {'tags': ['a'], 'owner': {'name': 'x'}}, 'count': 1, 'values': [1, 2, 3]}
+
+
+def test_cow_never_mutates_caller():
+    "Test that writes through the boundary leave the caller's dict alone."
+    doc = make_doc()
+    result = tag(doc, 'b')
+
+    assert doc == make_doc()
+    assert isinstance(result, PMap)
+    assert result['count'] == 2
+    assert result['meta']['tags'] == pvector(['a', 'b'])
+    assert isinstance(result['meta']['tags'], PVector)
+
+
+def test_cow_converts_only_written_path():
+    "Test that unwritten branches stay as views while the function runs."
+    assert views_inside(make_doc()) == (CowMap, CowVector)
+
+
+def test_cow_results_are_settled():
+    "Test that a result doesn't see changes the caller makes after the call."
+    doc = make_doc()
+    result = tag(doc, 'b')
+    unchanged, pair = same(doc)
+    doc['meta']['owner']['name'] = 'y'
+    doc['values'].append(4)
+
+    assert isinstance(result['meta']['owner'], PMap) and result['meta']['owner'] == pmap({'name': 'x'})
+    assert isinstance(result['values'], PVector) and result['values'] == pvector([1, 2, 3])
+    assert isinstance(unchanged, PMap) and unchanged['values'] == pvector([1, 2, 3])
+    assert pair == (pmap({'tags': pvector(['a']), 'owner': pmap({'name': 'x'})}), 1)
+    assert hash(result) == hash(tag(make_doc(), 'b'))
+
+
+def test_cow_persistent_results_are_not_walked():
+    "Test that a call given no builtin collections returns its argument without walking it."
+    doc = Unwalkable(count=1)
+    result = identity(doc)
+
+    assert result is doc
+
+
+def test_cow_reads_pass_through():
+    "Test that a read-only function sees the caller's values."
+    assert total(make_doc()) == 6
+
+
+def test_freeze_boundary():
+    "Test that the freeze boundary converts up front."
+    doc = make_doc()
+    result = frozen(doc)
+
+    assert doc['count'] == 1
+    assert result['values'] == pvector([1, 2, 3])
+
+
+def test_cow_views():
+    "Test the view types directly."
+    assert cow(5) == 5
+    assert isinstance(cow({}), CowMap)
+
+    vec = cow([1, [2]])
+    assert vec[1] == [2] and isinstance(vec[1], CowVector)
+    assert vec.append(3) == pvector([1, pvector([2]), 3])
+    assert vec[:1] == [1]
+
+    items = cow({1, 2})
+    assert isinstance(items, CowSet)
+    assert items.add(3) == pset([1, 2, 3])
+    assert items.discard(5) is items
+    assert items | {4} == pset([1, 2, 4])
+
+    mapping = cow({'a': 1})
+    assert mapping.set('b', 2) == pmap({'a': 1, 'b': 2})
+    with raises(TypeError):
+        hash(mapping)
+
+
+def test_boundary_checked():
+    with raises(ValueError):
+        pyrmute(boundary='copy')
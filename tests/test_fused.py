@@ -0,0 +1,79 @@
+from pyrsistent import pmap, pset, pvector
+
+from pyrsistent_mutable import pyrmute
+
+
+@pyrmute
+def group(pairs):
+    index = {}
+    for k, v in pairs:
+        index.setdefault(k, []).append(v)
+    return index
+
+
+@pyrmute
+def group_into(index, pairs):
+    for k, v in pairs:
+        index.setdefault(k, []).append(v)
+    return index
+
+
+@pyrmute
+def append_all(index, pairs):
+    for k, v in pairs:
+        index[k].append(v)
+    return index
+
+
+@pyrmute
+def count(table, row, column):
+    table[row][column] += 1
+    table[row][column + 1] = table[row][column + 1] * 2
+    return table
+
+
+@pyrmute
+def single(index, k, v, rows):
+    index[k].append(v)
+    rows[0][k].add(v)
+    return index, rows
+
+
+def test_setdefault():
+    assert '_setdefault_invoke(_evolver, k, _pvector([]), ' in group.__source__
+    assert group([(1, 2), (1, 3), (2, 4)]) == pmap({1: pvector([2, 3]), 2: pvector([4])})
+
+
+def test_setdefault_into():
+    index = pmap({1: pvector([0])})
+    assert group_into(index, [(1, 2), (3, 4)]) == pmap({1: pvector([0, 2]), 3: pvector([4])})
+    assert index == pmap({1: pvector([0])})
+    builtin = {1: [0]}
+    assert group_into(builtin, [(1, 2), (3, 4)]) is builtin
+    assert builtin == {1: [0, 2], 3: pvector([4])}
+
+
+def test_item_method():
+    assert '_invoke_item(' in append_all.__source__
+    index = pmap({'a': pvector(), 'b': pvector([1])})
+    assert append_all(index, [('a', 1), ('b', 2), ('a', 3)]) == pmap({'a': pvector([1, 3]), 'b': pvector([1, 2])})
+    assert index == pmap({'a': pvector(), 'b': pvector([1])})
+    builtin = {'a': [], 'b': pvector()}
+    assert append_all(builtin, [('a', 1), ('b', 2)]) is builtin
+    assert builtin == {'a': [1], 'b': pvector([2])}
+
+
+def test_single_updates():
+    assert "_invoke_item(rows[0], k, 'add', v)" in single.__source__
+    rows = pvector([pmap({1: pset()})])
+    index, result = single(pmap({1: pvector()}), 1, 5, rows)
+    assert index == pmap({1: pvector([5])})
+    assert result == pvector([pmap({1: pset([5])})])
+    assert rows == pvector([pmap({1: pset()})])
+
+
+def test_nested_reads_hoisted():
+    assert '_item = table[row]' in count.__source__
+    table = pmap({'r': pvector([1, 2])})
+    assert count(table, 'r', 0) == pmap({'r': pvector([2, 4])})
+    assert table == pmap({'r': pvector([1, 2])})
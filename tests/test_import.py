@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+#: Modules that importing the package shouldn't pull in; they're only needed to decorate a function.
+heavy = ('ast', 'astunparse', 'inspect', 'pyrsistent', 'pyrsistent_mutable.build', 'pyrsistent_mutable.rewrite',
+         'six', 'textwrap', 'tokenize')
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#: Modules that only rewriting a function needs, rather than loading its rewrite from the cache. pyrsistent imports
+#: ``ast`` and ``inspect`` itself.
+rewriter = ('astunparse', 'pyrsistent_mutable.ast6', 'pyrsistent_mutable.inline', 'pyrsistent_mutable.passes',
+            'pyrsistent_mutable.rewrite', 'textwrap')
+
+
+def imported_modules(statement, env=None):
+    '''Run a statement in a fresh interpreter and list the modules it imported, using ``-X importtime``.'''
+    proc = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', statement], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, cwd=root)
+    _, err = proc.communicate()
+    assert proc.returncode == 0, err
+    names = set()
+    for line in err.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            names.add(line.rsplit('|', 1)[1].strip())
+    return names
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime is new in 3.7')
+def test_package_import_is_lean():
+    names = imported_modules('import pyrsistent_mutable')
+    assert 'pyrsistent_mutable.decorator' in names
+    assert names.isdisjoint(heavy), sorted(names.intersection(heavy))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime is new in 3.7')
+def test_decorating_imports_rewriter():
+    names = imported_modules('import tests.py3funcs')
+    assert 'pyrsistent_mutable.rewrite' in names
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='-X importtime is new in 3.7')
+def test_cache_hit_skips_rewriter(tmpdir):
+    env = dict(os.environ, PYRMUTE_CACHE_DIR=str(tmpdir))
+    assert 'pyrsistent_mutable.rewrite' in imported_modules('import tests.py3funcs', env)
+    names = imported_modules('import tests.py3funcs', env)
+    assert 'pyrsistent_mutable.build' in names
+    assert names.isdisjoint(rewriter), sorted(names.intersection(rewriter))
@@ -0,0 +1,137 @@
+from functools import wraps
+
+from pyrsistent import PRecord, field, pmap, pvector
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable import inline
+
+
+class Counter(PRecord):
+    count = field()
+
+
+@pyrmute
+def bump(r):
+    '''Add one.'''
+    r.count += 1
+    return r
+
+
+@pyrmute
+def tally(v, x):
+    v.append(x)
+
+
+@pyrmute(passes={'inline': True})
+def run(rs, n):
+    for i in range(n):
+        rs[i] = bump(rs[i])
+    return rs
+
+
+@pyrmute(passes={'inline': True})
+def collect(xs):
+    v = []
+    for x in xs:
+        tally(v, x)
+    return bump(Counter(count=len(v)))
+
+
+@pyrmute(passes={'inline': True})
+def shadowed(bump, r):
+    return bump(r)
+
+
+@wraps(bump)
+def logged(r):
+    logged.calls += 1
+    return bump(r)
+
+
+logged.calls = 0
+
+
+@pyrmute(passes={'inline': True})
+def through_wrapper(r):
+    return logged(r)
+
+
+CONFIG = {'a': 1}
+
+
+@pyrmute(boundary='cow')
+def count_config(config):
+    config['count'] = 1
+    return config
+
+
+@pyrmute(passes={'inline': True}, boundary='cow')
+def configure():
+    return count_config(CONFIG)
+
+
+@pyrmute(passes={'inline': True}, sharing=True)
+def other_options(r):
+    return bump(r)
+
+
+@pyrmute(passes={'inline': False})
+def plain(rs):
+    rs[0] = bump(rs[0])
+    return rs
+
+
+def test_inlined():
+    assert '_bump_inlined' in run.__source__
+    assert '_bump_r = ' in run.__source__
+    rs = pvector([Counter(count=1), Counter(count=5)])
+    assert run(rs, 2) == pvector([Counter(count=2), Counter(count=6)])
+    assert rs == pvector([Counter(count=1), Counter(count=5)])
+
+
+def test_inlined_without_return():
+    # The callee's updates to its parameter are local to it, as they would be if it were called.
+    assert '_tally_inlined' in collect.__source__
+    assert collect([1, 2]) == Counter(count=1)
+
+
+def test_rebound_callee_is_called():
+    namespace = run.__globals__
+    try:
+        namespace['bump'] = lambda r: r.set(count=100)
+        assert run(pvector([Counter(count=1)]), 1) == pvector([Counter(count=100)])
+    finally:
+        namespace['bump'] = bump
+    assert run(pvector([Counter(count=1)]), 1) == pvector([Counter(count=2)])
+
+
+def test_not_inlined():
+    assert '_inlined' not in shadowed.__source__
+    assert shadowed(lambda r: r, 1) == 1
+    assert '_inlined' not in other_options.__source__
+    assert '_inlined' not in plain.__source__
+
+
+def test_wrapper_is_called():
+    # The wrapper has bump's __original__ and __options__, but inlining bump would skip it.
+    assert '_inlined' not in through_wrapper.__source__
+    assert through_wrapper(Counter(count=1)) == Counter(count=2) and logged.calls == 1
+
+
+def test_too_big(monkeypatch):
+    monkeypatch.setattr(inline, 'limit', 4)
+
+    @pyrmute(passes={'inline': True})
+    def small(r):
+        return bump(r)
+
+    assert '_inlined' not in small.__source__
+    assert small(Counter(count=0)) == Counter(count=1)
+
+
+def test_boundary_callee_is_called():
+    result = configure()
+
+    assert '_inlined' not in configure.__source__
+    assert result == pmap({'a': 1, 'count': 1})
+    assert CONFIG == {'a': 1}
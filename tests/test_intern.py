@@ -0,0 +1,77 @@
+import gc
+
+from pyrsistent import pmap, pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.intern import Interner, global_interner
+
+
+@pyrmute(intern=True)
+def make_config(name):
+    return {'name': name, 'tags': ['a', 'b']}
+
+
+@pyrmute(intern='global', intern_returns=True)
+def make_defaults():
+    defaults = {'retries': 3}
+    defaults['timeout'] = 10
+    return defaults
+
+
+@pyrmute(intern='global', intern_returns=True)
+def make_defaults_again():
+    return {'retries': 3, 'timeout': 10}
+
+
+def test_intern_literals():
+    "Test that equal literals share an instance within a function."
+    first = make_config('x')
+    second = make_config('x')
+
+    assert first == pmap({'name': 'x', 'tags': pvector(['a', 'b'])})
+    assert first is second
+    assert first['tags'] is make_config('y')['tags']
+    assert make_config.__interner__.hits >= 2
+
+
+def test_intern_returns_global():
+    "Test that returned values are shared across functions with the global scope."
+    assert make_defaults() is make_defaults_again()
+    assert make_defaults.__interner__ is global_interner
+
+
+def test_intern_distinguishes_types():
+    "Test that equal values of different types aren't merged."
+    interner = Interner()
+    ones = interner(pvector([1]))
+
+    assert interner(pvector([True]))[0] is True
+    assert interner(pvector([1])) is ones
+
+
+def test_intern_is_weak():
+    "Test that the table doesn't keep values alive."
+    interner = Interner()
+    interner(pmap({'a': 1}))
+    gc.collect()
+
+    assert len(interner) == 0
+
+
+def test_intern_unhashable():
+    "Test that unhashable values pass through."
+    interner = Interner()
+    value = pvector([[1]])
+
+    assert interner(value) is value
+
+
+def test_intern_empty_interner():
+    "Test that a new, empty Interner counts as interning."
+    interner = Interner()
+    func = pyrmute(make_defaults_again, intern=interner, intern_returns=True)
+
+    assert func() is func() and len(interner) > 0
+    with raises(TypeError):
+        pyrmute(intern=Interner(), rewriter='bytecode')
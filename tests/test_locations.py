@@ -0,0 +1,63 @@
+from ast import parse, walk
+import inspect
+import sys
+import traceback
+
+from pyrsistent import pvector
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.ast6 import relocate
+
+
+def plain(value):
+    value.append(1)
+    raise ValueError(value)
+
+
+rewritten = pyrmute(plain)
+
+
+class Holder(object):
+    @pyrmute
+    def method(self, value):
+        value.append(2)
+        raise ValueError(value)
+
+
+def failing_line(func, *args):
+    try:
+        func(*args)
+    except ValueError:
+        return traceback.extract_tb(sys.exc_info()[2])[-1]
+
+
+def test_first_line_matches():
+    "Test that the rewritten code starts where the original does."
+    assert rewritten.__code__.co_firstlineno == plain.__code__.co_firstlineno
+    assert rewritten.__code__.co_filename == plain.__code__.co_filename
+
+
+def test_traceback_line():
+    "Test that tracebacks point at the original line."
+    frame = failing_line(rewritten, pvector())
+    source, start = inspect.getsourcelines(plain)
+
+    assert frame.lineno == start + 2
+    assert frame.line.strip() == 'raise ValueError(value)'
+
+
+def test_traceback_line_indented():
+    "Test line numbers in a method, which is dedented before parsing."
+    frame = failing_line(Holder().method, pvector())
+
+    assert frame.line.strip() == 'raise ValueError(value)'
+
+
+def test_relocate():
+    "Test shifting lines and columns."
+    tree = relocate(parse('x = y\nz = 1\n'), lines=10, columns=4)
+
+    located = [(node.lineno, node.col_offset) for node in walk(tree) if hasattr(node, 'lineno')]
+    assert (11, 4) in located
+    assert (12, 8) in located
+    assert all(lineno > 10 and col >= 4 for lineno, col in located)
@@ -0,0 +1,93 @@
+from pyrsistent import PRecord, field, pmap, pset, pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.globals import Batch, batch
+
+
+@pyrmute
+def build(xs, m, ks, pairs):
+    v = []
+    for x in xs:
+        v.append(x * 2)
+    for k in ks:
+        del m[k]
+    for k, value in pairs:
+        m[k] = value
+    s = set()
+    for x in xs:
+        s.add(x)
+    return v, m, s, x
+
+
+def test_loops_lowered():
+    assert '.persistent()' in build.__source__
+    v, m, s, x = build([1, 2, 3], pmap({1: 1, 2: 2}), [1], [(5, 6)])
+    assert v == pvector([2, 4, 6])
+    assert m == pmap({2: 2, 5: 6})
+    assert s == {1, 2, 3}
+    assert x == 3
+
+
+def test_lowered_loops_on_builtins():
+    m = {1: 1, 2: 2}
+    v, result, s, x = build([1], m, [1], [(5, 6)])
+    assert result is m
+    assert m == {2: 2, 5: 6}
+
+
+@pyrmute
+def partial(v, xs):
+    try:
+        for x in xs:
+            v.append(10 // x)
+    except ZeroDivisionError:
+        pass
+    return v
+
+
+def test_lowered_loop_keeps_updates_before_error():
+    assert partial(pvector(), [1, 2, 0, 5]) == pvector([10, 5])
+
+
+@pyrmute
+def reads_subject(v, xs):
+    for x in xs:
+        v.append(len(v))
+    return v
+
+
+@pyrmute
+def closure(v, xs):
+    size = lambda: len(v)
+    for x in xs:
+        v.append(size())
+    return v
+
+
+def test_loops_reading_subject_not_lowered():
+    assert '.persistent()' not in reads_subject.__source__
+    assert reads_subject(pvector(), 'abc') == pvector([0, 1, 2])
+    assert '.persistent()' not in closure.__source__
+    assert closure(pvector(), 'abc') == pvector([0, 1, 2])
+
+
+class Record(PRecord):
+    a = field()
+
+
+@pyrmute
+def set_fields(record, names):
+    for name in names:
+        record[name] = 1
+    return record
+
+
+def test_batch():
+    assert not isinstance(batch(pvector(), 'append'), Batch)
+    assert isinstance(batch(pset(), 'remove'), Batch)
+    assert isinstance(batch([], 'append'), Batch)
+    assert set_fields(Record(), ['a']) == Record(a=1)
+    with raises(KeyError):
+        b = batch(pset(), 'remove')
+        b.remove(1)
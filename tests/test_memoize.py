@@ -0,0 +1,127 @@
+from mock import patch
+from pyrsistent import pmap, pvector
+import pytest
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.memoize import Memoize, Memoized
+
+
+calls = []
+record = calls.append
+
+
+@pyrmute(memoize=2)
+def add_key(m, key):
+    record(key)
+    m[key] = True
+    return m
+
+
+def test_memoized_hit():
+    "Test that a repeated call is answered from the cache."
+    del calls[:]
+    add_key.cache_clear()
+    base = pmap({'a': 1})
+
+    first = add_key(base, 'b')
+    second = add_key(pmap({'a': 1}), 'b')
+
+    assert first == pmap({'a': 1, 'b': True})
+    assert second is first
+    assert calls == ['b']
+    assert add_key.cache_info().hits == 1
+    assert add_key.cache_info().misses == 1
+
+
+def test_memoized_lru_eviction():
+    "Test that the least recently used entry is evicted first."
+    del calls[:]
+    add_key.cache_clear()
+    base = pmap()
+
+    add_key(base, 'x')
+    add_key(base, 'y')
+    add_key(base, 'x')
+    add_key(base, 'z')
+    add_key(base, 'x')
+    add_key(base, 'y')
+
+    assert calls == ['x', 'y', 'z', 'y']
+    info = add_key.cache_info()
+    assert info.evictions == 2
+    assert info.currsize == 2
+
+
+@patch('pyrsistent_mutable.memoize.clock')
+def test_memoized_ttl(clock):
+    "Test that entries older than ttl are recomputed."
+    seen = []
+
+    def func(value):
+        seen.append(value)
+        return value
+
+    memo = Memoized(func, Memoize(ttl=10))
+    clock.return_value = 0.0
+    memo(pvector([1]))
+    clock.return_value = 5.0
+    memo(pvector([1]))
+    clock.return_value = 20.0
+    memo(pvector([1]))
+
+    assert len(seen) == 2
+
+
+def test_memoized_unhashable_warns():
+    "Test that unhashable builtins bypass the cache with a warning."
+    del calls[:]
+    add_key.cache_clear()
+
+    with pytest.warns(RuntimeWarning, match='dict'):
+        add_key({}, 'a')
+
+    assert add_key.cache_info().bypasses == 1
+    assert add_key.cache_info().currsize == 0
+
+
+def test_memoized_unhashable_strict():
+    "Test that strict mode refuses unhashable builtins."
+    memo = Memoized(lambda value: value, Memoize(strict=True))
+
+    with raises(TypeError):
+        memo([1, 2])
+
+
+def test_memoized_keeps_source():
+    "Test that the wrapper still exposes the rewritten source."
+    assert '_set_via_slice' in add_key.__source__
+    assert add_key.__name__ == 'add_key'
+
+
+def test_memoize_coerce():
+    assert Memoize.coerce(None) is None
+    assert Memoize.coerce(False) is None
+    assert Memoize.coerce(True).maxsize == 128
+    assert Memoize.coerce(7).maxsize == 7
+    assert Memoize.coerce({'ttl': 3}).ttl == 3
+    with raises(TypeError):
+        Memoize.coerce('yes')
+
+
+def test_memoized_maxsize_zero():
+    "Test that maxsize=0 caches nothing, even for the same argument objects."
+    seen = []
+
+    def func(value):
+        seen.append(value)
+        return value
+
+    memo = Memoized(func, Memoize(maxsize=0))
+    arg = pvector([1])
+    memo(arg)
+    memo(arg)
+
+    assert len(seen) == 2
+    assert memo.cache_info().hits == 0
+    assert memo.cache_info().misses == 2
@@ -43,7 +43,7 @@ def test_skips_existent():
         names=[alias(
             name=set(['name']),
             asname=set(['asname'])
-        )])
+        )], level=0)
     print(dump(module))
     assert match_ast(expect, module.body[0]) == {'asname': 'func_name0', 'mod': 'test.mod', 'name': 'func_name'}
     assert match_ast(expect, module.body[1]) == {'asname': 'func_name1', 'mod': 'test.mod2', 'name': 'func_name'}
@@ -0,0 +1,185 @@
+from typing import List
+import pickle
+
+from pyrsistent import pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute, typed
+from pyrsistent_mutable.globals import batch, del_slice, invoke, set_via_slice
+from pyrsistent_mutable.numeric import CHUNK, TypedVector, TypedVectorEvolver, tvector
+
+
+@pyrmute
+def series(raw, n):
+    zeros: List[float] = [0.0] * n
+    xs = typed(float, [float(x) for x in raw])
+    counts = pyrmute.typed(int, [])
+    for i in range(n):
+        zeros[i] = i / 2
+    for x in raw:
+        counts.append(x)
+    xs[0] += 1
+    return zeros, xs, counts
+
+
+class Schema(object):
+    @staticmethod
+    def typed(element, values):
+        return element, values
+
+
+@pyrmute
+def other_typed(schema):
+    return schema.typed(int, [1, 2])
+
+
+def test_rewritten():
+    "Test that annotated and typed() lists become typed vectors rather than pvectors."
+    zeros, xs, counts = series([1, 2, 3], 4)
+
+    assert '_pvector' not in series.__source__
+    assert isinstance(zeros, TypedVector)
+    assert zeros.typecode == 'd'
+    assert isinstance(xs, TypedVector)
+    assert xs.typecode == 'd'
+    assert counts.typecode == 'q'
+
+
+def test_rewritten_values():
+    "Test that updates to typed vectors in a rewritten function work as on lists."
+    zeros, xs, counts = series([1, 2, 3], 4)
+
+    assert zeros == [0.0, 0.5, 1.0, 1.5]
+    assert xs == [2.0, 2.0, 3.0]
+    assert counts == [1, 2, 3]
+
+
+def test_other_typed_is_a_call():
+    "Test that a typed method of something else is called as it is."
+    element, values = other_typed(Schema())
+
+    assert element is int
+    assert type(values) is type(pvector())
+    assert values == [1, 2]
+
+
+def test_updates_share_chunks():
+    "Test that setting an element copies only its chunk."
+    v = tvector(float, range(CHUNK * 3 + 5))
+
+    w = v.set(CHUNK + 1, -1.0)
+
+    assert v[CHUNK + 1] == CHUNK + 1
+    assert w[CHUNK + 1] == -1.0
+    assert w._chunks[0] is v._chunks[0]
+    assert w._chunks[2] is v._chunks[2]
+    assert w._chunks[1] is not v._chunks[1]
+
+
+def test_slices_share_chunks():
+    "Test that a slice starting on a chunk boundary shares the chunks."
+    v = tvector(float, range(CHUNK * 3 + 5))
+
+    tail = v[CHUNK:]
+
+    assert tail._chunks[0] is v._chunks[1]
+    assert tail == list(range(CHUNK, CHUNK * 3 + 5))
+
+
+def test_updates_match_list():
+    "Test that append, extend, delete and remove do what they do to a list."
+    ref = list(range(CHUNK * 2 + 3))
+    v = tvector(int, ref)
+
+    ref.append(7)
+    v = v.append(7)
+    ref.extend(range(CHUNK))
+    v = v.extend(range(CHUNK))
+    del ref[5]
+    v = v.delete(5)
+    ref.remove(7)
+    v = v.remove(7)
+
+    assert v == ref
+
+
+def test_reads_match_list():
+    "Test that slices, indexing, reversing and the reductions give what they give on a list."
+    ref = list(range(CHUNK * 2 + 3))
+    v = tvector(int, ref)
+
+    assert v[3:CHUNK * 2 + 9:7] == ref[3:CHUNK * 2 + 9:7]
+    assert v[-1] == ref[-1]
+    assert list(reversed(v)) == ref[::-1]
+    assert v.sum() == sum(ref)
+    assert v.min() == min(ref)
+    assert v.max() == max(ref)
+
+
+def test_operators_match_list():
+    "Test that adding, multiplying, pickling and hashing work as for a list or tuple."
+    ref = list(range(CHUNK * 2 + 3))
+    v = tvector(int, ref)
+
+    assert v + [1] == ref + [1]
+    assert v * 2 == ref * 2
+    assert pickle.loads(pickle.dumps(v)) == v
+    assert hash(v) == hash(tuple(ref))
+
+
+def test_evolver():
+    "Test that an evolver's changes show in its result and not in the original."
+    v = tvector(float, range(CHUNK + 1))
+    evolver = v.evolver()
+
+    evolver[0] = 5.0
+    evolver[len(evolver)] = 1.0
+    evolver.extend([2.0] * CHUNK)
+    del evolver[1]
+    w = evolver.persistent()
+
+    assert v == list(range(CHUNK + 1))
+    assert w == [5.0] + list(range(2, CHUNK + 1)) + [1.0] + [2.0] * CHUNK
+
+
+def test_evolver_is_dirty():
+    "Test that an evolver is dirty after a change."
+    evolver = tvector(float, range(CHUNK + 1)).evolver()
+
+    evolver[0] = 5.0
+
+    assert evolver.is_dirty()
+
+
+def test_evolver_keeps_chunks_full():
+    "Test that an evolver's result has every chunk but the last full."
+    evolver = tvector(float, range(CHUNK + 1)).evolver()
+
+    evolver.extend([2.0] * CHUNK)
+    del evolver[1]
+    w = evolver.persistent()
+
+    assert all(len(chunk) == CHUNK for chunk in w._chunks[:-1])
+
+
+def test_helpers():
+    "Test that the rewrite's helpers update typed vectors without changing them."
+    v = tvector(int, [1, 2])
+
+    assert set_via_slice(v, 0, 3) == [3, 2]
+    assert del_slice(v, 0) == [2]
+    assert invoke(v, 'append', 3) == [1, 2, 3]
+    assert isinstance(batch(v, 'append'), TypedVectorEvolver)
+    assert v == [1, 2]
+
+
+def test_element_checks():
+    "Test that elements of the wrong type or out of range are refused, as are unsupported types."
+    v = tvector(int, [1, 2])
+
+    with raises(TypeError):
+        v.set(0, 1.5)
+    with raises(IndexError):
+        v.set(3, 1)
+    with raises(ValueError):
+        tvector(str)
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+from mock import patch
+from pyrsistent import pmap, pvector
+from pytest import mark, raises
+
+from pyrsistent_mutable import cache, pyrmute
+from pyrsistent_mutable.passes import Pipeline, defaults, registry, resolve, set_defaults
+
+
+def build(xs, key):
+    v = []
+    m = {}
+    w = v
+    for x in xs:
+        v.append(x)
+    m[key] = 1
+    del m[key]
+    m[key] = v
+    w.append(0)
+    return v, m, w
+
+
+@mark.parametrize('opt', [0, 1, 2])
+def test_levels_agree(opt):
+    func = pyrmute(opt=opt)(build)
+    assert func([1, 2], 'a') == (pvector([1, 2]), pmap({'a': pvector([1, 2])}), pvector([0]))
+
+
+def test_specialize_locals():
+    assert '_set_via_slice(m' in pyrmute(opt=0)(build).__source__
+    level1 = pyrmute(opt=1)(build).__source__
+    assert 'm = m.set(key, 1)' in level1
+    assert 'w = _invoke(w' in level1
+    assert 'w = w.append(0)' in pyrmute(opt=2)(build).__source__
+
+
+@mark.parametrize('name', [step.name for step in registry if not step.required])
+def test_passes_switch_off(name):
+    func = pyrmute(opt=2, passes={name: False})(build)
+    assert func([1, 2], 'a') == (pvector([1, 2]), pmap({'a': pvector([1, 2])}), pvector([0]))
+    assert '.persistent()' not in func.__source__ or name != 'lower_loops'
+
+
+@patch.dict(defaults, {'opt': 0, 'passes': {}})
+def test_pipeline_selection():
+    class Options(object):
+        interner = None
+        intern_returns = False
+        boundary = None
+        types = None
+        return_view = False
+
+    assert [step.name for step in Pipeline(0).selected(Options())] == ['rewrite', 'lower_loops']
+    assert [step.name for step in Pipeline(1, {'lower_loops': False}).selected(Options())] == [
+        'rewrite', 'specialize_locals']
+    with raises(ValueError):
+        resolve(3)
+    with raises(ValueError):
+        resolve(0, {'rewrite': False})
+    with raises(ValueError):
+        resolve(0, {'nonsense': True})
+
+
+@patch.dict(defaults, {'opt': 0, 'passes': {}})
+def test_bad_defaults_change_nothing():
+    "Test that set_defaults leaves the defaults alone when the new ones are invalid."
+    with raises(ValueError):
+        set_defaults(2, {'nonsense': True})
+    with raises(ValueError):
+        set_defaults(3)
+
+    assert defaults == {'opt': 0, 'passes': {}}
+
+
+def test_passes_are_timed():
+    cache.clear()
+    pyrmute(opt=1)(build)
+    entry = pyrmute.stats()[-1]
+    assert 'specialize_locals' in entry.phases
+
+
+def test_environment_defaults():
+    env = dict(os.environ, PYRMUTE_OPT='2', PYRMUTE_PASSES='-lower_loops, +specialize_locals')
+    out = subprocess.check_output([sys.executable, '-c', 'from pyrsistent_mutable.passes import defaults; '
+                                                         'print(defaults["opt"], sorted(defaults["passes"].items()))'],
+                                  env=env, universal_newlines=True)
+    assert out.strip() == "2 [('lower_loops', False), ('specialize_locals', True)]"
@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import pickle
+
+from mock import patch
+from pyrsistent import pmap
+import pytest
+
+from pyrsistent_mutable import cache, pyrmute
+
+
+def plain(m):
+    m['plain'] = True
+    return m
+
+
+rewritten = pyrmute(plain)
+
+
+@pyrmute
+def decorated(m):
+    m['decorated'] = True
+    return m
+
+
+@pyrmute(memoize=True)
+def memoized(m):
+    m['memoized'] = True
+    return m
+
+
+def fresh(m):
+    m['fresh'] = True
+    return m
+
+
+class Holder(object):
+    @pyrmute
+    def method(self, m):
+        m['method'] = True
+        return m
+
+
+@pytest.mark.parametrize('protocol', range(2, pickle.HIGHEST_PROTOCOL + 1))
+@pytest.mark.parametrize('func', [plain, rewritten, decorated, memoized, Holder.method])
+def test_pickle_by_reference(func, protocol):
+    assert pickle.loads(pickle.dumps(func, protocol)) is func
+
+
+def test_rewritten_keeps_qualname():
+    assert Holder.method.__qualname__ == 'Holder.method'
+    assert plain.__pyrmute__ is rewritten
+
+
+def test_cache_hit():
+    cache.clear()
+    pyrmute(fresh)
+    assert cache.export()
+    with patch('pyrsistent_mutable.rewrite.rewrite', side_effect=AssertionError('not cached')):
+        again = pyrmute(fresh)
+    assert again(pmap()) == pmap({'fresh': True})
+    assert again.__source__ == pyrmute(fresh).__source__
+
+
+def test_cache_dir(tmpdir):
+    with patch.dict(os.environ, {'PYRMUTE_CACHE_DIR': str(tmpdir)}):
+        cache.clear()
+        pyrmute(fresh)
+        assert len(tmpdir.listdir()) == 1
+        cache.clear()
+        with patch('pyrsistent_mutable.rewrite.rewrite', side_effect=AssertionError('not cached')):
+            again = pyrmute(fresh)
+    assert again(pmap()) == pmap({'fresh': True})
+
+
+def call(func):
+    return func(pmap())
+
+
+def test_process_pool():
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(1, mp_context=context, initializer=cache.install,
+                             initargs=(cache.export(),)) as pool:
+        results = list(pool.map(call, [rewritten, memoized, decorated]))
+    assert results == [pmap({'plain': True}), pmap({'memoized': True}), pmap({'decorated': True})]
@@ -0,0 +1,90 @@
+from pyrsistent import pvector, pmap
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute, raw
+
+
+@pyrmute
+def smooth(series, settings):
+    window = [0.0] * 3
+    with pyrmute.raw():
+        window = list(window)
+        totals = [0.0] * len(series)
+        for i, value in enumerate(series):
+            window[i % 3] = value
+            totals[i] = sum(window) / 3
+    settings['done'] = True
+    return pvector(totals), settings
+
+
+@pyrmute
+def fill(out, n):
+    with raw():
+        rows = [0.0] * n
+        out.extend(rows)
+        out[0] = 1.0
+    return rows
+
+
+@pyrmute
+def writes_persistent(value):
+    with raw():
+        value[0] = 1
+    return value
+
+
+@pyrmute
+def imported_name():
+    with raw():
+        local = []
+        local.append(1)
+    return local
+
+
+def test_raw_block_untransformed():
+    "Test that a raw block works on plain lists."
+    totals, settings = smooth([3.0, 6.0, 9.0], pmap())
+
+    assert totals == pvector([1.0, 3.0, 6.0])
+    assert settings == pmap({'done': True})
+
+    out = []
+    rows = fill(out, 2)
+    assert type(rows) is list
+    assert rows == [0.0, 0.0]
+    assert out == [1.0, 0.0]
+
+
+def test_persistent_values_stay_persistent():
+    "Test that a persistent value from outside isn't writable inside a raw block."
+    with raises(TypeError):
+        writes_persistent(pvector([0]))
+
+
+def test_raw_by_name():
+    "Test that a bare raw() works as well."
+    assert isinstance(imported_name(), list)
+    assert imported_name() == [1]
+
+
+class Connection(object):
+    def raw(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pyrmute
+def other_raw(conn, m):
+    with conn.raw():
+        m['a'] = 1
+    return m
+
+
+def test_other_raw_is_rewritten():
+    "Test that only the package's raw marks a raw block."
+    assert other_raw(Connection(), pmap()) == pmap({'a': 1})
@@ -0,0 +1,76 @@
+import pickle
+
+from pyrsistent import pmap
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.records import Record, make, record, shape
+from pyrsistent_mutable.sharing import _reachable
+
+
+@pyrmute(records=True)
+def event(i, name, ts):
+    return {'id': i, 'name': name, 'ts': ts}
+
+
+@pyrmute(records=True)
+def update(e):
+    e['name'] += '!'
+    e['ts'] = 0
+    return e
+
+
+@pyrmute(records=True)
+def grow(e, key):
+    e[key] = True
+    del e['ts']
+    return e
+
+
+@pyrmute(records=True)
+def general(key, rest):
+    return {key: 1}, {'a': 1, 'a': 2}, {'a': 1, **rest}, {}
+
+
+def test_shared_shape():
+    first, second = event(1, 'a', 5), event(2, 'b', 6)
+    assert isinstance(first, Record) and type(first) is type(second) is shape(('id', 'name', 'ts'))
+    assert first == pmap({'id': 1, 'name': 'a', 'ts': 5}) == first
+    assert hash(first) == hash(pmap({'id': 1, 'name': 'a', 'ts': 5}))
+    assert list(first.items()) == [('id', 1), ('name', 'a'), ('ts', 5)]
+    assert first.get('other') is None and 'ts' in first and len(first) == 3
+    assert first != second and first == dict(first)
+
+
+def test_keeps_shape():
+    e = event(1, 'a', 5)
+    changed = update(e)
+    assert type(changed) is type(e) and changed == {'id': 1, 'name': 'a!', 'ts': 0}
+    assert e == {'id': 1, 'name': 'a', 'ts': 5}
+
+
+def test_structural_change():
+    e = event(1, 'a', 5)
+    grown = grow(e, 'seen')
+    assert type(grown) is type(pmap()) and grown == pmap({'id': 1, 'name': 'a', 'seen': True})
+    assert e.discard('other') is e and type(e.discard('id')) is type(pmap())
+    assert e.update({'id': 2}) == make(('id', 'name', 'ts'), 2, 'a', 5)
+    with raises(KeyError):
+        e.remove('other')
+
+
+def test_general_literals():
+    single, repeated, splat, empty = general('k', {'b': 2})
+    assert not isinstance(single, Record) and single == {'k': 1}
+    assert not isinstance(repeated, Record) and repeated == {'a': 2}
+    assert not isinstance(splat, Record) and empty == pmap()
+    with raises(TypeError):
+        pyrmute(backend='frozen', records=True)(event)
+
+
+def test_memory_and_pickle():
+    e = event(1, 'a', 5)
+    as_pmap = pmap({'id': 1, 'name': 'a', 'ts': 5})
+    assert 3 * sum(_reachable(e).values()) < sum(_reachable(as_pmap).values())
+    assert pickle.loads(pickle.dumps(e)) == e and repr(e) == "record({'id': 1, 'name': 'a', 'ts': 5})"
+    assert record(e) == e
@@ -210,3 +210,15 @@ def test_delete_by_index():
     actual = delete_by_index(MockClass(foo='yup', other=44))
 
     assert actual == MockClass(foo=pmap({'this': 'that'}), other=44)
+
+
+@pyrmute
+def replace_slice(v):
+    v[0:2] = [9]
+    return v
+
+
+def test_slice_assignment():
+    "Test v[0:2] = [9] on a list, in a module whose __builtins__ is a dict"
+
+    assert replace_slice([1, 2, 3]) == [9, 3]
@@ -0,0 +1,77 @@
+from pyrsistent import pmap, pvector
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.sharing import measure
+
+
+@pyrmute(sharing=True)
+def update_one(index, key):
+    index[key] = ['new']
+    return index
+
+
+@pyrmute(sharing=True)
+def rebuild(index):
+    copy = {}
+    for key in index:
+        copy[key] = index[key]
+    return copy
+
+
+@pyrmute(sharing=True)
+def set_first(v, x):
+    v[0] = x
+    return v
+
+
+@pyrmute(sharing=True)
+def copy_vector(v):
+    v = pvector(list(v))
+    return v
+
+
+def big_index():
+    return pmap(dict(('key{}'.format(n), [n]) for n in range(100)))
+
+
+def test_update_shares_with_input():
+    "Test that a single update shares nearly everything with its input."
+    index = big_index()
+    result, report = measure(update_one, index, 'key1')
+
+    assert result['key1'] == pvector(['new'])
+    assert report.shared['index'].nodes > 100
+    assert report.allocated.nodes * 20 < report.shared['index'].nodes
+    assert [stmt.runs for stmt in report.statements] == [1]
+    assert report.statements[0].retained.nodes == report.allocated.nodes
+
+
+def test_rebuild_is_attributed():
+    "Test that a statement rebuilding the structure shows up in the breakdown."
+    index = big_index()
+    result, report = measure(rebuild, index)
+
+    assert result == index
+    shared = report.shared['index']
+    assert shared.nodes == 100  # Only the values themselves.
+    by_runs = dict((stmt.runs, stmt) for stmt in report.statements)
+    assert sorted(by_runs) == [1, 100]
+    assert by_runs[100].allocated.nodes > by_runs[100].retained.nodes
+    assert 'line' in str(report)
+
+
+def test_vector_rebuild_is_counted():
+    "Test that rebuilding a big vector reports far more allocation than setting one element."
+    v = pvector(range(100000))
+    one, set_report = measure(set_first, v, -1)
+    copy, copy_report = measure(copy_vector, v)
+
+    assert one[0] == -1 and copy == v
+    assert set_report.allocated.nodes < 10
+    assert copy_report.allocated.nodes > 100 * set_report.allocated.nodes
+    assert copy_report.allocated.bytes > 100 * set_report.allocated.bytes
+
+
+def test_record_is_inert():
+    "Test that instrumented functions work normally outside of measure."
+    assert update_one(pmap(), 'a') == pmap({'a': pvector(['new'])})
@@ -0,0 +1,107 @@
+from pyrsistent import pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.slices import SliceView, view
+
+
+def windows(v, k):
+    out = []
+    for i in range(len(v) - k + 1):
+        window = v[i:i + k]
+        out.append(sum(window) * 10 // len(window))
+        if -1 in v[i:]:
+            out.append(v[i:][0])
+    return out, max(enumerate(v[::-2])), [x for x in v[1::2]], v[:k], v[1:].append(0)
+
+
+def escapes(v, sum):
+    kept = v[1:]
+    total = sum(v[1:])
+    return kept, total
+
+
+def big_window():
+    v = pvector(range(1000))
+    return v, view(v, slice(100, 900, 3)), v[100:900:3]
+
+
+def test_view_reads_like_slice():
+    "Test that a view has the length, elements and order of the slice it stands for."
+    _, window, expected = big_window()
+
+    assert isinstance(window, SliceView)
+    assert len(window) == len(expected)
+    assert list(window) == list(expected)
+    assert list(reversed(window)) == list(reversed(expected))
+
+
+def test_view_indexing():
+    "Test that indexing and slicing a view give what the slice would."
+    _, window, expected = big_window()
+
+    assert window[-1] == expected[-1]
+    assert window[10:20] == expected[10:20]
+    with raises(IndexError):
+        window[len(window)]
+
+
+def test_view_negative_step():
+    "Test that a view with a negative step runs backwards."
+    v, _, _ = big_window()
+
+    assert view(v, slice(None, None, -1)) == v[::-1]
+
+
+def test_view_equality_and_hash():
+    "Test that a view compares and hashes like the vector it stands for."
+    _, window, expected = big_window()
+
+    assert window == expected
+    assert hash(window) == hash(expected)
+
+
+def test_view_materialize():
+    "Test that materialize copies the view into a vector."
+    _, window, expected = big_window()
+
+    assert window.materialize() == expected
+
+
+def test_view_of_builtin():
+    "Test that a list can be viewed too."
+    assert view([1, 2, 3], slice(1, None)) == [2, 3]
+
+
+def test_only_read_slices():
+    "Test that slices that are only read become views, and the others stay copies."
+    source = pyrmute(opt=2)(windows).__source__
+
+    assert source.count('_view(') == 5
+    assert 'v[:k]' in source
+    assert 'v[1:].append(0)' in source
+
+
+def test_views_give_same_results():
+    "Test that taking views doesn't change what the function returns."
+    v = pvector([1, 2, 3, -1, 4])
+
+    assert pyrmute(opt=2)(windows)(v, 2) == pyrmute(windows)(v, 2)
+
+
+def test_slice_views_switch():
+    "Test that turning the pass off leaves every slice a copy."
+    source = pyrmute(opt=2, passes={'slice_views': False})(windows).__source__
+
+    assert '_view(' not in source
+
+
+def test_shadowed_and_escaping():
+    "Test that slices that escape, or are passed to a shadowed builtin, stay copies."
+    func = pyrmute(opt=2)(escapes)
+
+    kept, total = func(pvector([1, 2, 3]), list)
+
+    assert '_view(' not in func.__source__
+    assert type(kept) is type(pvector())
+    assert total == [2, 3]
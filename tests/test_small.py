@@ -0,0 +1,77 @@
+import pickle
+
+from pyrsistent import pmap, pset, pvector
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.small import LIMIT, SmallMap, SmallSet, SmallVector, native_vectors, smap, sset
+
+
+@pyrmute(backend='small')
+def build(n):
+    local = {'items': [], 'seen': {0}}
+    for i in range(n):
+        local['items'].append(i)
+        local['seen'].add(i)
+    local['count'] = len(local['items'])
+    return local
+
+
+def test_literals():
+    small = build(2)
+    assert isinstance(small, SmallMap) and isinstance(small['seen'], SmallSet)
+    assert small == pmap({'items': pvector([0, 1]), 'seen': pset([0, 1]), 'count': 2})
+    assert isinstance(small['items'], type(pvector()) if native_vectors else SmallVector)
+    grown = build(LIMIT + 1)
+    assert type(grown['seen']) is type(pset()) and type(grown['items']) is type(pvector())
+    assert grown['seen'] == pset(range(LIMIT + 1)) and isinstance(grown, SmallMap)
+
+
+def test_grows_into_pyrsistent():
+    m = smap((str(i), i) for i in range(LIMIT))
+    assert isinstance(m, SmallMap) and isinstance(m.set('0', 1), SmallMap)
+    assert type(m.set('new', 1)) is type(pmap()) and m.set('new', 1) == pmap(m).set('new', 1)
+    evolver = m.evolver()
+    evolver['new'] = 1
+    assert type(evolver.persistent()) is type(pmap())
+    s = sset(range(LIMIT))
+    assert isinstance(s.add(0), SmallSet) and type(s.add(LIMIT)) is type(pset())
+    assert type(s | {LIMIT}) is type(pset()) and isinstance(s.discard(0), SmallSet)
+    v = SmallVector._wrap(tuple(range(LIMIT)))
+    assert isinstance(v.set(0, 1), SmallVector) and type(v.append(0)) is type(pvector())
+    assert type(v + [0]) is type(pvector()) and isinstance(v[1:], SmallVector)
+
+
+def test_evolver_carries_on_after_growing():
+    evolver = smap((str(i), i) for i in range(LIMIT)).evolver()
+    evolver['new'] = 1
+    grown = evolver.persistent()
+    assert evolver['new'] == 1 and evolver.persistent() is grown and not evolver.is_dirty()
+    evolver['newer'] = 2
+    del evolver['0']
+    assert evolver.persistent() == grown.set('newer', 2).remove('0') and '0' in grown
+    evolver = SmallVector._wrap(tuple(range(LIMIT))).evolver()
+    evolver.append(LIMIT)
+    grown = evolver.persistent()
+    evolver.append(LIMIT + 1)
+    assert len(evolver) == LIMIT + 2 and evolver.persistent() == grown.append(LIMIT + 1)
+    evolver = sset(range(LIMIT)).evolver()
+    evolver.add(LIMIT)
+    grown = evolver.persistent()
+    assert evolver.add(LIMIT + 1).persistent() == grown.add(LIMIT + 1)
+
+
+def test_equality_and_hash():
+    assert smap({'a': 1}) == pmap({'a': 1}) and pmap({'a': 1}) == smap({'a': 1})
+    assert hash(smap({'a': 1})) == hash(pmap({'a': 1}))
+    assert sset([1, 2]) == pset([1, 2]) and hash(sset([1, 2])) == hash(pset([1, 2]))
+    v = SmallVector._wrap((1, 2))
+    assert v == pvector([1, 2]) and pvector([1, 2]) == v
+    # Small vectors are only built without the C extension, whose pvector hashes differently.
+    assert native_vectors or hash(v) == hash(pvector([1, 2]))
+
+
+def test_pickle():
+    for value in smap({'a': 1}), sset([1]):
+        copy = pickle.loads(pickle.dumps(value))
+        assert copy == value and type(copy) is type(value)
+    assert pickle.loads(pickle.dumps(SmallVector._wrap((1,)))) == pvector([1])
@@ -0,0 +1,48 @@
+import json
+import os
+
+from mock import patch
+from pyrsistent import pmap
+
+from pyrsistent_mutable import cache, pyrmute
+from pyrsistent_mutable.timing import DecorationStats, dump, report
+
+
+def source(m):
+    m['a'] = [1]
+    m['b'] = m['a']
+    return m
+
+
+def test_stats_record_phases():
+    cache.clear()
+    func = pyrmute(source)
+    entry = pyrmute.stats()[-1]
+    assert isinstance(entry, DecorationStats)
+    assert entry.qualname == 'source'
+    assert not entry.cached
+    for phase in ('getsource', 'parse', 'names', 'rewrite', 'fix_missing_locations', 'compile', 'show_ast', 'exec'):
+        assert entry.phases[phase] >= 0
+    assert abs(entry.total - sum(entry.phases.values())) < 1e-9
+    assert entry.call_sites == 3
+    assert entry.nodes > 10
+    assert func(pmap()) == pmap({'a': [1], 'b': [1]})
+
+    pyrmute(source)
+    entry = pyrmute.stats()[-1]
+    assert entry.cached
+    assert 'parse' not in entry.phases
+    assert entry.nodes is None
+
+
+def test_report_and_dump(tmpdir):
+    pyrmute(source)
+    entries = pyrmute.stats()[-1:]
+    assert report(entries).splitlines()[1].endswith('tests.test_timing.source')
+    target = str(tmpdir.join('stats.jsonl'))
+    with patch.dict(os.environ, {'PYRMUTE_STATS': target}):
+        dump()
+    with open(target) as fh:
+        lines = [json.loads(line) for line in fh]
+    assert len(lines) == len(pyrmute.stats())
+    assert lines[-1]['qualname'] == 'source'
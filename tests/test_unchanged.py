@@ -0,0 +1,91 @@
+from pyrsistent import PClass, field, pmap, pset, pvector
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.globals import set_via_attr
+
+
+class Node(PClass):
+    status = field()
+    children = field()
+
+
+@pyrmute(unchanged='identical')
+def touch(tree, i, status):
+    tree.children[i].status = status
+    tree.status = tree.status
+    return tree
+
+
+@pyrmute(unchanged='equal')
+def assign(state, key, value):
+    state[key]['value'] = value
+    return state
+
+
+@pyrmute(unchanged='equal')
+def add_tag(state, key, tag):
+    state[key].add(tag)
+    return state
+
+
+@pyrmute(unchanged='identical')
+def fill(v, pairs):
+    for i, x in pairs:
+        v[i] = x
+    return v
+
+
+@pyrmute
+def always(tree, status):
+    tree.status = status
+    return tree
+
+
+def test_identical():
+    tree = Node(status='ok', children=pvector([Node(status='ok', children=pvector())]))
+    assert touch(tree, 0, tree.children[0].status) is tree
+    changed = touch(tree, 0, 'failed')
+    assert changed.children[0].status == 'failed'
+    assert tree.children[0].status == 'ok'
+    assert always(tree, tree.status) is not tree
+
+
+def test_equal():
+    state = pvector([pmap({'value': (1, 2)}), pmap({'value': 0})])
+    assert assign(state, 0, (1, 2)) is state
+    assert assign(state, 1, False) is not state
+    assert assign(state, 1, False)[1]['value'] is False
+    assert type(assign(state, 1, 0.0)[1]['value']) is float
+    assert '_set_via_slice_unless_identical(state, key, ' in assign.__source__
+
+
+def test_fused():
+    state = pvector([pset([1])])
+    assert add_tag(state, 0, 1) is state
+    assert add_tag(state, 0, 2) == pvector([pset([1, 2])])
+    assert '_invoke_item_unless_equal(state, key, ' in add_tag.__source__
+
+
+def test_loops():
+    v = pvector([1, 2, 3])
+    assert fill(v, [(0, 1), (2, 3)]) is v
+    assert fill(v, [(0, 5)]) == pvector([5, 2, 3])
+    assert '.persistent()' in fill.__source__
+    builtin = [1, 2]
+    assert fill(builtin, [(1, 4)]) is builtin
+    assert builtin == [1, 4]
+
+
+def test_options():
+    with raises(ValueError):
+        pyrmute(unchanged='sometimes')
+
+
+def test_set_via_attr_fallback():
+    class Plain(object):
+        pass
+
+    obj = Plain()
+    assert set_via_attr(obj, 'status', 'ok') is obj
+    assert obj.status == 'ok'
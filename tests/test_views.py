@@ -0,0 +1,195 @@
+import json
+import pickle
+
+from pyrsistent import freeze, pmap, pset, pvector, thaw
+from pytest import raises
+
+from pyrsistent_mutable import pyrmute
+from pyrsistent_mutable.jsonstream import dump, dumps
+from pyrsistent_mutable.views import ListView, MapView, SetView, unwrap, view
+
+data = freeze({'users': [{'id': 1, 'name': 'Zoë', 'tags': ['a', 'b'], 'score': 1.5, 'active': True},
+                         {'id': 2, 'name': 'Al "x"', 'tags': [], 'score': None, 'active': False}],
+               'count': 2, 'empty': {}, 'ids': (1, 2)})
+
+
+@pyrmute(return_view=True)
+def summary(users):
+    names = []
+    for user in users:
+        names.append(user['name'])
+    if not names:
+        return pmap()
+    return {'names': names, 'count': len(names)}, names
+
+
+def test_map_view():
+    "Test that a map becomes a dict that unwraps to the map."
+    v = view(data)
+
+    assert isinstance(v, dict)
+    assert type(v) is MapView
+    assert unwrap(v) is data
+
+
+def test_nested_views():
+    "Test that the values of a view are wrapped as they're read."
+    users = view(data)['users']
+
+    assert isinstance(users, list)
+    assert isinstance(users[0], dict)
+    assert users[0]['tags'] == ['a', 'b']
+
+
+def test_view_equals_thawed():
+    "Test that a view compares equal to the thawed value, as do its copies."
+    v = view(data)
+
+    assert v == thaw(data)
+    assert dict(v)['users'] == thaw(data)['users']
+    assert {**v}['empty'] == {}
+
+
+def test_map_view_methods():
+    "Test that get, values and items wrap the values they give."
+    v = view(data)
+
+    assert isinstance(v.get('empty'), dict)
+    assert v.get('missing', 3) == 3
+    assert all(isinstance(value, dict) for value in v['users'])
+    assert [key for key, _ in v.items()] == list(data)
+
+
+def test_set_and_tuple_views():
+    "Test that sets become SetViews and tuples tuples of views."
+    assert type(view(pset([1]))) is SetView
+    assert view(pset([1])) == {1}
+    assert view((pvector([1]), 2)) == ([1], 2)
+
+
+def test_others_pass_through():
+    "Test that strings, None and builtins are returned as they are."
+    assert view('text') == 'text'
+    assert view(None) is None
+    assert type(view([pvector()])) is list
+
+
+def test_list_view_is_lazy():
+    "Test that a list view holds the vector's elements and wraps each as it's read."
+    users = view(data['users'])
+
+    assert list.__getitem__(users, 0) is data['users'][0]
+    assert type(users[0]) is MapView
+    assert [type(user) for user in users] == [MapView, MapView]
+    assert type(list(reversed(users))[0]) is MapView
+
+
+def test_list_view_copies_are_wrapped():
+    "Test that slicing, adding and multiplying a list view give lists of views."
+    users = view(data['users'])
+
+    assert type(users[:1][0]) is MapView
+    assert type((users + [])[1]) is MapView
+    assert type((users * 2)[3]) is MapView
+
+
+def test_list_view_search():
+    "Test that repr, in and index see the elements as their views."
+    users = view(data['users'])
+
+    assert repr(users) == repr(thaw(data['users']))
+    assert data['users'][1] in users
+    assert users.index(thaw(data['users'][1])) == 1
+
+
+def test_read_only():
+    "Test that the methods that would change a view raise TypeError."
+    v = view(data)
+    for change in (lambda: v.update(a=1), lambda: v.__setitem__('a', 1), lambda: v['users'].append(1),
+                   lambda: v['users'].sort(), lambda: view(pset([1])).add(2)):
+        with raises(TypeError):
+            change()
+
+    assert data == freeze(thaw(data))
+
+
+def test_copy_is_builtin():
+    "Test that copy gives a plain dict that can be changed without touching the view."
+    v = view(data)
+
+    copy = v.copy()
+    copy['a'] = 1
+
+    assert type(copy) is dict
+    assert 'a' not in v
+
+
+def test_json():
+    "Test that jsonstream gives the text json.dumps gives for the thawed value, as does json.dumps of a view."
+    expected = json.dumps(thaw(data))
+
+    assert dumps(data) == expected
+    assert dumps(view(data)) == expected
+    assert json.dumps(view(data)) == expected
+    assert json.dumps(view(data['users'])) == json.dumps(thaw(data['users']))
+    assert json.dumps(view(freeze([[{'id': 1}], {'ids': [[2]]}]))) == '[[{"id": 1}], {"ids": [[2]]}]'
+
+
+def test_json_options():
+    "Test that jsonstream takes the options of json.dumps."
+    for options in ({'sort_keys': True}, {'ensure_ascii': False}, {'separators': (',', ':')}):
+        assert dumps(data, **options) == json.dumps(thaw(data), **options)
+
+
+def test_json_special_values():
+    "Test that jsonstream writes keys of other types, NaN and the infinities as json does."
+    mixed = pmap({1: float('nan'), None: [float('inf')], True: pvector()})
+
+    assert dumps(mixed) == json.dumps(thaw(mixed))
+    with raises(ValueError):
+        dumps(pvector([float('nan')]), allow_nan=False)
+
+
+def test_json_default():
+    "Test that values jsonstream can't encode raise TypeError, or go through default."
+    with raises(TypeError):
+        dumps(pvector([object()]))
+
+    assert dumps(pvector([pset([1])]), default=sorted) == '[[1]]'
+
+
+def test_dump(tmpdir):
+    "Test that dump writes the text to a file."
+    path = tmpdir.join('out.json')
+    big = freeze([{'i': i} for i in range(5000)])
+
+    with path.open('w') as fp:
+        dump(big, fp)
+
+    assert json.loads(path.read()) == thaw(big)
+
+
+def test_return_view():
+    "Test that return_view wraps each returned value."
+    result, names = summary(data['users'])
+
+    assert type(result) is MapView
+    assert type(names) is ListView
+    assert result['names'] == ['Zoë', 'Al "x"']
+    assert summary(pvector()) == {}
+    assert '_view(' in summary.__source__
+
+
+def test_returned_view_json():
+    "Test that a returned view encodes with json.dumps."
+    result, _ = summary(data['users'])
+
+    assert json.loads(json.dumps(result)) == {'names': ['Zoë', 'Al "x"'], 'count': 2}
+
+
+def test_view_pickles():
+    "Test that views pickle as views of the same value."
+    result, names = summary(data['users'])
+
+    assert pickle.loads(pickle.dumps(result)) == result
+    assert type(pickle.loads(pickle.dumps(names))) is ListView